@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import google.generativeai as genai
 import json
@@ -6,14 +6,42 @@ import os
 import dotenv
 import re
 from googlesearch import search
-import requests
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader  # You'll need to install this package first
+import asyncio
 import time
-from functools import lru_cache
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import Stage, StagePool, run_stages, stage_pool
+from llm_cache import CachedModel, response_cache
+from career_index import get_career_ranker, format_shortlist
+from fetcher import fetch_pages
+from page_cache import page_cache
+from scoring import match_scores, relevance_scores
+from jobs import create_job_queue, payload_hash
+from chat_sessions import create_session_store, estimate_tokens
+from question_prefetch import QuestionPrefetcher, history_key
+from singleflight import create_group
+from question_pool import OpeningPool, POOL_PATH, load_predefined
+from skill_gap import career_gap_cache, cached_career, fan_out, store_career, target_titles
+from skill_gap import merge as merge_skill_gap
+from plan_store import plan_store
+from local_recommender import answers_text, recommend as recommend_locally
+import deadline
+from hedging import CallTimeout, HedgedModel, Hedger
+from router import ModelRouter, parse_routes
+import metrics
+import tracing
+from governor import BACKGROUND, INTERACTIVE, NORMAL, GovernedModel, Overloaded, create_governor, current_priority
+from structured_output import JsonScanner, SCHEMAS, json_mode_config, parse_scanned, validate
+import logging
 
 dotenv.load_dotenv(override=True)
 
+# Structured logs go through a background queue; see tracing.py
+tracing.configure_logging()
+log = logging.getLogger("app")
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -25,115 +53,338 @@ if not api_key:
 
 # Basic sanity check to prevent hard-to-debug downstream 400s
 masked = (api_key[:5] + "…") if len(api_key) >= 5 else "(too short)"
-print(f"Using API key (prefix): {masked}")
+log.info(f"Using API key (prefix): {masked}")
 if not api_key.startswith("AIza"):
-    print("Warning: API key does not start with 'AIza'. It may be malformed and cause API_KEY_INVALID errors.")
-
-genai.configure(api_key=api_key)
-
-# Initialize Gemini model for each AI function
-question_ai = genai.GenerativeModel("gemini-1.5-flash")
-summary_ai = genai.GenerativeModel("gemini-1.5-flash")
-career_ai = genai.GenerativeModel("gemini-1.5-flash")
-
-# Cache PDF text to avoid repeated disk I/O and parsing
-@lru_cache(maxsize=1)
-def get_pdf_text():
-    reader = PdfReader("Career-List.pdf")
-    text = ""
-    max_pages = min(8, len(reader.pages))
-    for page in reader.pages[:max_pages]:
-        text += (page.extract_text() or "") + "\n"
-    return text[:15000]
-
-def extract_json_from_text(text):
-    """Extract JSON from text that might contain markdown or other content"""
-    # Try to find JSON pattern
-    json_match = re.search(r'\{[\s\S]*\}', text)
-    if json_match:
-        try:
-            return json.loads(json_match.group())
-        except:
-            return None
-
-def generate_json_array_with_retry(model, prompt, schema_hint=None):
-    """Generate a JSON array with a retry using a stricter prompt if needed.
-    Returns a Python list or raises ValueError.
-    """
-    # First attempt
-    resp = model.generate_content(prompt)
-    raw = (resp.text or "").strip()
-    parsed = extract_json_array_from_text(raw)
-    if parsed is not None:
-        return parsed
-
-    # Second attempt with stricter instructions
-    strict_prompt = (
-        (schema_hint or "") +
-        "\nYou must return ONLY a JSON array, with no surrounding text, no markdown fences, no comments.\n"
-        "If any information appears missing, infer reasonable values based on the analysis.\n"
-        "Output must be valid JSON and parseable as-is."
-    )
-    resp2 = model.generate_content(strict_prompt)
-    raw2 = (resp2.text or "").strip()
-    parsed2 = extract_json_array_from_text(raw2)
-    if parsed2 is not None:
-        return parsed2
-
-    preview = (raw2 or raw)[:200]
-    raise ValueError(f"Failed to parse JSON array after retry. Preview: {preview}")
-    return None
-
-def extract_json_array_from_text(text):
-    """Extract a JSON array from text, tolerant of code fences and extra prose."""
-    # Remove common code fences
-    cleaned = text.strip()
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    if cleaned.startswith("```"):
-        cleaned = cleaned[3:]
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
-
-    # Direct attempt
+    log.warning("API key does not start with 'AIza'. It may be malformed and cause API_KEY_INVALID errors.")
+
+# GEMINI_API_ENDPOINT points the client at another Gemini-compatible REST
+# endpoint, such as the local stand-in in benchmarks/fake_gemini.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+if GEMINI_API_ENDPOINT:
+    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+else:
+    genai.configure(api_key=api_key)
+
+# Initialize Gemini model for each AI function. Identical prompts are served
+# from a shared response cache (see llm_cache.py) instead of the network;
+# calls that do reach Gemini are bounded by a timeout and hedged when slow
+# (see hedging.py), and rate limited and prioritized (see governor.py).
+llm_governor = create_governor()
+llm_hedger = Hedger(
+    timeout=float(os.getenv('LLM_CALL_TIMEOUT', 60)),
+    budget=float(os.getenv('LLM_HEDGE_BUDGET', 0)),
+    hedge_quantile=float(os.getenv('LLM_HEDGE_QUANTILE', 0.95)),
+    min_samples=int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20)),
+    window=int(os.getenv('LLM_LATENCY_WINDOW', 200)),
+    workers=int(os.getenv('LLM_CALL_WORKERS', 128)),
+)
+
+# Which Gemini model serves a call is chosen per call site from LLM_ROUTES
+# by latency, error rate and prompt size (see router.py); the three handles
+# below share the router and differ only in the call sites that use them.
+llm_router = ModelRouter(
+    lambda name: HedgedModel(GovernedModel(genai.GenerativeModel(name), llm_governor), llm_hedger),
+    routes=parse_routes(os.getenv('LLM_ROUTES', '')),
+    default_model=os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'),
+    failures=int(os.getenv('LLM_ROUTE_FAILURES', 3)),
+    cooldown=float(os.getenv('LLM_ROUTE_COOLDOWN', 30)),
+    explore_rate=float(os.getenv('LLM_ROUTE_EXPLORE', 0.02)),
+)
+
+question_ai = CachedModel(llm_router, response_cache)
+summary_ai = CachedModel(llm_router, response_cache)
+career_ai = CachedModel(llm_router, response_cache)
+
+# Queue priority of each call site when Gemini capacity is short
+SITE_PRIORITIES = {
+    'question': INTERACTIVE, 'question_batch': INTERACTIVE, 'chat': INTERACTIVE, 'test': INTERACTIVE,
+    'summary': NORMAL, 'career': NORMAL, 'pdf': NORMAL, 'course_plan': NORMAL,
+    'skill_gap_profile': NORMAL, 'skill_gap_career': NORMAL,
+    'question_pool': BACKGROUND, 'question_prefetch': BACKGROUND, 'chat_summary': BACKGROUND,
+}
+
+# Latency budget (seconds, 0 for none) of each endpoint, shared by all its
+# stages and model calls. /analyze-answers then falls back to the local
+# recommender; the others answer 504.
+ENDPOINT_DEADLINES = {
+    'analyze-answers': float(os.getenv('ANALYZE_DEADLINE', 45)),
+    'skill-gap': float(os.getenv('SKILL_GAP_DEADLINE', 90)),
+    'course-plan': float(os.getenv('COURSE_PLAN_DEADLINE', 45)),
+}
+
+# Overall time budget (seconds) for the search + page fetches of the web search endpoints
+WEB_SEARCH_DEADLINE = float(os.getenv("WEB_SEARCH_DEADLINE", 10))
+
+# Number of catalog careers shortlisted locally before asking the model to pick
+CAREER_SHORTLIST_SIZE = int(os.getenv("CAREER_SHORTLIST_SIZE", 40))
+
+def get_pdf_shortlist(detailed_analysis, n=CAREER_SHORTLIST_SIZE):
+    """Rank every career in Career-List.pdf against the analysis and return the
+    top n as prompt-ready text. Falls back to the head of the catalog when the
+    analysis shares no terms with it."""
+    ranker = get_career_ranker()
+    records = ranker.top(detailed_analysis, n) or ranker.records[:n]
+    return format_shortlist(records)
+
+# Identical concurrent requests to the expensive endpoints share one computation
+request_flights = create_group()
+
+def coalesced(kind, payload, fn):
+    """Return fn(payload), sharing the result with identical requests in flight."""
+    return request_flights.do(payload_hash(kind, payload), lambda: fn(payload))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.time()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.end_span = tracing.start_span("request", route=route, method=request.method)
+
+@app.after_request
+def record_request_latency(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(
+            time.time() - started, route=route, method=request.method, status=response.status_code
+        )
+        tracing.annotate(http_status=response.status_code)
+    return response
+
+@app.teardown_request
+def end_request_span(exc=None):
+    end_span = g.pop('end_span', None)
+    if end_span:
+        end_span(exc)
+
+def _record_tokens(site, prompt, text, usage=None):
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) or estimate_tokens(str(prompt))
+    response_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(text)
+    metrics.LLM_PROMPT_TOKENS.inc(prompt_tokens, site=site)
+    metrics.LLM_RESPONSE_TOKENS.inc(response_tokens, site=site)
+
+def _observe_llm_call(site, t0, outcome):
+    metrics.LLM_LATENCY.observe(time.time() - t0, site=site)
+    metrics.LLM_CALLS.inc(site=site, outcome=outcome)
+
+def _stream_with_metrics(chunks, site, prompt, t0):
+    parts = []
+    outcome = 'ok'
     try:
-        parsed = json.loads(cleaned)
-        if isinstance(parsed, list):
-            return parsed
+        for chunk in chunks:
+            parts.append(chunk.text)
+            yield chunk
+    except GeneratorExit:
+        # The caller stopped reading early (client gone, or unparseable JSON)
+        outcome = 'aborted'
+        raise
     except Exception:
-        pass
-
-    # Regex fallback to first top-level array
-    arr_match = re.search(r'\[[\s\S]*\]', cleaned)
-    if arr_match:
+        outcome = 'error'
+        raise
+    finally:
+        _observe_llm_call(site, t0, outcome)
+        if outcome != 'error':
+            _record_tokens(site, prompt, "".join(parts))
+
+async def _astream_with_metrics(chunks, site, prompt, t0):
+    parts = []
+    outcome = 'ok'
+    try:
+        async for chunk in chunks:
+            parts.append(chunk.text)
+            yield chunk
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = 'aborted'
+        raise
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        _observe_llm_call(site, t0, outcome)
+        if outcome != 'error':
+            _record_tokens(site, prompt, "".join(parts))
+
+def _llm_span(prompt, site, kwargs):
+    return tracing.span("llm", payload=prompt, site=site, prompt_chars=len(str(prompt)), stream=bool(kwargs.get('stream')))
+
+def _call_site(site):
+    """Governor priority and hedger site for a call. The priority is the
+    site's, lowered by any enclosing llm_governor.priority() block;
+    background work is never hedged so it doesn't spend the hedge budget."""
+    priority = max(SITE_PRIORITIES.get(site, NORMAL), current_priority())
+    return llm_governor.priority(priority), llm_hedger.site(site, hedge=priority < BACKGROUND)
+
+def generate(model, prompt, site, **kwargs):
+    """Call model.generate_content, recording latency, outcome and token
+    counts under the given call site (question, summary, career, pdf, ...)."""
+    t0 = time.time()
+    priority, hedge_site = _call_site(site)
+    with _llm_span(prompt, site, kwargs), priority, hedge_site:
         try:
-            return json.loads(arr_match.group())
+            response = model.generate_content(prompt, **kwargs)
         except Exception:
-            return None
-    return None
-
-@app.route('/generate-question', methods=['POST'])
-def generate_question():
-    try:
-        data = request.json
-        previous_qa = data.get('previousQA', [])
-        
-        # Log received data
-        print("\n=== Generating New Question ===")
-        print(f"Received {len(previous_qa)} previous Q&As:")
-        for i, qa in enumerate(previous_qa):
-            print(f"\nQ{i+1}: {qa['question']}")
-            print(f"A{i+1}: {qa['answer']}")
-        
-        # Format Q&A history
-        qa_history = "\n".join([
-            f"Question {i+1}: {qa['question']}\nAnswer: {qa['answer']}"
-            for i, qa in enumerate(previous_qa)
-        ])
-        
-        print("\nGenerating new question...")
-        
-        prompt = f"""Based on these previous responses:
+            _observe_llm_call(site, t0, 'error')
+            raise
+    if kwargs.get('stream'):
+        return _stream_with_metrics(response, site, prompt, t0)
+    _observe_llm_call(site, t0, 'ok')
+    _record_tokens(site, prompt, response.text, getattr(response, 'usage_metadata', None))
+    return response
+
+async def agenerate(model, prompt, site, **kwargs):
+    """generate() for the ASGI app: awaits model.generate_content_async, so a
+    slow call holds no thread. Streams come back as async iterators."""
+    t0 = time.time()
+    priority, hedge_site = _call_site(site)
+    with _llm_span(prompt, site, kwargs), priority, hedge_site:
+        try:
+            response = await model.generate_content_async(prompt, **kwargs)
+        except Exception:
+            _observe_llm_call(site, t0, 'error')
+            raise
+    if kwargs.get('stream'):
+        return _astream_with_metrics(response, site, prompt, t0)
+    _observe_llm_call(site, t0, 'ok')
+    _record_tokens(site, prompt, response.text, getattr(response, 'usage_metadata', None))
+    return response
+
+def error_response(e, body=None):
+    """JSON error response for a failed handler (body defaults to
+    {"error": message}). When Gemini capacity is exhausted, answer 503 with
+    Retry-After so clients back off instead of retrying immediately; when
+    the deadline or model call timed out, 504."""
+    response = jsonify(body if body is not None else {"error": str(e)})
+    response.status_code = 500
+    if isinstance(e, Overloaded):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+    elif isinstance(e, (deadline.DeadlineExceeded, CallTimeout)):
+        response.status_code = 504
+    return response
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream an iterable of formatted SSE strings to the client"""
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # keep proxies from buffering the stream
+    })
+
+STRICT_JSON_SUFFIX = (
+    "\nYou must return ONLY valid JSON, with no surrounding text, no markdown fences, no comments.\n"
+    "If any information appears missing, infer reasonable values based on the analysis.\n"
+    "Output must be valid JSON and parseable as-is."
+)
+
+def _structured_prompt(attempt, prompt, retry_prompt, error, site):
+    if not attempt:
+        return prompt
+    metrics.JSON_PARSE_RETRIES.inc(site=site)
+    return (retry_prompt or prompt) + STRICT_JSON_SUFFIX + f"\nYour previous reply was rejected: {error}."
+
+def _check_structured(scanner, site, kind, attrs):
+    """Parse and validate what the scanner collected: (value, error)."""
+    value, repaired = parse_scanned(scanner)
+    if value is None:
+        error = scanner.error or f"no parseable JSON {kind} found"
+    else:
+        error = validate(value, SCHEMAS.get(site, {}))
+    attrs.update(ok=error is None, repaired=repaired, chars=len(scanner.text))
+    if error is None and repaired:
+        metrics.JSON_REPAIRS.inc(site=site)
+    return value, error
+
+def _evict(model, prompt, config):
+    """Drop a reply that failed validation from the response cache, so the
+    same prompt isn't answered with it again."""
+    evict = getattr(model, 'evict', None)
+    if evict:
+        evict(prompt, generation_config=config)
+
+def _structured_failure(site, kind, error, preview):
+    metrics.JSON_PARSE_FAILURES.inc(site=site)
+    return ValueError(f"Failed to parse JSON {kind} after retry ({error}). Preview: {preview}")
+
+def generate_structured(model, prompt, site, kind='object', retry_prompt=None):
+    """Generate JSON output for a call site and validate it against
+    SCHEMAS[site]. The response is streamed through an incremental parser
+    so output that can't parse is abandoned early; near-misses are
+    repaired. One retry with stricter instructions (retry_prompt, or the
+    original prompt) is made before raising ValueError."""
+    error, preview = None, ""
+    for attempt in range(2):
+        attempt_prompt = _structured_prompt(attempt, prompt, retry_prompt, error, site)
+        scanner = JsonScanner(kind)
+        config = json_mode_config()
+        chunks = generate(model, attempt_prompt, site, stream=True, generation_config=config)
+        with tracing.span("json_parse", kind=kind, site=site, attempt=attempt) as attrs:
+            try:
+                for chunk in chunks:
+                    scanner.feed(chunk.text or "")
+                    if scanner.error:
+                        metrics.JSON_STREAM_ABORTS.inc(site=site)
+                        break
+            finally:
+                close = getattr(chunks, 'close', None)
+                if close:
+                    close()
+            value, error = _check_structured(scanner, site, kind, attrs)
+        if error is None:
+            return value
+        _evict(model, attempt_prompt, config)
+        preview = preview or scanner.text[:200]
+    raise _structured_failure(site, kind, error, preview)
+
+async def agenerate_structured(model, prompt, site, kind='object', retry_prompt=None):
+    """generate_structured() on top of agenerate()."""
+    error, preview = None, ""
+    for attempt in range(2):
+        attempt_prompt = _structured_prompt(attempt, prompt, retry_prompt, error, site)
+        scanner = JsonScanner(kind)
+        config = json_mode_config()
+        chunks = await agenerate(model, attempt_prompt, site, stream=True, generation_config=config)
+        with tracing.span("json_parse", kind=kind, site=site, attempt=attempt) as attrs:
+            try:
+                async for chunk in chunks:
+                    scanner.feed(chunk.text or "")
+                    if scanner.error:
+                        metrics.JSON_STREAM_ABORTS.inc(site=site)
+                        break
+            finally:
+                await chunks.aclose()
+            value, error = _check_structured(scanner, site, kind, attrs)
+        if error is None:
+            return value
+        _evict(model, attempt_prompt, config)
+        preview = preview or scanner.text[:200]
+    raise _structured_failure(site, kind, error, preview)
+
+def generate_json_array_with_retry(model, prompt, schema_hint=None, site='career'):
+    """Generate a JSON array with a retry using a stricter prompt if needed.
+    Returns a Python list or raises ValueError.
+    """
+    return generate_structured(model, prompt, site, kind='array', retry_prompt=schema_hint)
+
+def format_qa_history(previous_qa):
+    return "\n".join([
+        f"Question {i+1}: {qa['question']}\nAnswer: {qa['answer']}"
+        for i, qa in enumerate(previous_qa)
+    ])
+
+def is_valid_question(question_data):
+    return isinstance(question_data, dict) and \
+       'question' in question_data and \
+       'options' in question_data and \
+       isinstance(question_data['options'], list) and \
+       len(question_data['options']) == 4
+
+def build_question_prompt(previous_qa):
+    # Format Q&A history
+    qa_history = format_qa_history(previous_qa)
+    
+    return f"""Based on these previous responses:
 
 {qa_history}
 
@@ -155,153 +406,271 @@ Requirements:
 7. generate that type of question so we can easily identify the person's career path    
 8. Return ONLY the JSON object"""
 
-        # Generate the response
-        response = question_ai.generate_content(prompt)
-        response_text = response.text.strip()
+def generate_next_question(previous_qa, site='question'):
+    """Ask the model for the next adaptive question given the Q&A history."""
+    # Generate the response, validated against the question schema
+    question_data = generate_structured(question_ai, build_question_prompt(previous_qa), site)
+    return {'question': question_data['question'], 'options': question_data['options']}
+
+def build_question_batch_prompt(previous_qa):
+    qa_history = format_qa_history(previous_qa)
+
+    return f"""Based on these previous responses:
+
+{qa_history}
+
+Generate ONE new career-focused multiple-choice question, and for EACH of its four options
+the question you would ask next if the person picked that option.
+
+IMPORTANT: Your response must be ONLY a JSON object in this exact format:
+{{
+    "question": "Your question text here",
+    "options": ["Option 1", "Option 2", "Option 3", "Option 4"],
+    "followUps": [
+        {{"question": "Next question if Option 1", "options": ["A", "B", "C", "D"]}},
+        {{"question": "Next question if Option 2", "options": ["A", "B", "C", "D"]}},
+        {{"question": "Next question if Option 3", "options": ["A", "B", "C", "D"]}},
+        {{"question": "Next question if Option 4", "options": ["A", "B", "C", "D"]}}
+    ]
+}}
+
+Requirements:
+1. Every question must be unique and different from previous ones
+2. Each follow-up must build on the option it follows to explore deeper insights
+3. Focus on career-relevant traits, skills, or preferences
+4. Options must be distinct and career-relevant, exactly four per question
+5. followUps must be in the same order as options
+6. Return ONLY the JSON object"""
+
+def split_question_batch(batch):
+    """Return (question, follow_ups) from a batch response; a follow-up that
+    didn't come back well-formed is None."""
+    question_data = {'question': batch['question'], 'options': batch['options']}
+
+    follow_ups = batch.get('followUps')
+    if not isinstance(follow_ups, list):
+        follow_ups = []
+    follow_ups = [
+        {'question': f['question'], 'options': f['options']} if is_valid_question(f) else None
+        for f in follow_ups[:4]
+    ]
+    return question_data, follow_ups
+
+def generate_question_batch(previous_qa):
+    """Ask for the next question plus the follow-up for each of its options
+    in one model call. Returns (question, follow_ups)."""
+    return split_question_batch(generate_structured(question_ai, build_question_batch_prompt(previous_qa), 'question_batch'))
+
+# Opt-in: after each question, generate the follow-up for all four options
+# in the background so the next request is served from memory
+QUESTION_BATCH = os.getenv('QUESTION_BATCH', '').lower() in ('1', 'true', 'yes')
+QUESTION_PREFETCH = os.getenv('QUESTION_PREFETCH', '').lower() in ('1', 'true', 'yes')
+QUESTION_PREFETCH_WAIT = float(os.getenv('QUESTION_PREFETCH_WAIT', 10))
+def speculate_next_question(previous_qa):
+    # Under its own site, so speculative calls stay out of the interactive
+    # 'question' latency stats, hedge budget and routing estimates
+    with llm_governor.priority(BACKGROUND):
+        return generate_next_question(previous_qa, site='question_prefetch')
+
+question_prefetcher = QuestionPrefetcher(
+    speculate_next_question,
+    workers=int(os.getenv('QUESTION_PREFETCH_WORKERS', 4)),
+    max_inflight=int(os.getenv('QUESTION_PREFETCH_INFLIGHT', 8)),
+    per_minute=int(os.getenv('QUESTION_PREFETCH_PER_MINUTE', 60)),
+)
+
+def build_opening_pool(depth):
+    """Generate the opening-question pool: OPENING_POOL_SIZE distinct first
+    questions, then the follow-up for every option down to `depth` answers.
+    Follow-ups are generated on the pool's own few threads, never on the
+    stage pool that request pipelines use."""
+    prompt = f"""Generate {OPENING_POOL_SIZE} different opening questions for a career assessment.
+    Each is the FIRST multiple-choice question a new user sees, so it must not assume anything about them.
+    Cover different angles: interests, working style, school subjects, values, ambitions.
+    Return ONLY a JSON array of objects, each {{"question": "...", "options": ["...", "...", "...", "..."]}}
+    with exactly four distinct, career-relevant options."""
+    openers = [
+        {'question': q['question'], 'options': q['options']}
+        for q in generate_json_array_with_retry(question_ai, prompt, site='question_pool')
+        if is_valid_question(q)
+    ]
+    entries = {history_key([]): openers}
+
+    frontier = [([], q) for q in openers]
+    for _ in range(depth):
+        histories = [
+            history + [{'question': q['question'], 'answer': option}]
+            for history, q in frontier for option in q['options']
+        ]
+        results, _ = run_stages([
+            Stage(str(i), lambda h=h: speculate_next_question(h)) for i, h in enumerate(histories)
+        ], executor=opening_pool_executor)
+        frontier = []
+        for i, history in enumerate(histories):
+            entries[history_key(history)] = [results[str(i)]]
+            frontier.append((history, results[str(i)]))
+    return entries
+
+# Opening questions (empty and OPENING_POOL_DEPTH-answer histories) are served
+# from a pool shared by all workers and refreshed in the background
+OPENING_POOL = os.getenv('OPENING_POOL', 'true').lower() in ('1', 'true', 'yes')
+OPENING_POOL_SIZE = int(os.getenv('OPENING_POOL_SIZE', 5))
+opening_pool_executor = StagePool(int(os.getenv('OPENING_POOL_WORKERS', 2)), spare=0, name='opening-pool')
+opening_pool = OpeningPool(
+    build_opening_pool,
+    path=os.getenv('OPENING_POOL_PATH') or POOL_PATH,
+    depth=int(os.getenv('OPENING_POOL_DEPTH', 1)),
+    refresh_after=int(os.getenv('OPENING_POOL_REFRESH', 86400)),
+    fallback=load_predefined(),
+    retry_after=int(os.getenv('OPENING_POOL_RETRY', 60)),
+)
+
+@app.route('/generate-question', methods=['POST'])
+def generate_question():
+    try:
+        data = request.json
+        previous_qa = data.get('previousQA', [])
         
-        # Try to parse the response
-        try:
-            # First try direct JSON parsing
-            question_data = json.loads(response_text)
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to extract JSON from the text
-            question_data = extract_json_from_text(response_text)
-            if not question_data:
-                raise ValueError("Failed to generate valid question format")
-
-        # Validate the response structure
-        if not isinstance(question_data, dict) or \
-           'question' not in question_data or \
-           'options' not in question_data or \
-           not isinstance(question_data['options'], list) or \
-           len(question_data['options']) != 4:
-            raise ValueError("Invalid question format")
-
-        # Log the generated question
-        print("\nGenerated Question:")
-        print(f"Question: {question_data['question']}")
-        print(f"Options: {question_data['options']}")
-        print("=== Generation Complete ===\n")
+        # Only the history size is traced; answers are payload (see LOG_PAYLOADS)
+        tracing.annotate(previous_qa=len(previous_qa))
+
+        question_data = None
+        if OPENING_POOL:
+            question_data = opening_pool.take(previous_qa)
+            tracing.annotate(pooled=question_data is not None)
+        if question_data is None and (QUESTION_PREFETCH or QUESTION_BATCH):
+            question_data = question_prefetcher.take(previous_qa, wait=QUESTION_PREFETCH_WAIT)
+            tracing.annotate(prefetched=question_data is not None)
+        if question_data is None and QUESTION_BATCH:
+            # Buffer ran dry or the answers left the predicted branches
+            question_data, follow_ups = generate_question_batch(previous_qa)
+            question_prefetcher.stash(previous_qa, question_data, follow_ups)
+        if question_data is None:
+            question_data = generate_next_question(previous_qa)
+        if QUESTION_PREFETCH:
+            question_prefetcher.speculate(previous_qa, question_data)
+
+        if tracing.LOG_PAYLOADS:
+            log.debug("Generated question", extra={"span": {"payload": question_data}})
 
         return jsonify({"question": question_data})
 
     except Exception as e:
-        print(f"\nError generating question: {str(e)}")
+        log.error(f"Error generating question: {str(e)}")
+        if isinstance(e, Overloaded):
+            return error_response(e)
         error_message = str(e) if str(e) else "Failed to generate question"
         return jsonify({"error": error_message}), 500
 
-@app.route('/analyze-answers', methods=['POST'])
-def analyze_answers():
-    try:
-        t0 = time.time()
-        data = request.json
-        all_answers = data.get('final_answers', [])
-        group_name = data.get('group_name') or data.get('group_type') or data.get('groupType')
-        # Optional personalization
-        preferences = data.get('preferences', {}) or {}
-        job_loc = preferences.get('jobLocation', {}) or {}
-        study_loc = preferences.get('studyLocation', {}) or {}
-        # Optional previous analysis (sent by Express if user is logged in)
-        previous = data.get('previous_analysis') or {}
-        prev_ai = previous.get('aiCareers') or []
-        prev_pdf = previous.get('pdfCareers') or []
-        prev_group = previous.get('groupName')
-
-        print(f"\n=== Analyzing Answers for Group: {group_name} ===")
-
-        # Step 1: Generate detailed analysis with the first AI
-        loc_context = f"""
-        Personalization context (optional):
-        - Job location preference: country={job_loc.get('country')}, state={job_loc.get('state')}, district={job_loc.get('district')}
-        - Study location preference: country={study_loc.get('country')}, state={study_loc.get('state')}, district={study_loc.get('district')}
-        """
-        history_context = ""
-        if prev_ai or prev_pdf:
-            try:
-                history_context = f"""
-                Historical context from last session (if any):
-                - Previous group: {prev_group}
-                - Previously recommended AI careers (title, match): {json.dumps(prev_ai)[:600]}
-                - Previously recommended PDF careers (title, match): {json.dumps(prev_pdf)[:600]}
-                Guidance: Avoid repeating identical suggestions unless strongly justified by new answers. If repeating,
-                provide improved colleges or roadmap steps and explain why repetition is beneficial. Prefer building
-                upon prior top matches to deepen specificity (local colleges, certifications, internships).
-                """
-            except Exception:
-                history_context = ""
-
-        analysis_prompt = f"""Analyze these career-related responses for a student in the '{group_name}' category:
-        {json.dumps(all_answers, indent=2)}
-        {loc_context}
-        {history_context}
-        
-        Provide a detailed analysis of the person's:
-        1. Key strengths
-        2. Work preferences
-        3. Personality traits
-        4. Skill inclinations
-        5. Career goals
-        6. Education and training
-        7. Work experience
-        8. Hobbies and interests
-        9. Values and priorities
-        10. Personal development
-        11. Career aspirations
-        12. Life goals
-        13. Work-life balance
-        14. Stress tolerance
-        15. Adaptability
-        16. Leadership potential
-        17. Teamwork skills
-        18. Communication skills
-        19. Conflict resolution
-        20. Problem-solving
-        21. Decision-making
-        22. Creativity
-        23. Innovation
-        24. Time management
-        25. Work-related stress
-        26. Work-related anxiety
-        27. Work-related depression
-        28. Work-related burnout
-        29. Work-related motivation
-        30. Work-related satisfaction
-        
-        """
+def build_analysis_prompts(data):
+    """Prompts for the /analyze-answers steps. Returns (analysis_prompt,
+    career_prompts) where career_prompts(analysis) gives the careers
+    (prompt, schema_hint)."""
+    all_answers = data.get('final_answers', [])
+    group_name = data.get('group_name') or data.get('group_type') or data.get('groupType')
+    # Optional personalization
+    preferences = data.get('preferences', {}) or {}
+    job_loc = preferences.get('jobLocation', {}) or {}
+    study_loc = preferences.get('studyLocation', {}) or {}
+    # Optional previous analysis (sent by Express if user is logged in)
+    previous = data.get('previous_analysis') or {}
+    prev_ai = previous.get('aiCareers') or []
+    prev_pdf = previous.get('pdfCareers') or []
+    prev_group = previous.get('groupName')
+
+    tracing.annotate(group=group_name, answers=len(all_answers))
+
+    # Step 1: Generate detailed analysis with the first AI
+    loc_context = f"""
+    Personalization context (optional):
+    - Job location preference: country={job_loc.get('country')}, state={job_loc.get('state')}, district={job_loc.get('district')}
+    - Study location preference: country={study_loc.get('country')}, state={study_loc.get('state')}, district={study_loc.get('district')}
+    """
+    history_context = ""
+    if prev_ai or prev_pdf:
+        try:
+            history_context = f"""
+            Historical context from last session (if any):
+            - Previous group: {prev_group}
+            - Previously recommended AI careers (title, match): {json.dumps(prev_ai)[:600]}
+            - Previously recommended PDF careers (title, match): {json.dumps(prev_pdf)[:600]}
+            Guidance: Avoid repeating identical suggestions unless strongly justified by new answers. If repeating,
+            provide improved colleges or roadmap steps and explain why repetition is beneficial. Prefer building
+            upon prior top matches to deepen specificity (local colleges, certifications, internships).
+            """
+        except Exception:
+            history_context = ""
 
-        analysis_response = summary_ai.generate_content(analysis_prompt)
-        detailed_analysis = analysis_response.text
-
-        # Step 2: Generate career recommendations with the second AI
-        # Build location constraint guidance for colleges/roadmap
-        def loc_str(parts):
-            return ', '.join([str(v) for v in parts if v])
-        job_where = loc_str([job_loc.get('district'), job_loc.get('state'), job_loc.get('country')])
-        study_where = loc_str([study_loc.get('district'), study_loc.get('state'), study_loc.get('country')])
-        loc_requirements = """
-        When listing colleges and tailoring the roadmap:
-        - If study location is provided, prefer colleges/programs in: {study_where}.
-        - If job location is provided, prefer certifications/internships and market notes relevant to: {job_where}.
-        - For India, mention state/central-level exams or boards when relevant. For abroad, align to the specified country frameworks.
-        Only use these constraints if values are provided; otherwise use globally relevant suggestions.
-        """
-        history_bias = ""
-        if prev_ai:
-            try:
-                top_prev = ", ".join([c.get('title') for c in prev_ai if isinstance(c, dict) and c.get('title')][:5])
-                history_bias = f"""
-                Also consider the user's previous high-match careers: {top_prev}.
-                If consistent with the new analysis, either refine these with better localized colleges and clearer roadmaps,
-                or propose adjacent careers with strong rationale. Avoid exact duplicates without added value.
-                """
-            except Exception:
-                history_bias = ""
-
-        career_prompt = f"""Based on this analysis for a '{group_name}' student:
+    analysis_prompt = f"""Analyze these career-related responses for a student in the '{group_name}' category:
+    {json.dumps(all_answers, indent=2)}
+    {loc_context}
+    {history_context}
+    
+    Provide a detailed analysis of the person's:
+    1. Key strengths
+    2. Work preferences
+    3. Personality traits
+    4. Skill inclinations
+    5. Career goals
+    6. Education and training
+    7. Work experience
+    8. Hobbies and interests
+    9. Values and priorities
+    10. Personal development
+    11. Career aspirations
+    12. Life goals
+    13. Work-life balance
+    14. Stress tolerance
+    15. Adaptability
+    16. Leadership potential
+    17. Teamwork skills
+    18. Communication skills
+    19. Conflict resolution
+    20. Problem-solving
+    21. Decision-making
+    22. Creativity
+    23. Innovation
+    24. Time management
+    25. Work-related stress
+    26. Work-related anxiety
+    27. Work-related depression
+    28. Work-related burnout
+    29. Work-related motivation
+    30. Work-related satisfaction
+    
+    """
+
+    # Step 2: Generate career recommendations with the second AI
+    # Build location constraint guidance for colleges/roadmap
+    def loc_str(parts):
+        return ', '.join([str(v) for v in parts if v])
+    job_where = loc_str([job_loc.get('district'), job_loc.get('state'), job_loc.get('country')])
+    study_where = loc_str([study_loc.get('district'), study_loc.get('state'), study_loc.get('country')])
+    loc_requirements = """
+    When listing colleges and tailoring the roadmap:
+    - If study location is provided, prefer colleges/programs in: {study_where}.
+    - If job location is provided, prefer certifications/internships and market notes relevant to: {job_where}.
+    - For India, mention state/central-level exams or boards when relevant. For abroad, align to the specified country frameworks.
+    Only use these constraints if values are provided; otherwise use globally relevant suggestions.
+    """
+    history_bias = ""
+    if prev_ai:
+        try:
+            top_prev = ", ".join([c.get('title') for c in prev_ai if isinstance(c, dict) and c.get('title')][:5])
+            history_bias = f"""
+            Also consider the user's previous high-match careers: {top_prev}.
+            If consistent with the new analysis, either refine these with better localized colleges and clearer roadmaps,
+            or propose adjacent careers with strong rationale. Avoid exact duplicates without added value.
+            """
+        except Exception:
+            history_bias = ""
+
+    def build_career_prompt(detailed_analysis):
+        return f"""Based on this analysis for a '{group_name}' student:
         {detailed_analysis}
         {loc_requirements}
         {history_bias}
-        
+    
         Recommend 5 best-matching careers. Format as JSON array:
         [
             {{
@@ -334,69 +703,251 @@ def analyze_answers():
         The "scores" must reflect the user's strengths inferred from the analysis and sum is not required; each is an independent 0-100 rating.
         """
 
-        schema_hint = (
+    def build_schema_hint(detailed_analysis):
+        return (
             "Return ONLY a JSON array of 5 objects with keys: 'title' (string), 'match' (number 75-100), 'description' (string), 'scores' (object with keys 'logic','creativity','social','organization' each 0-100),\n"
             "'roadmap' (array of 3 strings: Entry Level, Mid Level, Senior Level), 'colleges' (array of 3-4 objects with 'name', 'program', 'duration', 'location').\n"
             f"Base your recommendations strictly on this analysis for '{group_name}':\n{detailed_analysis}"
         )
-        careers = generate_json_array_with_retry(career_ai, career_prompt, schema_hint)
 
-        # Step 3: Get PDF-based career recommendations (new code)
-        pdf_careers = get_pdf_career_recommendations(detailed_analysis)
-        
-        elapsed = round(time.time() - t0, 2)
-        print(f"Analyze answers completed in {elapsed}s")
-        return jsonify({
-            "ai_generated_careers": careers,
-            "pdf_based_careers": pdf_careers
-        })
+    return analysis_prompt, lambda analysis: (build_career_prompt(analysis), build_schema_hint(analysis))
+
+def build_analysis_stages(data, on_analysis_chunk=None):
+    """Build the /analyze-answers stage graph for a request payload.
+    If on_analysis_chunk is given, the analysis is streamed and each text
+    chunk is passed to it as it arrives."""
+    analysis_prompt, career_prompts = build_analysis_prompts(data)
+
+    def run_analysis():
+        if on_analysis_chunk is None:
+            return generate(summary_ai, analysis_prompt, 'summary').text
+        # Streaming clients get the analysis text as it is generated
+        parts = []
+        for chunk in generate(summary_ai, analysis_prompt, 'summary', stream=True):
+            parts.append(chunk.text)
+            on_analysis_chunk(chunk.text)
+        return "".join(parts)
+
+    def run_careers(analysis):
+        return generate_json_array_with_retry(career_ai, *career_prompts(analysis))
+
+    # Step 3: PDF-based career recommendations. Steps 2 and 3 only need the
+    # analysis, so they run in parallel once step 1 completes.
+    return [
+        Stage("analysis", run_analysis),
+        Stage("careers", run_careers, deps=["analysis"]),
+        Stage("pdf_careers", lambda analysis: get_pdf_career_recommendations(analysis), deps=["analysis"]),
+    ]
+
+def fallback_careers(data, results, error=None):
+    """Local stand-ins for the career lists the model stages did not produce
+    (failed, empty, or cut off by the deadline), ranked from Career-List.pdf
+    against the analysis if it finished, else the answers. Returns
+    ({stage: careers}, reason); ({}, None) when nothing is missing."""
+    missing = [name for name in ('careers', 'pdf_careers') if not results.get(name)]
+    if not missing:
+        return {}, None
+    if isinstance(error, deadline.DeadlineExceeded):
+        reason = 'deadline'
+    elif isinstance(error, CallTimeout):
+        reason = 'timeout'
+    else:
+        reason = 'error' if error is not None else 'empty'
+    log.warning(f"Analysis degraded ({reason}): local careers for {missing}" + (f": {error}" if error else ""))
+    metrics.DEGRADED_RESPONSES.inc(route='/analyze-answers', reason=reason)
+    tracing.annotate(degraded=reason)
+    careers = recommend_locally(results.get('analysis') or answers_text(data.get('final_answers')))
+    return {name: careers for name in missing}, reason
+
+def finish_analysis(data, results, timings, error, t0):
+    """The /analyze-answers response body from the stages that finished,
+    degraded to local recommendations where needed."""
+    fallback, reason = fallback_careers(data, results, error)
+    elapsed = round(time.time() - t0, 2)
+    log.info(f"Analyze answers completed in {elapsed}s", extra={"span": {"stages": timings}})
+    body = {
+        "ai_generated_careers": fallback.get("careers", results.get("careers")),
+        "pdf_based_careers": fallback.get("pdf_careers", results.get("pdf_careers")),
+        "meta": {"elapsed": elapsed, "stages": timings}
+    }
+    if fallback:
+        body["degraded"] = True
+        body["meta"]["degraded"] = {"reason": reason, "stages": sorted(fallback)}
+    return body
+
+def run_full_analysis(data):
+    """Run the full /analyze-answers pipeline for a request payload and
+    return the response body. Stages that fail or miss the deadline are
+    replaced by the local recommender and the body is marked degraded."""
+    t0 = time.time()
+    stages = build_analysis_stages(data)
+    results, timings = {}, {}
+
+    def keep(name, result, seconds):
+        results[name], timings[name] = result, seconds
 
+    try:
+        run_stages(stages, on_complete=keep)
+        error = None
     except Exception as e:
-        print(f"Error in analysis: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        error = e
+    return finish_analysis(data, results, timings, error, t0)
 
-def get_pdf_career_recommendations(detailed_analysis):
-    """Extract careers from PDF and match based on analysis"""
+@app.route('/analyze-answers', methods=['POST'])
+def analyze_answers():
+    t0 = time.time()
     try:
-        # Use cached PDF text (avoids repeated disk I/O and parsing)
-        pdf_text = get_pdf_text()
+        with deadline.budget(ENDPOINT_DEADLINES['analyze-answers']):
+            try:
+                return jsonify(coalesced('analyze-answers', request.json, run_full_analysis))
+            except deadline.DeadlineExceeded as e:
+                # Coalesced onto an identical request that outlived our budget
+                return jsonify(finish_analysis(request.json, {}, {}, e, t0))
 
-        # Use AI to analyze and match careers from PDF
-        pdf_analysis_prompt = f"""
-        Given this detailed analysis of a person:
-        {detailed_analysis}
-        
-        And this list of careers:
-        {pdf_text}
-        
-        Recommend 5 best-matching careers from the PDF list. Format as JSON array:
-        [
-            {{
-                "title": "Career Title from PDF",
-                "match": match_percentage (between 75-100),
-                "description": "Why this career from the PDF matches the person's profile"
-            }}
-        ]
-        """
+    except Exception as e:
+        log.error(f"Error in analysis: {str(e)}")
+        return error_response(e)
+
+# Event names sent by /analyze-answers/stream as each stage completes
+ANALYSIS_STAGE_EVENTS = {
+    "analysis": "analysis",
+    "careers": "ai_generated_careers",
+    "pdf_careers": "pdf_based_careers",
+}
+
+def stream_analysis_done(data, results, timings, error, t0, emit):
+    """Send the local stand-ins for missing career stages through emit(event,
+    payload) and return the "done" payload."""
+    body = finish_analysis(data, results, timings, error, t0)
+    if body.get("degraded"):
+        for name in body["meta"]["degraded"]["stages"]:
+            key = ANALYSIS_STAGE_EVENTS[name]
+            emit((key, {"result": body[key], "seconds": 0, "degraded": True}))
+    done = {"meta": body["meta"]}
+    if body.get("degraded"):
+        done["degraded"] = True
+    return done
+
+# /analyze-answers/stream runs each request's stages from one of these
+# threads while the request thread relays their events; past that many
+# streams at once, new ones get a 503
+ANALYZE_STREAM_WORKERS = int(os.getenv('ANALYZE_STREAM_WORKERS', 16))
+analysis_stream_executor = ThreadPoolExecutor(max_workers=ANALYZE_STREAM_WORKERS, thread_name_prefix='analysis-stream')
+analysis_stream_slots = threading.BoundedSemaphore(ANALYZE_STREAM_WORKERS)
+
+@app.route('/analyze-answers/stream', methods=['POST'])
+def analyze_answers_stream():
+    """Server-sent events variant of /analyze-answers: streams the analysis
+    text, then one event per stage as it finishes, then "done"."""
+    data = request.json
+    if not analysis_stream_slots.acquire(blocking=False):
+        return error_response(Overloaded("Too many analyses in progress, try again shortly", retry_after=5))
+    events = queue.Queue()
+
+    def run():
+        t0 = time.time()
+        results, timings = {}, {}
 
-        schema_hint = (
-            "Return ONLY a JSON array of 5 objects with keys: 'title' (string from PDF list), 'match' (number 75-100), 'description' (string).\n"
-            f"Base your choices strictly on the analysis and the provided PDF careers list."
-        )
-        return generate_json_array_with_retry(career_ai, pdf_analysis_prompt, schema_hint)
+        def keep(name, result, seconds):
+            results[name], timings[name] = result, seconds
+            events.put((ANALYSIS_STAGE_EVENTS[name], {"result": result, "seconds": seconds}))
+
+        try:
+            stages = build_analysis_stages(
+                data, on_analysis_chunk=lambda text: events.put(("analysis_delta", {"text": text}))
+            )
+            with deadline.budget(ENDPOINT_DEADLINES['analyze-answers']):
+                try:
+                    run_stages(stages, on_complete=keep)
+                    error = None
+                except Exception as e:
+                    error = e
+            events.put(("done", stream_analysis_done(data, results, timings, error, t0, events.put)))
+        except Exception as e:
+            log.error(f"Error in analysis stream: {str(e)}")
+            events.put(("error", {"error": str(e)}))
+        finally:
+            analysis_stream_slots.release()
+
+    analysis_stream_executor.submit(contextvars.copy_context().run, run)
+
+    def event_stream():
+        while True:
+            event, payload = events.get()
+            yield sse_event(event, payload)
+            if event in ("done", "error"):
+                return
+
+    return sse_response(event_stream())
+
+def build_pdf_career_prompts(detailed_analysis):
+    """(prompt, schema_hint) for picking careers from the Career-List.pdf shortlist"""
+    # Only the locally ranked shortlist goes into the prompt, not the whole PDF
+    pdf_text = get_pdf_shortlist(detailed_analysis)
+
+    # Use AI to analyze and match careers from PDF
+    pdf_analysis_prompt = f"""
+    Given this detailed analysis of a person:
+    {detailed_analysis}
+    
+    And this list of careers:
+    {pdf_text}
+    
+    Recommend 5 best-matching careers from the PDF list. Format as JSON array:
+    [
+        {{
+            "title": "Career Title from PDF",
+            "match": match_percentage (between 75-100),
+            "description": "Why this career from the PDF matches the person's profile"
+        }}
+    ]
+    """
+
+    schema_hint = (
+        "Return ONLY a JSON array of 5 objects with keys: 'title' (string from PDF list), 'match' (number 75-100), 'description' (string).\n"
+        f"Base your choices strictly on the analysis and this PDF careers list:\n{pdf_text}"
+    )
+    return pdf_analysis_prompt, schema_hint
+
+def get_pdf_career_recommendations(detailed_analysis):
+    """Extract careers from PDF and match based on analysis"""
+    try:
+        return generate_json_array_with_retry(career_ai, *build_pdf_career_prompts(detailed_analysis), site='pdf')
 
     except Exception as e:
-        print(f"Error in PDF career analysis: {str(e)}")
+        log.error(f"Error in PDF career analysis: {str(e)}")
         return []
 
 @app.route('/test-api', methods=['GET'])
 def test_api():
     try:
-        response = question_ai.generate_content("Hello, are you working?")
+        response = generate(question_ai, "Hello, are you working?", 'test')
         return jsonify({"status": "ok", "response": response.text})
     except Exception as e:
-        print(f"API test error: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        log.error(f"API test error: {str(e)}")
+        return error_response(e)
+
+def collect_cache_stats():
+    return {
+        "llm": response_cache.snapshot(),
+        "pages": page_cache.snapshot(),
+        "skill_gap_careers": career_gap_cache.snapshot(),
+        "course_plans": plan_store.snapshot(),
+        "questions": question_prefetcher.snapshot(),
+        "opening_pool": opening_pool.snapshot(),
+        "coalescing": request_flights.snapshot(),
+        "governor": llm_governor.snapshot(),
+        "hedging": dict(llm_hedger.snapshot(), latency=llm_hedger.latency()),
+        "routing": llm_router.snapshot()
+    }
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(collect_cache_stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/list-models', methods=['GET'])
 def list_models():
@@ -405,119 +956,106 @@ def list_models():
         available_models = [model.name for model in models]
         return jsonify({"available_models": available_models})
     except Exception as e:
-        print(f"Error listing models: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        log.error(f"Error listing models: {str(e)}")
+        return error_response(e)
+
+def build_web_search_query(careers):
+    # Create search query based on career matches
+    search_terms = []
+    for career in careers[:2]:  # Use top 2 career matches
+        search_terms.extend([
+            career['title'],
+            career.get('description', '').split('.')[0]  # First sentence only
+        ])
+
+    # Combine search terms
+    return f"alternative careers similar to {' '.join(search_terms)} career path requirements skills"
+
+def rank_web_search_results(pages, careers):
+    """Score fetched (url, fields) pages against the career titles in one
+    batch and return the relevant ones, best first"""
+    search_results = []
+    pages = [
+        (result, page['title'] or "Career Option", page['description'] or "No description available")
+        for result, page in pages
+    ]
+    relevances = relevance_scores(
+        [title + " " + description for _, title, description in pages],
+        [career['title'] for career in careers]
+    )
+    for (result, title, description), relevance in zip(pages, relevances):
+        if relevance > 70:  # Only include relevant results
+            search_results.append({
+                'title': clean_title(title),
+                'description': clean_description(description),
+                'link': result,
+                'relevance': relevance
+            })
+    return sorted(search_results, key=lambda x: x['relevance'], reverse=True)
 
 @app.route('/web-search', methods=['POST'])
 def web_search():
     try:
         data = request.json
         careers = data.get('careers', [])
+        search_query = build_web_search_query(careers)
 
-        # Create search query based on career matches
-        search_terms = []
-        for career in careers[:2]:  # Use top 2 career matches
-            search_terms.extend([
-                career['title'],
-                career.get('description', '').split('.')[0]  # First sentence only
-            ])
-
-        # Combine search terms
-        search_query = f"alternative careers similar to {' '.join(search_terms)} career path requirements skills"
-
-        # Perform web search
-        search_results = []
-        for result in search(search_query, num_results=5):
-            try:
-                # Fetch webpage content
-                response = requests.get(result, timeout=5)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract relevant information
-                title = soup.title.string if soup.title else "Career Option"
-                description = soup.find('meta', {'name': 'description'})
-                description = description['content'] if description else "No description available"
-
-                # Calculate relevance score based on keyword matching
-                relevance = calculate_relevance(
-                    title + " " + description,
-                    [career['title'] for career in careers]
-                )
-
-                if relevance > 70:  # Only include relevant results
-                    search_results.append({
-                        'title': clean_title(title),
-                        'description': clean_description(description),
-                        'link': result,
-                        'relevance': relevance
-                    })
-            except Exception as e:
-                print(f"Error processing search result: {str(e)}")
-                continue
+        # Perform web search and fetch all result pages concurrently
+        deadline_at = time.time() + WEB_SEARCH_DEADLINE
+        pages = fetch_pages(list(search(search_query, num_results=5)), deadline_at, depth='head')
 
         return jsonify({
-            'results': sorted(search_results, key=lambda x: x['relevance'], reverse=True)
+            'results': rank_web_search_results(pages, careers)
         })
 
     except Exception as e:
-        print(f"Web search error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        log.error(f"Web search error: {str(e)}")
+        return error_response(e)
+
+def build_career_search_query(analysis):
+    # Extract key terms from analysis
+    key_terms = extract_key_terms(analysis)
+    
+    # Create search query
+    return f"career paths for people with skills in {key_terms} job requirements and description"
+
+def rank_career_pages(pages, analysis):
+    """Score fetched page fields against the analysis in one batch and return
+    the top matching careers"""
+    careers_found = []
+    scores = match_scores([career_text(page) for page in pages], analysis)
+    for page, score in zip(pages, scores):
+        try:
+            # Extract career information
+            career_info = extract_career_info(page, score)
+            
+            if career_info and career_info['matchScore'] > 60:
+                careers_found.append(career_info)
+                
+        except Exception as e:
+            log.error(f"Error processing result: {str(e)}")
+            continue
+
+    # Sort by match score and return top results
+    careers_found.sort(key=lambda x: x['matchScore'], reverse=True)
+    return careers_found[:5]
 
 @app.route('/search-web-careers', methods=['POST'])
 def search_web_careers():
     try:
         data = request.json
         analysis = data.get('analysis', '')
+        search_query = build_career_search_query(analysis)
 
-        # Extract key terms from analysis
-        key_terms = extract_key_terms(analysis)
-        
-        # Create search query
-        search_query = f"career paths for people with skills in {key_terms} job requirements and description"
-
-        careers_found = []
-        
-        # Perform web search
-        for url in search(search_query, num_results=8):
-            try:
-                # Fetch webpage content
-                response = requests.get(url, timeout=5)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract career information
-                career_info = extract_career_info(soup, analysis)
-                
-                if career_info and career_info['matchScore'] > 60:
-                    careers_found.append(career_info)
-                    
-            except Exception as e:
-                print(f"Error processing result: {str(e)}")
-                continue
+        # Perform web search and fetch all result pages concurrently
+        deadline_at = time.time() + WEB_SEARCH_DEADLINE
+        pages = [page for _, page in fetch_pages(list(search(search_query, num_results=8)), deadline_at)]
 
-        # Sort by match score and return top results
-        careers_found.sort(key=lambda x: x['matchScore'], reverse=True)
-        return jsonify({'careers': careers_found[:5]})
+        return jsonify({'careers': rank_career_pages(pages, analysis)})
 
     except Exception as e:
-        print(f"Web career search error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-def calculate_relevance(text, career_titles):
-    """Calculate relevance score based on keyword matching"""
-    text = text.lower()
-    score = 0
-    
-    # Keywords to look for
-    keywords = set()
-    for title in career_titles:
-        keywords.update(title.lower().split())
-        
-    # Calculate score based on keyword presence
-    for keyword in keywords:
-        if keyword in text:
-            score += 20
-            
-    return min(98, max(70, score))  # Keep score between 70-98
+        log.error(f"Web career search error: {str(e)}")
+        return error_response(e)
 
 def clean_title(title):
     """Clean and format the title"""
@@ -539,59 +1077,35 @@ def extract_key_terms(analysis):
     key_terms = [word for word in words if word not in common_words]
     return ' '.join(key_terms[:10])  # Use top 10 terms
 
-def extract_career_info(soup, analysis):
-    """Extract career information from webpage"""
+def career_text(page):
+    """Title and description of a page, as used for match scoring"""
+    title = page['heading'] or page['title'] or "Career Option"
+    description = page['description'] or page['paragraph'] or "No description available"
+    return title + " " + description
+
+def extract_career_info(page, match_score):
+    """Career information from webpage fields (see html_extract.py), with
+    the page's match score from scoring.match_scores"""
     try:
         # Get title
-        title = soup.find('h1')
-        if not title:
-            title = soup.find('title')
-        title = title.text.strip() if title else "Career Option"
+        title = page['heading'] or page['title'] or "Career Option"
         
-        # Get description
-        description = soup.find('meta', {'name': 'description'})
-        if description:
-            description = description['content']
-        else:
-            # Try to find first paragraph
-            description = soup.find('p')
-            description = description.text if description else "No description available"
+        # Get description, falling back to the first paragraph
+        description = page['description'] or page['paragraph'] or "No description available"
         
-        # Extract skills (look for lists or sections containing "skills")
-        skills = []
-        skill_sections = soup.find_all(['ul', 'ol'], string=re.compile('skill', re.I))
-        for section in skill_sections[:1]:  # Take first skills section
-            skills.extend([li.text.strip() for li in section.find_all('li')][:5])
-        
-        # Calculate match score
-        match_score = calculate_match_score(title + " " + description, analysis)
+        skills = page['skills']
         
         return {
             'title': clean_text(title, 100),
             'description': clean_text(description, 200),
             'keySkills': skills if skills else None,
             'matchScore': match_score,
-            'sourceLink': soup.url
+            'sourceLink': page['url']
         }
     except Exception as e:
-        print(f"Error extracting career info: {str(e)}")
+        log.error(f"Error extracting career info: {str(e)}")
         return None
 
-def calculate_match_score(text, analysis):
-    """Calculate match score between text and analysis"""
-    text = text.lower()
-    analysis = analysis.lower()
-    
-    # Extract key terms from analysis
-    analysis_terms = set(analysis.split())
-    
-    # Count matching terms
-    matches = sum(1 for term in analysis_terms if term in text)
-    
-    # Calculate score (base 60, up to 95)
-    score = 60 + (matches * 35 / len(analysis_terms))
-    return min(95, max(60, round(score)))
-
 def clean_text(text, max_length):
     """Clean and truncate text"""
     text = re.sub(r'\s+', ' ', text).strip()
@@ -599,207 +1113,417 @@ def clean_text(text, max_length):
         text = text[:max_length] + "..."
     return text
 
-@app.route('/skill-gap', methods=['POST'])
-def skill_gap():
-    try:
-        data = request.json or {}
-        all_answers = data.get('final_answers') or data.get('answers') or []
-        group_name = data.get('group_name') or data.get('group_type') or data.get('groupType') or 'General'
-        target_careers = data.get('target_careers') or data.get('careers') or []
-        preferences = data.get('preferences', {}) or {}
-        job_loc = preferences.get('jobLocation', {}) or {}
-        study_loc = preferences.get('studyLocation', {}) or {}
-
-        # Compact answers to reduce token size
-        try:
-            compact_answers = [
-                {
-                    'q': (qa.get('question') or '')[:140],
-                    'a': (qa.get('answer') or '')[:200]
-                }
-                for qa in (all_answers if isinstance(all_answers, list) else [])
-            ][:25]
-        except Exception:
-            compact_answers = []
-
-        loc_context = f"""
-        Personalization context:
-        - Group: {group_name}
-        - Job location preference: country={job_loc.get('country')}, state={job_loc.get('state')}, district={job_loc.get('district')}
-        - Study location preference: country={study_loc.get('country')}, state={study_loc.get('state')}, district={study_loc.get('district')}
-        Only apply location constraints if present.
-        """
+def build_skill_profile_prompt(data, infer_careers=False):
+    """Prompt extracting the user's current skills from their answers (and,
+    when no target careers were sent, 3 likely careers)"""
+    all_answers = data.get('final_answers') or data.get('answers') or []
+    group_name = data.get('group_name') or data.get('group_type') or data.get('groupType') or 'General'
 
-        careers_hint = (
-            f"Target careers to analyze: {json.dumps(target_careers)}" if target_careers else
-            "If no target careers are provided, infer 3 likely careers from the answers and analyze those."
-        )
+    # Compact answers to reduce token size
+    try:
+        compact_answers = [
+            {
+                'q': (qa.get('question') or '')[:140],
+                'a': (qa.get('answer') or '')[:200]
+            }
+            for qa in (all_answers if isinstance(all_answers, list) else [])
+        ][:25]
+    except Exception:
+        compact_answers = []
 
-        prompt = f"""
-        You are an expert career coach. From the following compact answers, extract the user's current skills and compare
-        against required skills for the target careers. Then produce a personalized plan to close the gaps.
+    careers_hint = (
+        '"careers": ["3 likely career titles inferred from the answers"]' if infer_careers else '"careers": []'
+    )
 
-        Answers (compact JSON):\n{json.dumps(compact_answers, ensure_ascii=False)}
-        {loc_context}
-        {careers_hint}
+    return f"""
+    You are an expert career coach. From the following compact answers of a '{group_name}' user, extract the
+    skills they already have.
+
+    Answers (compact JSON):\n{json.dumps(compact_answers, ensure_ascii=False)}
+
+    Return ONLY valid JSON in this exact schema:
+    {{
+      "userSkills": {{
+        "core": ["..."],
+        "technical": ["..."],
+        "soft": ["..."],
+        "tools": ["..."],
+        "certifications": ["..."]
+      }},
+      {careers_hint}
+    }}
+
+    Notes:
+    - Only list skills the answers give evidence for; keep each skill to a few words.
+    - Return ONLY JSON. No markdown fences or extra text.
+    """
 
-        Return ONLY valid JSON in this exact schema:
-        {{
-          "userSkills": {{
-            "core": ["..."],
-            "technical": ["..."],
-            "soft": ["..."],
-            "tools": ["..."],
-            "certifications": ["..."]
-          }},
-          "careers": [
-            {{
-              "title": "Career Title",
-              "match": 75-100,
-              "requiredSkills": {{
-                "core": ["..."],
-                "technical": ["..."],
-                "soft": ["..."],
-                "tools": ["..."],
-                "certifications": ["..."]
-              }},
-              "gaps": {{
-                "missing": ["skills the user lacks"],
-                "toStrengthen": ["skills to improve"],
-                "notes": "very short rationale"
-              }},
-              "recommendations": {{
-                "courses": [{{"title":"...","provider":"Coursera/edX/YouTube","url":"https://..."}}],
-                "projects": [{{"title":"...","description":"1-2 lines","steps":["step 1","step 2"]}}],
-                "certifications": ["..."]
-              }},
-              "next90DaysPlan": {{
-                "day0_30": ["..."],
-                "day31_60": ["..."],
-                "day61_90": ["..."]
-              }},
-              "metrics": ["e.g., build 2 projects, 10 LeetCode easy, pass XYZ cert"]
-            }}
-          ]
-        }}
+def build_career_gap_prompt(title, user_skills, preferences):
+    """Prompt analyzing one target career against the user's skills. It only
+    depends on what skill_gap.career_key() covers, so results can be cached."""
+    job_loc = (preferences or {}).get('jobLocation', {}) or {}
+    study_loc = (preferences or {}).get('studyLocation', {}) or {}
+
+    loc_context = f"""
+    Personalization context:
+    - Job location preference: country={job_loc.get('country')}, state={job_loc.get('state')}, district={job_loc.get('district')}
+    - Study location preference: country={study_loc.get('country')}, state={study_loc.get('state')}, district={study_loc.get('district')}
+    Only apply location constraints if present.
+    """
 
-        Notes:
-        - Tailor courses/providers to the user's locations when possible (e.g., local colleges, state boards, country-specific certs).
-        - Prefer beginner-friendly, reputable resources. Include at least 1 free option.
-        - Keep text concise; avoid long paragraphs.
-        - Return ONLY JSON. No markdown fences or extra text.
-        """
+    return f"""
+    You are an expert career coach. Compare the user's current skills against the skills required for the career
+    "{title}", then produce a personalized plan to close the gaps.
+
+    User skills (JSON):\n{json.dumps(user_skills, ensure_ascii=False)[:1500]}
+    {loc_context}
+
+    Return ONLY valid JSON in this exact schema:
+    {{
+      "title": "{title}",
+      "match": 75-100,
+      "requiredSkills": {{
+        "core": ["..."],
+        "technical": ["..."],
+        "soft": ["..."],
+        "tools": ["..."],
+        "certifications": ["..."]
+      }},
+      "gaps": {{
+        "missing": ["skills the user lacks"],
+        "toStrengthen": ["skills to improve"],
+        "notes": "very short rationale"
+      }},
+      "recommendations": {{
+        "courses": [{{"title":"...","provider":"Coursera/edX/YouTube","url":"https://..."}}],
+        "projects": [{{"title":"...","description":"1-2 lines","steps":["step 1","step 2"]}}],
+        "certifications": ["..."]
+      }},
+      "next90DaysPlan": {{
+        "day0_30": ["..."],
+        "day31_60": ["..."],
+        "day61_90": ["..."]
+      }},
+      "metrics": ["e.g., build 2 projects, 10 LeetCode easy, pass XYZ cert"]
+    }}
+
+    Notes:
+    - Tailor courses/providers to the user's locations when possible (e.g., local colleges, state boards, country-specific certs).
+    - Prefer beginner-friendly, reputable resources. Include at least 1 free option.
+    - Keep text concise; avoid long paragraphs.
+    - Return ONLY JSON. No markdown fences or extra text.
+    """
 
-        resp = career_ai.generate_content(prompt)
-        raw = (resp.text or "").strip()
-        try:
-            parsed = json.loads(raw)
-        except Exception:
-            parsed = extract_json_from_text(raw)
-        if not parsed or not isinstance(parsed, dict):
-            raise ValueError("Model did not return a valid JSON object for skill gap analysis.")
+def skill_gap_targets(data, profile):
+    """(user_skills, careers to analyze, preferences) once the profile is in"""
+    user_skills = profile.get('userSkills') or {}
+    titles = target_titles(data) or target_titles({'careers': profile.get('careers')})[:3]
+    return user_skills, titles, data.get('preferences', {}) or {}
+
+def run_skill_gap(data):
+    """Run the skill gap analysis for a request payload: extract the user's
+    skills once, then analyze each target career in parallel, reusing cached
+    careers (see skill_gap.py). Raises if the skills can't be extracted or no
+    career could be analyzed."""
+    profile = generate_structured(
+        career_ai, build_skill_profile_prompt(data, infer_careers=not target_titles(data)), 'skill_gap_profile')
+    user_skills, titles, preferences = skill_gap_targets(data, profile)
+    tracing.annotate(careers=len(titles))
+
+    def analyze(title):
+        career = cached_career(title, user_skills, preferences)
+        if career is None:
+            career = generate_structured(
+                career_ai, build_career_gap_prompt(title, user_skills, preferences), 'skill_gap_career')
+            store_career(title, user_skills, preferences, career)
+        return career
+
+    return merge_skill_gap(user_skills, titles, fan_out(titles, analyze))
 
-        return jsonify(parsed)
+@app.route('/skill-gap', methods=['POST'])
+def skill_gap():
+    try:
+        with deadline.budget(ENDPOINT_DEADLINES['skill-gap']):
+            return jsonify(coalesced('skill-gap', request.json or {}, run_skill_gap))
     except Exception as e:
-        print(f"Skill gap analysis error: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        log.error(f"Skill gap analysis error: {str(e)}")
+        return error_response(e)
+
+# Server-side chat sessions; older turns are folded into a summary by summary_ai
+chat_sessions = create_session_store(lambda prompt: generate(summary_ai, prompt, 'chat_summary').text)
+
+def build_chat_prompt(data):
+    """Return (prompt, conversation_id) for a chat request. Requests carrying a
+    conversationId (empty to start one) use the server-side session and only
+    need to send the new message; others send their full chatHistory."""
+    message = data.get('message')
+    conversation_id = None
+
+    if 'conversationId' in data:
+        conversation_id = data.get('conversationId') or chat_sessions.new_id()
+        context = chat_sessions.context(conversation_id, message or '', data.get('chatHistory'))
+    else:
+        chat_history = data.get('chatHistory', [])
+
+        # Format chat history for context
+        context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
+    
+    # Create prompt for Gemini
+    prompt = f"""You are a helpful career guidance assistant. Continue this conversation:
+    {context}
+    user: {message}
+    assistant:"""
+    return prompt, conversation_id
 
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
         data = request.json
-        message = data.get('message')
-        chat_history = data.get('chatHistory', [])
-
-        # Format chat history for context
-        context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
-        
-        # Create prompt for Gemini
-        prompt = f"""You are a helpful career guidance assistant. Continue this conversation:
-        {context}
-        user: {message}
-        assistant:"""
+        prompt, conversation_id = build_chat_prompt(data)
         
         # Generate response
-        response = question_ai.generate_content(prompt)
+        response = generate(question_ai, prompt, 'chat')
         
-        return jsonify({
+        result = {
             "status": "success",
             "response": response.text
-        })
+        }
+        if conversation_id:
+            chat_sessions.record(conversation_id, data.get('message'), response.text)
+            result["conversationId"] = conversation_id
+        return jsonify(result)
         
     except Exception as e:
-        print(f"Chat error: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        log.error(f"Chat error: {str(e)}")
+        return error_response(e, {"status": "error", "message": str(e)})
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Server-sent events variant of /chat: one "token" event per generated
+    chunk, then "done" with the full response."""
+
+    def event_stream():
+        try:
+            data = request.json
+            prompt, conversation_id = build_chat_prompt(data)
+            parts = []
+            for chunk in generate(question_ai, prompt, 'chat', stream=True):
+                parts.append(chunk.text)
+                yield sse_event("token", {"text": chunk.text})
+            result = {"status": "success", "response": "".join(parts)}
+            if conversation_id:
+                chat_sessions.record(conversation_id, data.get('message'), result["response"])
+                result["conversationId"] = conversation_id
+            yield sse_event("done", result)
+        except Exception as e:
+            log.error(f"Chat stream error: {str(e)}")
+            yield sse_event("error", {"status": "error", "message": str(e)})
+
+    return sse_response(event_stream())
+
+def build_course_plan_prompt(data):
+    career_title = data.get('careerTitle') or data.get('career')
+    course = data.get('course') or {}
+    user_skills = data.get('userSkills') or {}
+    gaps = data.get('gaps') or {}
+
+    # Build a concise prompt for a 90-day plan aligned to the selected course
+    course_name = course.get('title') or course.get('name') or 'Selected Course'
+    provider = course.get('provider') or course.get('platform')
+    link = course.get('link') or course.get('url')
+
+    return f"""
+    Create a practical 90-day learning plan tailored to prepare for the career: {career_title}.
+    Align the plan specifically with the selected course: {course_name}{' (' + provider + ')' if provider else ''}{' - ' + link if link else ''}.
+
+    Consider the user's current skills and gaps provided as JSON.
+    User skills: {json.dumps(user_skills)[:1200]}
+    Gaps: {json.dumps(gaps)[:800]}
+
+    Requirements:
+    - Structure the output as JSON ONLY with keys day0_30, day31_60, day61_90.
+    - Each value should be an array of 4-6 concise, actionable bullet steps (strings).
+    - Reference the course content pacing (e.g., modules/chapters) and integrate short projects, practice, and checkpoints.
+    - Include at least one measurable metric per period (e.g., quiz score, project milestone, practice problem counts).
+    - Keep language concise and beginner-friendly.
+
+    Example JSON shape:
+    {{
+      "day0_30": ["..."],
+      "day31_60": ["..."],
+      "day61_90": ["..."]
+    }}
+    """
+
+def normalize_course_plan(parsed):
+    # Normalize alternative keys
+    return {
+        'day0_30': parsed.get('day0_30') or parsed.get('days0_30') or parsed.get('days0to30') or parsed.get('Days 0-30') or [],
+        'day31_60': parsed.get('day31_60') or parsed.get('days31_60') or parsed.get('days31to60') or parsed.get('Days 31-60') or [],
+        'day61_90': parsed.get('day61_90') or parsed.get('days61_90') or parsed.get('days61to90') or parsed.get('Days 61-90') or [],
+    }
+
+def generate_course_plan(data):
+    """Build the 90-day plan for a course. Raises on model or parse errors."""
+    return normalize_course_plan(generate_structured(career_ai, build_course_plan_prompt(data), 'course_plan'))
+
+def precompute_course_plan(data):
+    """generate_course_plan() for refreshes and the plan_store.py batch job."""
+    with llm_governor.priority(BACKGROUND):
+        return generate_course_plan(data)
+
+# Plans are served from plan_store.py when a stored plan for the same career
+# and course has the same or similar gaps; stale ones are refreshed in the background
+PLAN_STORE = os.getenv('PLAN_STORE', 'true').lower() in ('1', 'true', 'yes')
+
+def run_course_plan(data):
+    if PLAN_STORE:
+        stored = plan_store.lookup(data)
+        tracing.annotate(plan_store=stored['match'] if stored else 'miss')
+        if stored:
+            if stored['stale']:
+                plan_store.refresh_later(data, precompute_course_plan)
+            return stored['plan']
+    plan = generate_course_plan(data)
+    if PLAN_STORE:
+        plan_store.put(data, plan)
+    return plan
 
 @app.route('/course-plan', methods=['POST'])
 def course_plan():
     try:
         data = request.json or {}
-        career_title = data.get('careerTitle') or data.get('career')
-        course = data.get('course') or {}
-        user_skills = data.get('userSkills') or {}
-        gaps = data.get('gaps') or {}
-
-        if not career_title or not course:
+        if not (data.get('careerTitle') or data.get('career')) or not data.get('course'):
             return jsonify({"error": "careerTitle and course are required"}), 400
 
-        # Build a concise prompt for a 90-day plan aligned to the selected course
-        course_name = course.get('title') or course.get('name') or 'Selected Course'
-        provider = course.get('provider') or course.get('platform')
-        link = course.get('link') or course.get('url')
-
-        prompt = f"""
-        Create a practical 90-day learning plan tailored to prepare for the career: {career_title}.
-        Align the plan specifically with the selected course: {course_name}{' (' + provider + ')' if provider else ''}{' - ' + link if link else ''}.
-
-        Consider the user's current skills and gaps provided as JSON.
-        User skills: {json.dumps(user_skills)[:1200]}
-        Gaps: {json.dumps(gaps)[:800]}
-
-        Requirements:
-        - Structure the output as JSON ONLY with keys day0_30, day31_60, day61_90.
-        - Each value should be an array of 4-6 concise, actionable bullet steps (strings).
-        - Reference the course content pacing (e.g., modules/chapters) and integrate short projects, practice, and checkpoints.
-        - Include at least one measurable metric per period (e.g., quiz score, project milestone, practice problem counts).
-        - Keep language concise and beginner-friendly.
-
-        Example JSON shape:
-        {{
-          "day0_30": ["..."],
-          "day31_60": ["..."],
-          "day61_90": ["..."]
-        }}
-        """
-
-        resp = career_ai.generate_content(prompt)
-        raw = (resp.text or '').strip()
-        try:
-            parsed = json.loads(raw)
-        except Exception:
-            parsed = extract_json_from_text(raw)
-        if not parsed or not isinstance(parsed, dict):
-            raise ValueError("Model did not return a valid JSON object for course plan")
-
-        # Normalize alternative keys
-        plan = {
-            'day0_30': parsed.get('day0_30') or parsed.get('days0_30') or parsed.get('days0to30') or parsed.get('Days 0-30') or [],
-            'day31_60': parsed.get('day31_60') or parsed.get('days31_60') or parsed.get('days31to60') or parsed.get('Days 31-60') or [],
-            'day61_90': parsed.get('day61_90') or parsed.get('days61_90') or parsed.get('days61to90') or parsed.get('Days 61-90') or [],
-        }
-
+        with deadline.budget(ENDPOINT_DEADLINES['course-plan']):
+            plan = coalesced('course-plan', data, run_course_plan)
         return jsonify({ 'plan': plan })
     except Exception as e:
-        print(f"Course plan error: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        log.error(f"Course plan error: {str(e)}")
+        return error_response(e)
+
+# Long-running endpoints that can also be submitted as background jobs
+job_queue = create_job_queue({
+    'analyze-answers': run_full_analysis,
+    'skill-gap': run_skill_gap,
+})
+
+metrics.register_collector(
+    "llm_cache_events", "Gemini response cache lookups by result",
+    lambda: [({"result": k}, v) for k, v in response_cache.snapshot().items() if k != "hit_rate"]
+)
+metrics.register_collector(
+    "page_cache_events", "Scraped page cache lookups by result",
+    lambda: [({"result": k}, v) for k, v in page_cache.snapshot().items() if v is not None]
+)
+metrics.register_collector(
+    "skill_gap_cache_events", "Per-career skill gap cache lookups by result",
+    lambda: [({"result": k}, v) for k, v in career_gap_cache.snapshot().items() if k != "hit_rate"]
+)
+metrics.register_collector(
+    "plan_store_events", "Course plan store lookups, writes and refreshes",
+    lambda: [({"result": k}, v) for k, v in plan_store.snapshot().items() if k != "hit_rate" and v is not None]
+)
+metrics.register_collector(
+    "question_prefetch_events", "Speculative question prefetch lookups and spend",
+    lambda: [({"result": k}, v) for k, v in question_prefetcher.snapshot().items() if k != "hit_rate"]
+)
+metrics.register_collector(
+    "opening_pool_events", "Opening question pool lookups and refreshes",
+    lambda: [({"result": k}, v) for k, v in opening_pool.snapshot().items() if k not in ("histories", "age")]
+)
+metrics.register_collector(
+    "stage_pool", "Analysis stages submitted and abandoned (abandoned_running still hold a thread)",
+    lambda: [({"stat": k}, v) for k, v in stage_pool.snapshot().items()]
+)
+metrics.register_collector(
+    "request_coalescing", "Requests computed vs. coalesced onto an identical request in flight",
+    lambda: [({"stat": k}, v) for k, v in request_flights.snapshot().items()]
+)
+metrics.register_collector(
+    "llm_governor", "Gemini call admission, throttling and concurrency limit",
+    lambda: [({"stat": k}, v) for k, v in llm_governor.snapshot().items()]
+)
+metrics.register_collector(
+    "llm_hedging", "Model calls, hedged duplicates sent and won, and timeouts",
+    lambda: [({"stat": k}, v) for k, v in llm_hedger.snapshot().items()]
+)
+metrics.register_collector(
+    "llm_site_latency_seconds",
+    "Rolling model call latency quantiles by call site, to the full response or a stream's first chunk",
+    lambda: [({"site": site, "measure": measure, "quantile": q}, stats[key])
+             for site, measures in llm_hedger.latency().items() for measure, stats in measures.items()
+             for key, q in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99"))]
+)
+metrics.register_collector(
+    "llm_model_error_rate", "Recent error rate of each routed model (moving average)",
+    lambda: [({"model": name}, state["error_rate"]) for name, state in llm_router.snapshot()["models"].items()]
+)
+metrics.register_collector(
+    "llm_model_cut_off", "1 while a routed model is skipped after repeated errors",
+    lambda: [({"model": name}, int(state["cut_off"])) for name, state in llm_router.snapshot()["models"].items()]
+)
+metrics.register_collector(
+    "llm_route_latency_seconds", "Moving average latency of each model at each call site",
+    lambda: [({"site": e["site"], "measure": e["measure"], "model": e["model"]}, e["seconds"])
+             for e in llm_router.snapshot()["latency"]]
+)
+metrics.register_collector(
+    "job_queue", "Background job queue state",
+    lambda: [({"stat": k}, v) for k, v in job_queue.snapshot().items()]
+)
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    try:
+        job_id = job_queue.submit(kind, request.json or {})
+        return jsonify(job_queue.get(job_id)), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        log.error(f"Job submit error: {str(e)}")
+        return error_response(e)
+
+@app.route('/jobs/metrics', methods=['GET'])
+def job_metrics():
+    return jsonify(job_queue.snapshot())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events for a job: "status" on each state change, then
+    "done" with the result or "error"."""
+    if not job_queue.get(job_id):
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    def event_stream():
+        last_status = None
+        while True:
+            job = job_queue.get(job_id)
+            if not job:
+                yield sse_event("error", {"error": "Job not found or expired"})
+                return
+            if job["status"] in ("done", "error"):
+                yield sse_event(job["status"], job)
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield sse_event("status", {"jobId": job_id, "status": last_status})
+            job_queue.wait(job_id, 15)
+
+    return sse_response(event_stream())
 
 if __name__ == '__main__':
     try:
         port = int(os.getenv("PORT", 5002))
-        print(f"Starting Flask server on port {port}...")
+        log.info(f"Starting Flask server on port {port}...")
         app.run(debug=False, port=port, host='0.0.0.0')
     except Exception as e:
-        print(f"Error starting Flask server: {str(e)}")
\ No newline at end of file
+        log.error(f"Error starting Flask server: {str(e)}")
\ No newline at end of file
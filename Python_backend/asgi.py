@@ -0,0 +1,493 @@
+"""ASGI serving mode: the routes and JSON contracts of app.py, with async
+handlers.
+
+    uvicorn --factory asgi:create_app --host 0.0.0.0 --port 5002 --workers 2
+    hypercorn "asgi:create_app()" --bind 0.0.0.0:5002 --workers 2
+
+Model calls use the async Gemini API (app.agenerate) and page fetches use
+httpx (async_fetcher.py), so a request waiting on Gemini or a slow site
+costs a coroutine rather than an OS thread and a handful of processes can
+keep thousands of calls in flight. Prompts, parsing, caches, the governor,
+request coalescing and the stores are shared with app.py, which is imported
+as the core. Sync-only calls that can block (Google search, listing
+models, waiting on a prefetched question, building the career index) and
+every read or write of a SQLite store or pool file (skill gap cache, job
+queue, chat sessions, plan store, opening pool) run in a thread via
+asyncio.to_thread, so a slow disk never stalls the event loop.
+"""
+import asyncio
+import logging
+import time
+
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+
+import app as core
+import async_fetcher
+import deadline
+import metrics
+import skill_gap
+import tracing
+from governor import Overloaded
+from hedging import CallTimeout
+from jobs import payload_hash
+
+log = logging.getLogger(__name__)
+
+# How often job event streams re-read the job store
+JOB_POLL_INTERVAL = 0.5
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'  # keep proxies from buffering the stream
+}
+
+
+def error_response(e, body=None):
+    """Quart counterpart of app.error_response()."""
+    response = jsonify(body if body is not None else {"error": str(e)})
+    response.status_code = 500
+    if isinstance(e, Overloaded):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+    elif isinstance(e, (deadline.DeadlineExceeded, CallTimeout)):
+        response.status_code = 504
+    return response
+
+
+def sse_response(events):
+    """Stream an async iterable of formatted SSE strings to the client"""
+    return Response(events, mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+def coalesced(kind, payload, fn):
+    """Async app.coalesced(): await fn(payload), sharing the result with
+    identical requests in flight."""
+    return core.request_flights.do_async(payload_hash(kind, payload), lambda: fn(payload))
+
+
+async def within_deadline(coro, what):
+    """Await coro, cancelling it with DeadlineExceeded once the request's
+    budget runs out."""
+    try:
+        return await asyncio.wait_for(coro, deadline.remaining())
+    except asyncio.TimeoutError:
+        raise deadline.DeadlineExceeded(f"{what} did not finish in time") from None
+
+
+async def timed_stage(name, coro):
+    t0 = time.time()
+    with tracing.span("stage", stage=name):
+        result = await coro
+    return result, round(time.time() - t0, 2)
+
+
+async def next_question(previous_qa):
+    question_data = await core.agenerate_structured(
+        core.question_ai, core.build_question_prompt(previous_qa), 'question')
+    return {'question': question_data['question'], 'options': question_data['options']}
+
+
+async def question_batch(previous_qa):
+    return core.split_question_batch(await core.agenerate_structured(
+        core.question_ai, core.build_question_batch_prompt(previous_qa), 'question_batch'))
+
+
+async def pdf_career_recommendations(detailed_analysis):
+    try:
+        # Ranking the catalog is CPU work and builds the index on first use
+        prompt, hint = await asyncio.to_thread(core.build_pdf_career_prompts, detailed_analysis)
+        return await core.agenerate_structured(core.career_ai, prompt, 'pdf', kind='array', retry_prompt=hint)
+    except Exception as e:
+        log.error(f"Error in PDF career analysis: {str(e)}")
+        return []
+
+
+async def run_analysis_stages(data, on_analysis_chunk=None, on_complete=None):
+    """The /analyze-answers stages: the analysis, then the model and PDF
+    career picks concurrently. Returns (results, timings) like
+    pipeline.run_stages."""
+    analysis_prompt, career_prompts = core.build_analysis_prompts(data)
+    results, timings = {}, {}
+
+    def complete(name, outcome):
+        results[name], timings[name] = outcome
+        if on_complete:
+            on_complete(name, results[name], timings[name])
+
+    async def analysis():
+        if on_analysis_chunk is None:
+            return (await core.agenerate(core.summary_ai, analysis_prompt, 'summary')).text
+        parts = []
+        async for chunk in await core.agenerate(core.summary_ai, analysis_prompt, 'summary', stream=True):
+            parts.append(chunk.text)
+            on_analysis_chunk(chunk.text)
+        return "".join(parts)
+
+    async def stage(name, coro):
+        complete(name, await timed_stage(name, coro))
+
+    await stage("analysis", analysis())
+    prompt, hint = career_prompts(results["analysis"])
+    await asyncio.gather(
+        stage("careers", core.agenerate_structured(core.career_ai, prompt, 'career', kind='array', retry_prompt=hint)),
+        stage("pdf_careers", pdf_career_recommendations(results["analysis"])),
+    )
+    return results, timings
+
+
+async def run_analysis_within_deadline(data, on_analysis_chunk=None, on_complete=None):
+    """run_analysis_stages() under the request's deadline. Returns (results,
+    timings, error) with whatever stages finished before an error."""
+    results, timings = {}, {}
+
+    def keep(name, result, seconds):
+        results[name], timings[name] = result, seconds
+        if on_complete:
+            on_complete(name, result, seconds)
+
+    try:
+        await within_deadline(run_analysis_stages(data, on_analysis_chunk, keep), "Analysis stages")
+        error = None
+    except Exception as e:
+        error = e
+    return results, timings, error
+
+
+async def run_full_analysis(data):
+    t0 = time.time()
+    results, timings, error = await run_analysis_within_deadline(data)
+    # Ranking the catalog is CPU work
+    return await asyncio.to_thread(core.finish_analysis, data, results, timings, error, t0)
+
+
+async def run_skill_gap(data):
+    profile = await core.agenerate_structured(
+        core.career_ai, core.build_skill_profile_prompt(data, infer_careers=not skill_gap.target_titles(data)),
+        'skill_gap_profile')
+    user_skills, titles, preferences = core.skill_gap_targets(data, profile)
+    tracing.annotate(careers=len(titles))
+
+    async def analyze(title):
+        career = await asyncio.to_thread(skill_gap.cached_career, title, user_skills, preferences)
+        if career is None:
+            career = await core.agenerate_structured(
+                core.career_ai, core.build_career_gap_prompt(title, user_skills, preferences), 'skill_gap_career')
+            await asyncio.to_thread(skill_gap.store_career, title, user_skills, preferences, career)
+        return career
+
+    return skill_gap.merge(user_skills, titles, await skill_gap.afan_out(titles, analyze))
+
+
+async def run_course_plan(data):
+    if core.PLAN_STORE:
+        stored = await asyncio.to_thread(core.plan_store.lookup, data)
+        tracing.annotate(plan_store=stored['match'] if stored else 'miss')
+        if stored:
+            if stored['stale']:
+                core.plan_store.refresh_later(data, core.precompute_course_plan)
+            return stored['plan']
+    plan = core.normalize_course_plan(
+        await core.agenerate_structured(core.career_ai, core.build_course_plan_prompt(data), 'course_plan'))
+    if core.PLAN_STORE:
+        await asyncio.to_thread(core.plan_store.put, data, plan)
+    return plan
+
+
+async def google_search(query, num_results):
+    return await asyncio.to_thread(lambda: list(core.search(query, num_results=num_results)))
+
+
+def create_app():
+    """Build the ASGI app. Background jobs, caches and the governor are the
+    ones app.py created for this process."""
+    quart_app = cors(Quart(__name__), allow_origin="*")
+
+    @quart_app.before_request
+    async def start_request_timer():
+        g.request_started = time.time()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.end_span = tracing.start_span("request", route=route, method=request.method)
+
+    @quart_app.after_request
+    async def record_request_latency(response):
+        started = getattr(g, 'request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.REQUEST_LATENCY.observe(
+                time.time() - started, route=route, method=request.method, status=response.status_code
+            )
+            tracing.annotate(http_status=response.status_code)
+        return response
+
+    @quart_app.teardown_request
+    async def end_request_span(exc=None):
+        end_span = g.pop('end_span', None)
+        if end_span:
+            end_span(exc)
+
+    @quart_app.after_serving
+    async def close_http_client():
+        await async_fetcher.aclose()
+
+    @quart_app.route('/generate-question', methods=['POST'])
+    async def generate_question():
+        try:
+            data = await request.get_json()
+            previous_qa = data.get('previousQA', [])
+            tracing.annotate(previous_qa=len(previous_qa))
+
+            question_data = None
+            if core.OPENING_POOL:
+                question_data = await asyncio.to_thread(core.opening_pool.take, previous_qa)
+                tracing.annotate(pooled=question_data is not None)
+            if question_data is None and (core.QUESTION_PREFETCH or core.QUESTION_BATCH):
+                question_data = await asyncio.to_thread(
+                    core.question_prefetcher.take, previous_qa, core.QUESTION_PREFETCH_WAIT)
+                tracing.annotate(prefetched=question_data is not None)
+            if question_data is None and core.QUESTION_BATCH:
+                question_data, follow_ups = await question_batch(previous_qa)
+                core.question_prefetcher.stash(previous_qa, question_data, follow_ups)
+            if question_data is None:
+                question_data = await next_question(previous_qa)
+            if core.QUESTION_PREFETCH:
+                core.question_prefetcher.speculate(previous_qa, question_data)
+
+            if tracing.LOG_PAYLOADS:
+                log.debug("Generated question", extra={"span": {"payload": question_data}})
+
+            return jsonify({"question": question_data})
+
+        except Exception as e:
+            log.error(f"Error generating question: {str(e)}")
+            if isinstance(e, Overloaded):
+                return error_response(e)
+            return jsonify({"error": str(e) if str(e) else "Failed to generate question"}), 500
+
+    @quart_app.route('/analyze-answers', methods=['POST'])
+    async def analyze_answers():
+        try:
+            t0 = time.time()
+            data = await request.get_json()
+            with deadline.budget(core.ENDPOINT_DEADLINES['analyze-answers']):
+                try:
+                    return jsonify(await coalesced('analyze-answers', data, run_full_analysis))
+                except deadline.DeadlineExceeded as e:
+                    # Coalesced onto an identical request that outlived our budget
+                    return jsonify(await asyncio.to_thread(core.finish_analysis, data, {}, {}, e, t0))
+        except Exception as e:
+            log.error(f"Error in analysis: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/analyze-answers/stream', methods=['POST'])
+    async def analyze_answers_stream():
+        data = await request.get_json()
+        events = asyncio.Queue()
+
+        async def run():
+            t0 = time.time()
+            try:
+                with deadline.budget(core.ENDPOINT_DEADLINES['analyze-answers']):
+                    results, timings, error = await run_analysis_within_deadline(
+                        data,
+                        on_analysis_chunk=lambda text: events.put_nowait(("analysis_delta", {"text": text})),
+                        on_complete=lambda name, result, seconds: events.put_nowait(
+                            (core.ANALYSIS_STAGE_EVENTS[name], {"result": result, "seconds": seconds})
+                        ),
+                    )
+                # Fallback events are collected off the loop, then queued here
+                fallback = []
+                done = await asyncio.to_thread(
+                    core.stream_analysis_done, data, results, timings, error, t0, fallback.append)
+                for event in fallback + [("done", done)]:
+                    events.put_nowait(event)
+            except Exception as e:
+                log.error(f"Error in analysis stream: {str(e)}")
+                events.put_nowait(("error", {"error": str(e)}))
+
+        async def event_stream():
+            task = asyncio.ensure_future(run())
+            try:
+                while True:
+                    event, payload = await events.get()
+                    yield core.sse_event(event, payload)
+                    if event in ("done", "error"):
+                        return
+            finally:
+                # Client went away: stop generating for it
+                task.cancel()
+
+        return sse_response(event_stream())
+
+    @quart_app.route('/test-api', methods=['GET'])
+    async def test_api():
+        try:
+            response = await core.agenerate(core.question_ai, "Hello, are you working?", 'test')
+            return jsonify({"status": "ok", "response": response.text})
+        except Exception as e:
+            log.error(f"API test error: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/cache-stats', methods=['GET'])
+    async def cache_stats():
+        return jsonify(core.collect_cache_stats())
+
+    @quart_app.route('/metrics', methods=['GET'])
+    async def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @quart_app.route('/list-models', methods=['GET'])
+    async def list_models():
+        try:
+            models = await asyncio.to_thread(lambda: list(core.genai.list_models()))
+            return jsonify({"available_models": [model.name for model in models]})
+        except Exception as e:
+            log.error(f"Error listing models: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/web-search', methods=['POST'])
+    async def web_search():
+        try:
+            data = await request.get_json()
+            careers = data.get('careers', [])
+            search_query = core.build_web_search_query(careers)
+
+            deadline_at = time.time() + core.WEB_SEARCH_DEADLINE
+            urls = await google_search(search_query, 5)
+            pages = await async_fetcher.afetch_pages(urls, deadline_at, depth='head')
+
+            return jsonify({'results': core.rank_web_search_results(pages, careers)})
+        except Exception as e:
+            log.error(f"Web search error: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/search-web-careers', methods=['POST'])
+    async def search_web_careers():
+        try:
+            data = await request.get_json()
+            analysis = data.get('analysis', '')
+            search_query = core.build_career_search_query(analysis)
+
+            deadline_at = time.time() + core.WEB_SEARCH_DEADLINE
+            urls = await google_search(search_query, 8)
+            pages = [page for _, page in await async_fetcher.afetch_pages(urls, deadline_at)]
+
+            return jsonify({'careers': core.rank_career_pages(pages, analysis)})
+        except Exception as e:
+            log.error(f"Web career search error: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/skill-gap', methods=['POST'])
+    async def skill_gap():
+        try:
+            data = await request.get_json() or {}
+            with deadline.budget(core.ENDPOINT_DEADLINES['skill-gap']):
+                return jsonify(await coalesced('skill-gap', data, run_skill_gap))
+        except Exception as e:
+            log.error(f"Skill gap analysis error: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/chat', methods=['POST'])
+    async def chat():
+        try:
+            data = await request.get_json()
+            prompt, conversation_id = await asyncio.to_thread(core.build_chat_prompt, data)
+
+            response = await core.agenerate(core.question_ai, prompt, 'chat')
+
+            result = {
+                "status": "success",
+                "response": response.text
+            }
+            if conversation_id:
+                await asyncio.to_thread(core.chat_sessions.record, conversation_id, data.get('message'), response.text)
+                result["conversationId"] = conversation_id
+            return jsonify(result)
+
+        except Exception as e:
+            log.error(f"Chat error: {str(e)}")
+            return error_response(e, {"status": "error", "message": str(e)})
+
+    @quart_app.route('/chat/stream', methods=['POST'])
+    async def chat_stream():
+        data = await request.get_json()
+        prompt, conversation_id = await asyncio.to_thread(core.build_chat_prompt, data)
+
+        async def event_stream():
+            try:
+                parts = []
+                async for chunk in await core.agenerate(core.question_ai, prompt, 'chat', stream=True):
+                    parts.append(chunk.text)
+                    yield core.sse_event("token", {"text": chunk.text})
+                result = {"status": "success", "response": "".join(parts)}
+                if conversation_id:
+                    await asyncio.to_thread(core.chat_sessions.record, conversation_id, data.get('message'),
+                                            result["response"])
+                    result["conversationId"] = conversation_id
+                yield core.sse_event("done", result)
+            except Exception as e:
+                log.error(f"Chat stream error: {str(e)}")
+                yield core.sse_event("error", {"status": "error", "message": str(e)})
+
+        return sse_response(event_stream())
+
+    @quart_app.route('/course-plan', methods=['POST'])
+    async def course_plan():
+        try:
+            data = await request.get_json() or {}
+            if not (data.get('careerTitle') or data.get('career')) or not data.get('course'):
+                return jsonify({"error": "careerTitle and course are required"}), 400
+
+            with deadline.budget(core.ENDPOINT_DEADLINES['course-plan']):
+                plan = await coalesced('course-plan', data, run_course_plan)
+            return jsonify({'plan': plan})
+        except Exception as e:
+            log.error(f"Course plan error: {str(e)}")
+            return error_response(e)
+
+    # Jobs run on app.py's thread pool; these handlers only submit and read them
+    @quart_app.route('/jobs/<kind>', methods=['POST'])
+    async def submit_job(kind):
+        try:
+            job_id = await asyncio.to_thread(core.job_queue.submit, kind, await request.get_json() or {})
+            return jsonify(await asyncio.to_thread(core.job_queue.get, job_id)), 202
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 404
+        except Exception as e:
+            log.error(f"Job submit error: {str(e)}")
+            return error_response(e)
+
+    @quart_app.route('/jobs/metrics', methods=['GET'])
+    async def job_metrics():
+        return jsonify(await asyncio.to_thread(core.job_queue.snapshot))
+
+    @quart_app.route('/jobs/<job_id>', methods=['GET'])
+    async def get_job(job_id):
+        job = await asyncio.to_thread(core.job_queue.get, job_id)
+        if not job:
+            return jsonify({"error": "Job not found or expired"}), 404
+        return jsonify(job)
+
+    @quart_app.route('/jobs/<job_id>/events', methods=['GET'])
+    async def job_events(job_id):
+        if not await asyncio.to_thread(core.job_queue.get, job_id):
+            return jsonify({"error": "Job not found or expired"}), 404
+
+        async def event_stream():
+            last_status = None
+            while True:
+                job = await asyncio.to_thread(core.job_queue.get, job_id)
+                if not job:
+                    yield core.sse_event("error", {"error": "Job not found or expired"})
+                    return
+                if job["status"] in ("done", "error"):
+                    yield core.sse_event(job["status"], job)
+                    return
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    yield core.sse_event("status", {"jobId": job_id, "status": last_status})
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+
+        return sse_response(event_stream())
+
+    return quart_app
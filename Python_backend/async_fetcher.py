@@ -0,0 +1,120 @@
+"""asyncio counterpart of fetcher.py, used by the ASGI app (asgi.py).
+
+Pages are fetched with one shared httpx.AsyncClient, so a slow host costs a
+coroutine rather than a pooled thread. The limits match fetcher.py: at most
+FETCH_WORKERS connections overall, FETCH_PER_HOST per host, and afetch_pages()
+returns whatever finished before the caller's deadline. Fields are extracted
+with the same streaming parser and stored in the same page cache, whose
+SQLite reads and writes run in a thread (asyncio.to_thread).
+"""
+import asyncio
+import logging
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+import metrics
+import tracing
+from fetcher import FETCH_PER_HOST, FETCH_TIMEOUT, FETCH_WORKERS, HostSlots, _satisfies
+from html_extract import CHUNK_SIZE, StreamReader
+from page_cache import page_cache
+
+log = logging.getLogger(__name__)
+
+_client = None
+_host_slots = HostSlots(lambda: asyncio.Semaphore(FETCH_PER_HOST))
+
+
+def client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={"User-Agent": "Mozilla/5.0 (compatible; CareerGlimpse/1.0)"},
+            limits=httpx.Limits(max_connections=FETCH_WORKERS, max_keepalive_connections=FETCH_WORKERS),
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _fetch_page_fields(url, depth, timeout):
+    entry = await asyncio.to_thread(page_cache.get, url)
+    if entry and not _satisfies(entry["fields"], depth):
+        entry = None
+    if entry and entry["fresh"]:
+        page_cache.count("fresh_hits")
+        await asyncio.to_thread(page_cache.touch, url)
+        return entry["fields"], "fresh"
+
+    try:
+        async with _host_slots.checkout(url):
+            request = client().build_request("GET", url, headers=page_cache.validators(entry), timeout=timeout)
+            response = await client().send(request, stream=True)
+            try:
+                if response.status_code == 304 and entry:
+                    page_cache.count("revalidated")
+                    await asyncio.to_thread(page_cache.touch, url, refreshed=True)
+                    return entry["fields"], "revalidated"
+
+                page_cache.count("misses")
+                reader = StreamReader(depth, encoding=response.encoding or 'utf-8')
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    if reader.feed(chunk):
+                        break
+            finally:
+                await response.aclose()
+    finally:
+        _host_slots.checkin(url)
+
+    fields = reader.parser.fields
+    fields['url'] = str(response.url)
+    fields['depth'] = depth
+    if response.is_success:
+        await asyncio.to_thread(
+            page_cache.put, url, fields,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return fields, "fetched"
+
+
+async def _fetch_page(url, depth, timeout):
+    t0 = time.time()
+    outcome = "error"
+    with tracing.span("fetch", host=urlparse(url).netloc, depth=depth) as attrs:
+        try:
+            fields, outcome = await _fetch_page_fields(url, depth, timeout)
+            return fields
+        finally:
+            attrs["outcome"] = outcome
+            metrics.FETCH_LATENCY.observe(time.time() - t0, outcome=outcome)
+
+
+async def afetch_pages(urls, deadline_at, depth="body", timeout=FETCH_TIMEOUT):
+    """Async fetcher.fetch_pages(): [(url, fields), ...] in input order for
+    the pages that were fetched before `deadline_at` (a time.time() value)."""
+    tasks = {asyncio.ensure_future(_fetch_page(url, depth, timeout)): url for url in urls}
+    if not tasks:
+        return []
+    done, not_done = await asyncio.wait(list(tasks), timeout=max(0, deadline_at - time.time()))
+    for task in not_done:
+        task.cancel()
+    if not_done:
+        log.info("Fetch deadline reached; skipped %d of %d pages", len(not_done), len(tasks))
+
+    results = []
+    for task, url in tasks.items():
+        if task not in done:
+            continue
+        try:
+            results.append((url, task.result()))
+        except Exception as e:
+            log.warning("Error fetching %s: %s", url, e)
+    return results
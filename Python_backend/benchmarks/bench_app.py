@@ -0,0 +1,28 @@
+"""app.py as the load test serves it. With BENCH_PAGES_URL set, Google
+search is answered with result pages from the fake server (fake_gemini.py)
+so /web-search and /search-web-careers can be driven without hitting Google.
+
+    gunicorn --pythonpath benchmarks bench_app:app     (from Python_backend/)
+"""
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend
+
+PAGES_URL = os.getenv("BENCH_PAGES_URL")
+
+if PAGES_URL:
+    def search(query, num_results=10):
+        # One URL set per query, so distinct payloads miss the page cache
+        tag = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        return [f"{PAGES_URL}/pages/{i}?q={tag}" for i in range(num_results)]
+
+    backend.search = search
+
+app = backend.app
+
+if __name__ == "__main__":
+    app.run(port=int(os.getenv("PORT", 5002)), host="127.0.0.1", threaded=True)
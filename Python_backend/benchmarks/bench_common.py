@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmark scripts: percentiles and result files
+that can be compared across commits (see compare.py)."""
+import json
+import os
+import platform
+import subprocess
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(seconds):
+    """Latency summary, in milliseconds, of a list of durations in seconds."""
+    values = sorted(seconds)
+    ms = lambda s: None if s is None else round(s * 1000, 3)
+    return {
+        "count": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_header(kind, config):
+    return {
+        "benchmark": kind,
+        "revision": git_revision(),
+        "timestamp": round(time.time()),
+        "python": platform.python_version(),
+        "config": config,
+    }
+
+
+def write_results(results, path=None):
+    """Print results as JSON, or write them to path."""
+    text = json.dumps(results, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
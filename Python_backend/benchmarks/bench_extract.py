@@ -0,0 +1,81 @@
+"""Compare full-document BeautifulSoup parsing with the bounded streaming
+extractor in html_extract.py.
+
+Usage (from Python_backend/):
+    python benchmarks/bench_extract.py                 # synthetic pages
+    python benchmarks/bench_extract.py URL [URL ...]   # real pages
+    python benchmarks/bench_extract.py --json          # machine-readable output
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bs4 import BeautifulSoup
+
+from html_extract import CHUNK_SIZE, parse_stream
+
+
+def synthetic_page(body_kb):
+    head = (
+        "<html><head><title>Data Scientist Career Guide</title>"
+        "<meta name='description' content='What data scientists do, skills and salary.'>"
+        + "<script>var x = 1;</script>" * 50
+        + "</head><body><h1>Data Scientist</h1><p>Data scientists analyse data.</p>"
+        "<h2>Key skills</h2><ul><li>Python</li><li>Statistics</li><li>SQL</li>"
+        "<li>Machine learning</li><li>Communication</li></ul>"
+    )
+    filler = "<div class='c'><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p></div>"
+    body = filler * (body_kb * 1024 // len(filler))
+    return (head + body + "</body></html>").encode("utf-8")
+
+
+def before(raw):
+    t0 = time.perf_counter()
+    soup = BeautifulSoup(raw.decode("utf-8", errors="replace"), "html.parser")
+    soup.title and soup.title.string
+    soup.find("meta", {"name": "description"})
+    soup.find("h1")
+    soup.find("p")
+    soup.find_all(["ul", "ol"])
+    return len(raw), time.perf_counter() - t0
+
+
+def after(raw, depth):
+    chunks = (raw[i:i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE))
+    t0 = time.perf_counter()
+    _, read = parse_stream(chunks, depth)
+    return read, time.perf_counter() - t0
+
+
+def main(argv):
+    as_json = "--json" in argv
+    urls = [a for a in argv if not a.startswith("--")]
+    if urls:
+        pages = [(u, requests.get(u, timeout=10).content) for u in urls]
+    else:
+        pages = [(f"synthetic-{kb}KB", synthetic_page(kb)) for kb in (64, 512, 2048)]
+
+    rows = []
+    for name, raw in pages:
+        full_bytes, full_s = before(raw)
+        row = {"page": name, "before": {"bytes": full_bytes, "parse_ms": round(full_s * 1000, 2)}}
+        for depth in ("head", "body"):
+            read, secs = after(raw, depth)
+            row[depth] = {"bytes": read, "parse_ms": round(secs * 1000, 2)}
+        rows.append(row)
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'page':<28}{'before bytes':>14}{'ms':>9}{'head bytes':>12}{'ms':>8}{'body bytes':>12}{'ms':>8}")
+    for r in rows:
+        print(f"{r['page'][:27]:<28}{r['before']['bytes']:>14}{r['before']['parse_ms']:>9}"
+              f"{r['head']['bytes']:>12}{r['head']['parse_ms']:>8}{r['body']['bytes']:>12}{r['body']['parse_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
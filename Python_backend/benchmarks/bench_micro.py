@@ -0,0 +1,127 @@
+"""Microbenchmarks for the CPU-bound helpers on the request path.
+
+- career catalog: parsing Career-List.pdf (what get_pdf_text used to do on
+  every request), loading the cached index, and ranking it for an analysis
+- JSON extraction: parse/repair of model output and the streaming scanner
+- scoring: the batch TF-IDF match and relevance scorers
+
+Usage (from Python_backend/):
+    python benchmarks/bench_micro.py [--repeat N] [--only career,json,scoring] [--out results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import result_header, summarize, write_results
+from bench_scoring import VOCAB, words
+
+import career_index
+from scoring import match_scores, relevance_scores
+from structured_output import SCHEMAS, JsonScanner, parse, validate
+
+
+def measure(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    stats = summarize(samples)
+    stats["ops_per_sec"] = round(repeat / sum(samples), 1) if sum(samples) else None
+    return stats
+
+
+def career_cases(analysis, repeat):
+    index_path = os.path.join(tempfile.mkdtemp(), "career_index.json")
+    career_index.build_index(index_path=index_path)
+    records = career_index.load_index(index_path=index_path)
+    ranker = career_index.CareerRanker(records)
+    return {
+        # Parsing the PDF is slow, so it gets a few rounds only
+        "career.parse_pdf": lambda: measure(lambda: career_index.build_index(index_path=index_path), max(1, repeat // 20)),
+        "career.load_index": lambda: measure(lambda: career_index.load_index(index_path=index_path), repeat),
+        "career.build_ranker": lambda: measure(lambda: career_index.CareerRanker(records), repeat),
+        "career.shortlist": lambda: measure(
+            lambda: career_index.format_shortlist(ranker.top(analysis, 40)), repeat),
+    }
+
+
+def json_cases(repeat):
+    skill_gap = json.dumps({
+        "userSkills": {"core": ["maths"], "technical": ["python"], "soft": [], "tools": [], "certifications": []},
+        "careers": [{"title": f"Career {i}", "match": 80 + i, "requiredSkills": {"core": ["x"] * 5},
+                     "gaps": {"missing": ["y"] * 5, "notes": "short"}} for i in range(5)],
+    }, indent=2)
+    careers = json.dumps([{"title": f"Career {i}", "match": 90, "description": "d" * 200} for i in range(5)])
+    fenced = "Here you go:\n```json\n" + skill_gap + "\n```\nLet me know!"
+    truncated = careers[:-40]
+    trailing = careers.replace("}]", "},]")
+
+    def stream(text, kind, size=64):
+        scanner = JsonScanner(kind)
+        for i in range(0, len(text), size):
+            scanner.feed(text[i:i + size])
+            if scanner.complete:
+                break
+        return scanner
+
+    return {
+        "json.parse_object": lambda: measure(lambda: parse(skill_gap, "object"), repeat),
+        "json.parse_fenced": lambda: measure(lambda: parse(fenced, "object"), repeat),
+        "json.parse_array": lambda: measure(lambda: parse(careers, "array"), repeat),
+        "json.repair_truncated": lambda: measure(lambda: parse(truncated, "array"), repeat),
+        "json.repair_trailing_comma": lambda: measure(lambda: parse(trailing, "array"), repeat),
+        "json.stream_scan": lambda: measure(lambda: stream(skill_gap, "object"), repeat),
+        "json.validate_career_gap": lambda: measure(
+            lambda: validate(json.loads(skill_gap)["careers"][0], SCHEMAS["skill_gap_career"]), repeat),
+    }
+
+
+def scoring_cases(analysis, repeat):
+    rng = random.Random(7)
+    pages = [words(60, rng) for _ in range(8)]
+    titles = ["Data Scientist", "Software Engineer"]
+    return {
+        "scoring.match_scores": lambda: measure(lambda: match_scores(pages, analysis), repeat),
+        "scoring.relevance_scores": lambda: measure(lambda: relevance_scores(pages, titles), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000, help="analysis length in words")
+    parser.add_argument("--only", default="career,json,scoring")
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(","))
+    rng = random.Random(42)
+    analysis = words(args.words, rng) + " " + " ".join(VOCAB)
+
+    cases = {}
+    if "career" in groups:
+        cases.update(career_cases(analysis, args.repeat))
+    if "json" in groups:
+        cases.update(json_cases(args.repeat))
+    if "scoring" in groups:
+        cases.update(scoring_cases(analysis, args.repeat))
+
+    results = result_header("micro", {"repeat": args.repeat, "analysis_words": args.words})
+    results["cases"] = {}
+    for name, run in cases.items():
+        results["cases"][name] = stats = run()
+        print(f"{name:<28}{stats['p50_ms']:>10} ms p50{stats['p95_ms']:>10} ms p95", file=sys.stderr)
+    write_results(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
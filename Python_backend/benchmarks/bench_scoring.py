@@ -0,0 +1,86 @@
+"""Throughput of the batch TF-IDF scorer in scoring.py against the previous
+per-page substring scorers.
+
+Usage (from Python_backend/):
+    python benchmarks/bench_scoring.py [--pages N] [--words N] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import match_scores, relevance_scores
+
+VOCAB = (
+    "data analysis software engineer design creative logical teamwork leadership communication "
+    "problem solving research science biology chemistry physics mathematics statistics finance "
+    "marketing sales management teaching healthcare nursing medicine law journalism media art "
+    "music architecture construction agriculture environment policy technology cloud security"
+).split()
+
+
+def legacy_match_score(text, analysis):
+    text = text.lower()
+    analysis_terms = set(analysis.lower().split())
+    matches = sum(1 for term in analysis_terms if term in text)
+    score = 60 + (matches * 35 / len(analysis_terms))
+    return min(95, max(60, round(score)))
+
+
+def legacy_relevance(text, career_titles):
+    text = text.lower()
+    keywords = set()
+    for title in career_titles:
+        keywords.update(title.lower().split())
+    score = sum(20 for keyword in keywords if keyword in text)
+    return min(98, max(70, score))
+
+
+def words(n, rng):
+    return " ".join(rng.choice(VOCAB) + str(rng.randint(0, 400)) * (rng.random() < 0.5) for _ in range(n))
+
+
+def rate(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--words", type=int, default=3000, help="analysis length in words")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    analysis = words(args.words, rng)
+    pages = [words(60, rng) for _ in range(args.pages)]
+    titles = ["Data Scientist", "Software Engineer"]
+
+    results = {
+        "pages": args.pages,
+        "analysis_words": args.words,
+        "batches_per_sec": {
+            "legacy_match": round(rate(lambda: [legacy_match_score(p, analysis) for p in pages], args.repeat), 1),
+            "tfidf_match": round(rate(lambda: match_scores(pages, analysis), args.repeat), 1),
+            "legacy_relevance": round(rate(lambda: [legacy_relevance(p, titles) for p in pages], args.repeat), 1),
+            "tfidf_relevance": round(rate(lambda: relevance_scores(pages, titles), args.repeat), 1),
+        },
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.pages} pages, {args.words}-word analysis (scored batches per second):")
+        for name, value in results["batches_per_sec"].items():
+            print(f"  {name:<18}{value:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare two result files from load_test.py or bench_micro.py, e.g. from
+before and after a change.
+
+Usage (from Python_backend/):
+    python benchmarks/compare.py before.json after.json [--threshold 5]
+"""
+import argparse
+import json
+
+# Metrics where a larger number is better; for everything else lower is better
+HIGHER_IS_BETTER = ("throughput_rps", "ops_per_sec")
+METRICS = ("throughput_rps", "ops_per_sec", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+
+def rows(results):
+    for name, stats in (results.get("routes") or results.get("cases") or {}).items():
+        for metric in METRICS:
+            if stats.get(metric) is not None:
+                yield name, metric, stats[metric]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=5.0, help="percent change flagged as a difference")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    old = {(name, metric): value for name, metric, value in rows(before)}
+
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    print(f"{'case':<28}{'metric':<16}{'before':>12}{'after':>12}{'change':>10}")
+    for name, metric, value in rows(after):
+        prev = old.get((name, metric))
+        if prev is None:
+            continue
+        if not prev:
+            print(f"{name:<28}{metric:<16}{prev:>12}{value:>12}{'n/a':>10}")
+            continue
+        change = (value - prev) / prev * 100
+        better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+        flag = "" if abs(change) < args.threshold else ("  better" if better else "  worse")
+        print(f"{name:<28}{metric:<16}{prev:>12}{value:>12}{change:>+9.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Local stand-in for the Gemini REST API, for load tests.
+
+Answers generateContent and streamGenerateContent with canned responses
+after a configurable delay, so the backend can be driven hard without
+spending quota or depending on Google's latency. Start the backend with
+GEMINI_API_ENDPOINT=http://127.0.0.1:PORT to use it (only the Flask app:
+the async client in google-generativeai has no REST transport).
+
+Responses are picked by the first fixture whose "match" string occurs in
+the prompt. The defaults below cover every call site; --fixtures loads a
+JSON list of {"match": ..., "response": ...} objects that take precedence
+(a non-string response is sent as JSON text). --throttle-rate answers that
+fraction of calls with 429 RESOURCE_EXHAUSTED (or, with --throttle-status
+503, UNAVAILABLE) to exercise the governor.
+--model-latency gives some models their own latency (e.g.
+"gemini-1.5-flash-8b=0.3,gemini-1.5-pro=2") to exercise LLM_ROUTES.
+GET /pages/N serves a small career page for the web search routes.
+
+Usage (from Python_backend/):
+    python benchmarks/fake_gemini.py --port 8765 --latency 0.8 --jitter 0.2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_QUESTION = {"question": "Which kind of task do you enjoy most?",
+             "options": ["Solving puzzles", "Helping people", "Designing things", "Leading a team"]}
+_CAREERS = [
+    {"title": "Data Scientist", "match": 92, "description": "Strong analytical profile.",
+     "scores": {"logic": 90, "creativity": 60, "social": 50, "organization": 70},
+     "roadmap": ["Entry Level: Python, statistics", "Mid Level: ML projects", "Senior Level: lead a team"],
+     "colleges": [{"name": "IIT Madras", "program": "B.Tech Data Science", "duration": "4 years", "location": "Chennai"}]},
+    {"title": "Software Engineer", "match": 88, "description": "Enjoys building things.",
+     "scores": {"logic": 85, "creativity": 70, "social": 45, "organization": 65},
+     "roadmap": ["Entry Level: one language well", "Mid Level: system design", "Senior Level: architecture"],
+     "colleges": [{"name": "NIT Trichy", "program": "B.Tech CSE", "duration": "4 years", "location": "Trichy"}]},
+]
+_PLAN = {"day0_30": ["Finish modules 1-3", "Build a small project"],
+         "day31_60": ["Finish modules 4-6", "Score 80% on the quiz"],
+         "day61_90": ["Capstone project", "Publish it on GitHub"]}
+_SKILL_GAP = {
+    "userSkills": {"core": ["maths"], "technical": ["python"], "soft": ["teamwork"], "tools": [], "certifications": []},
+    "careers": [{"title": "Data Scientist", "match": 90,
+                 "requiredSkills": {"core": ["statistics"], "technical": ["python", "sql"], "soft": [], "tools": [], "certifications": []},
+                 "gaps": {"missing": ["sql"], "toStrengthen": ["statistics"], "notes": "Close the SQL gap first."},
+                 "recommendations": {"courses": [], "projects": [], "certifications": []},
+                 "next90DaysPlan": _PLAN, "metrics": ["2 projects"]}],
+}
+
+# Checked in order; the first marker found in the prompt wins. Prompts quote
+# the user's answers and earlier output, so the most specific markers go first.
+DEFAULT_FIXTURES = [
+    {"match": "running summary", "response": "The user is exploring data careers."},
+    {"match": "opening questions", "response": [_QUESTION] * 5},
+    {"match": "Provide a detailed analysis", "response": "Strengths: analytical thinking and curiosity. " * 20},
+    {"match": "best-matching careers", "response": _CAREERS},
+    {"match": '"requiredSkills"', "response": _SKILL_GAP["careers"][0]},
+    {"match": '"followUps"', "response": dict(_QUESTION, followUps=[_QUESTION] * 4)},
+    {"match": '"userSkills"', "response": _SKILL_GAP},
+    {"match": "day0_30", "response": _PLAN},
+    {"match": '"question"', "response": _QUESTION},
+    {"match": "", "response": "A career in data science could suit you well. " * 5},
+]
+
+
+class FakeGemini:
+    def __init__(self, latency=0.5, jitter=0.0, throttle_rate=0.0, stream_chunks=8, fixtures=None,
+                 model_latency=None, throttle_status=429):
+        self.latency = latency
+        self.model_latency = dict(model_latency or {})
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.throttle_status = throttle_status
+        self.stream_chunks = stream_chunks
+        self.fixtures = list(fixtures or []) + DEFAULT_FIXTURES
+        self.stats = {"calls": 0, "streamed": 0, "throttled": 0, "models": {}}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def respond(self, prompt):
+        for fixture in self.fixtures:
+            if fixture["match"] in prompt:
+                response = fixture["response"]
+                return response if isinstance(response, str) else json.dumps(response)
+        return ""
+
+    def delay(self, model=None):
+        latency = self.model_latency.get(model, self.latency)
+        with self._lock:
+            return max(0.0, latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def throttled(self):
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def bump(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def bump_model(self, model):
+        with self._lock:
+            self.stats["models"][model] = self.stats["models"].get(model, 0) + 1
+
+    def serve(self, host="127.0.0.1", port=0):
+        """Start serving in a daemon thread; returns (server, base_url)."""
+        server = ThreadingHTTPServer((host, port), _handler(self))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"http://{host}:{server.server_port}"
+
+
+_PAGE = (
+    "<html><head><title>Data Scientist career guide {n}</title>"
+    "<meta name='description' content='Data Scientist and Software Engineer career paths, skills and salary.'>"
+    "</head><body><h1>Data Scientist</h1><p>Data scientists turn data into decisions.</p>"
+    "<h2>Key skills</h2><ul><li>Python</li><li>Statistics</li><li>SQL</li></ul></body></html>"
+)
+
+
+_THROTTLE_ERRORS = {
+    429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted"),
+    503: ("UNAVAILABLE", "The model is overloaded"),
+}
+
+
+def _candidate(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith("/pages/"):
+                # Result pages for /web-search, which the load test points
+                # its stubbed Google search at
+                time.sleep(fake.delay() / 4)
+                data = _PAGE.format(n=self.path.rsplit("/", 1)[-1]).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            with fake._lock:
+                self._send(200, dict(fake.stats, models=dict(fake.stats["models"])))
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = " ".join(
+                part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+            )
+            stream = ":streamGenerateContent" in self.path
+            # /v1beta/models/<model>:generateContent
+            model = self.path.split("?")[0].rsplit("/", 1)[-1].split(":")[0]
+            fake.bump("calls")
+            fake.bump_model(model)
+            time.sleep(fake.delay(model))
+            if fake.throttled():
+                fake.bump("throttled")
+                status, message = _THROTTLE_ERRORS[fake.throttle_status]
+                self._send(fake.throttle_status, {"error": {"code": fake.throttle_status, "message": message,
+                                                            "status": status}})
+                return
+            text = fake.respond(prompt)
+            if not stream:
+                self._send(200, dict(_candidate(text), usageMetadata={
+                    "promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}))
+                return
+            fake.bump("streamed")
+            size = max(1, -(-len(text) // fake.stream_chunks))
+            chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            self._send(200, [_candidate(chunk) for chunk in chunks])
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_model_latency(spec):
+    """{model: seconds} from "model=seconds,..."."""
+    pairs = (item.split("=", 1) for item in (spec or "").split(",") if "=" in item)
+    return {model.strip(): float(seconds) for model, seconds in pairs}
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to the latency")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls answered 429")
+    parser.add_argument("--throttle-status", type=int, choices=sorted(_THROTTLE_ERRORS), default=429)
+    parser.add_argument("--model-latency", help="per-model seconds per call, as model=seconds,...")
+    parser.add_argument("--fixtures", help="JSON file of {match, response} objects")
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.latency, args.jitter, args.throttle_rate,
+                      fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+                      model_latency=parse_model_latency(args.model_latency), throttle_status=args.throttle_status)
+    server, url = fake.serve(args.host, args.port)
+    print(f"Fake Gemini listening on {url} (GET / for call counts)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
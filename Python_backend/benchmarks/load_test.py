@@ -0,0 +1,204 @@
+"""Load test the backend routes against the local Gemini stand-in.
+
+Starts fake_gemini.py in-process and the backend (bench_app.py) as a
+subprocess pointed at it, with its caches and stores in a temporary
+directory, then drives each route at the given concurrency and reports
+throughput, error counts and p50/p95/p99 latency per route as JSON.
+
+Every request carries a distinct payload so caches and request coalescing
+don't answer it; pass --repeat-payloads to measure the warm path instead.
+
+Usage (from Python_backend/):
+    python benchmarks/load_test.py --concurrency 32 --requests 200 --latency 0.8 --out before.json
+    python benchmarks/load_test.py --routes chat,skill-gap --throttle-rate 0.05 --env GEMINI_MAX_CONCURRENCY=8
+    python benchmarks/load_test.py --routes chat --model-latency gemini-1.5-flash-8b=0.2 \
+        --env "LLM_ROUTES=chat=gemini-1.5-flash,gemini-1.5-flash-8b"
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_common import BACKEND_DIR, result_header, summarize, write_results
+from fake_gemini import FakeGemini, load_fixtures, parse_model_latency
+
+ANSWERS = ["Solving puzzles", "Helping people", "Designing things", "Leading a team"]
+
+# route -> payload for the i-th request
+PAYLOADS = {
+    "generate-question": lambda i: {"previousQA": [
+        {"question": "Which kind of task do you enjoy most?", "answer": ANSWERS[i % 4]},
+        {"question": f"Follow-up {i}", "answer": ANSWERS[(i // 4) % 4]},
+    ]},
+    "analyze-answers": lambda i: {"group_name": "Undergraduate", "final_answers": [
+        {"question": "Which kind of task do you enjoy most?", "answer": f"{ANSWERS[i % 4]} ({i})"},
+        {"question": "What do you want from work?", "answer": "Growth and stability"},
+    ]},
+    "skill-gap": lambda i: {"target_careers": ["Data Scientist"], "answers": [
+        {"question": "Which tools have you used?", "answer": f"Python and Excel ({i})"},
+    ]},
+    "course-plan": lambda i: {"careerTitle": "Data Scientist",
+                              "course": {"title": f"Machine Learning {i}", "provider": "Coursera"}},
+    "chat": lambda i: {"message": f"What should I study to become a data scientist? ({i})", "chatHistory": []},
+    "web-search": lambda i: {"careers": [{"title": "Data Scientist", "description": f"Works with data ({i})."}]},
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(args, fake_url, workdir):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": env.get("GEMINI_API_KEY") or "AIzaBenchmarkKey",
+        "GEMINI_API_ENDPOINT": fake_url,
+        "BENCH_PAGES_URL": fake_url,
+        "PORT": str(port),
+        "LOG_LEVEL": "WARNING",
+        "JOBS_DB": os.path.join(workdir, "jobs.db"),
+        "CHAT_SESSIONS_DB": os.path.join(workdir, "chat_sessions.db"),
+        "PAGE_CACHE_DB": os.path.join(workdir, "page_cache.db"),
+        "PLAN_STORE_DB": os.path.join(workdir, "plan_store.db"),
+        "OPENING_POOL_PATH": os.path.join(workdir, "question_pool.json"),
+    })
+    env.pop("LLM_CACHE_DB", None)
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+
+    if args.server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "--pythonpath", "benchmarks", "-b", f"127.0.0.1:{port}",
+               "-w", str(args.workers), "-k", "gthread", "--threads", str(args.threads),
+               "--timeout", "120", "bench_app:app"]
+    else:
+        cmd = [sys.executable, os.path.join("benchmarks", "bench_app.py")]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {proc.returncode} (rerun with --verbose)")
+        try:
+            requests.get(base + "/cache-stats", timeout=1)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("Backend did not start within 60s")
+
+
+def drive(base, route, count, concurrency, repeat_payloads, offset):
+    local = threading.local()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        payload = PAYLOADS[route](0 if repeat_payloads else offset + i)
+        t0 = time.perf_counter()
+        try:
+            status = session.post(f"{base}/{route}", json=payload, timeout=300).status_code
+        except requests.RequestException:
+            status = "error"
+        return time.perf_counter() - t0, status
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - t0
+
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [seconds for seconds, status in results if status == 200]
+    return dict(
+        summarize(ok),
+        requests=count,
+        errors=count - len(ok),
+        statuses=statuses,
+        elapsed_s=round(elapsed, 3),
+        throughput_rps=round(len(ok) / elapsed, 2) if elapsed else None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", default=",".join(PAYLOADS), help="comma-separated, from: " + ", ".join(PAYLOADS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=4, help="requests per route before measuring")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of fake calls answered 429")
+    parser.add_argument("--model-latency", help="per-model fake latency as model=seconds,... (pair with "
+                                                 "--env LLM_ROUTES=...)")
+    parser.add_argument("--fixtures", help="JSON fixtures for the fake model (see fake_gemini.py)")
+    parser.add_argument("--server", choices=("gunicorn", "flask"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--repeat-payloads", action="store_true", help="send the same payload every time")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra backend env")
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show backend logs")
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in PAYLOADS]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    fake = FakeGemini(args.latency, args.jitter, args.throttle_rate,
+                      fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+                      model_latency=parse_model_latency(args.model_latency))
+    fake_server, fake_url = fake.serve()
+    results = result_header("load", {
+        k: getattr(args, k) for k in
+        ("requests", "concurrency", "latency", "jitter", "throttle_rate", "model_latency", "server", "workers", "threads",
+         "repeat_payloads", "env")
+    })
+    results["routes"] = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        proc, base = start_backend(args, fake_url, workdir)
+        try:
+            for route in routes:
+                if args.warmup:
+                    drive(base, route, args.warmup, min(args.warmup, args.concurrency),
+                          args.repeat_payloads, offset=10 ** 6)
+                calls_before = fake.stats["calls"]
+                stats = drive(base, route, args.requests, args.concurrency, args.repeat_payloads, offset=0)
+                stats["model_calls"] = fake.stats["calls"] - calls_before
+                results["routes"][route] = stats
+                print(f"{route:<20}{stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']} ms  "
+                      f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  errors {stats['errors']}",
+                      file=sys.stderr)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            fake_server.shutdown()
+
+    results["fake_gemini"] = dict(fake.stats, models=dict(fake.stats["models"]))
+    write_results(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
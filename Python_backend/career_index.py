@@ -0,0 +1,141 @@
+"""Structured index of Career-List.pdf with a local BM25 ranker.
+
+The PDF is parsed once into records of (title, category, track) and stored as
+compact JSON next to it. The index is rebuilt automatically whenever the PDF
+changes. Run `python career_index.py` to (re)build it offline.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+from PyPDF2 import PdfReader
+
+from scoring import tokenize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_PATH = os.path.join(BASE_DIR, "Career-List.pdf")
+INDEX_PATH = os.path.join(BASE_DIR, "career_index.json")
+
+_TRACK_RE = re.compile(r'^List of (\w+) Careers', re.I)
+_CATEGORY_RE = re.compile(r'^(\d+)\.\s+(.+)$')
+_CAREER_RE = re.compile(r'^[ivxlc]+\.\s+(.+)$', re.I)
+
+def _clean(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def parse_careers(text):
+    """Parse the catalog text into a list of career records."""
+    records = []
+    track = "Professional"
+    category = None
+    for line in text.splitlines():
+        line = _clean(line)
+        if not line or line.startswith("Page:"):
+            continue
+        m = _TRACK_RE.match(line)
+        if m:
+            track = m.group(1).capitalize()
+            continue
+        m = _CAREER_RE.match(line)
+        if m and category:
+            records.append({"title": _clean(m.group(1)), "category": category, "track": track})
+            continue
+        m = _CATEGORY_RE.match(line)
+        if m:
+            category = _clean(m.group(2))
+    return records
+
+
+def build_index(pdf_path=PDF_PATH, index_path=INDEX_PATH):
+    """Read every page of the PDF and write the parsed records to disk."""
+    reader = PdfReader(pdf_path)
+    text = "\n".join((page.extract_text() or "") for page in reader.pages)
+    records = parse_careers(text)
+    stat = os.stat(pdf_path)
+    # Categories are stored once and referenced by position to keep the file small
+    categories = []
+    for r in records:
+        if [r["category"], r["track"]] not in categories:
+            categories.append([r["category"], r["track"]])
+    payload = {
+        "source": {"mtime": stat.st_mtime, "size": stat.st_size},
+        "categories": categories,
+        "careers": [[r["title"], categories.index([r["category"], r["track"]])] for r in records],
+    }
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    return records
+
+
+def load_index(pdf_path=PDF_PATH, index_path=INDEX_PATH):
+    """Load records from the on-disk index, rebuilding it if missing or stale."""
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            payload = json.load(f)
+        stat = os.stat(pdf_path)
+        if payload["source"] == {"mtime": stat.st_mtime, "size": stat.st_size}:
+            categories = payload["categories"]
+            return [
+                {"title": title, "category": categories[i][0], "track": categories[i][1]}
+                for title, i in payload["careers"]
+            ]
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_index(pdf_path, index_path)
+
+
+class CareerRanker:
+    """Okapi BM25 over career records (title weighted above category)."""
+
+    def __init__(self, records, k1=1.2, b=0.75):
+        self.records = records
+        self.k1 = k1
+        self.b = b
+        self.docs = [
+            Counter(tokenize(r["title"]) * 2 + tokenize(r["category"]) + tokenize(r["track"]))
+            for r in records
+        ]
+        self.lengths = [sum(d.values()) for d in self.docs]
+        self.avg_len = (sum(self.lengths) / len(self.lengths)) if self.docs else 0.0
+        df = Counter()
+        for d in self.docs:
+            df.update(d.keys())
+        n = len(self.docs)
+        self.idf = {t: math.log(1 + (n - c + 0.5) / (c + 0.5)) for t, c in df.items()}
+
+    def scores(self, query):
+        q = Counter(t for t in tokenize(query) if t in self.idf)
+        out = []
+        for doc, length in zip(self.docs, self.lengths):
+            s = 0.0
+            for term, qtf in q.items():
+                tf = doc.get(term)
+                if tf:
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / self.avg_len))
+                    # Dampen long analyses repeating a term many times
+                    s += self.idf[term] * norm * (1 + math.log(qtf))
+            out.append(s)
+        return out
+
+    def top(self, query, n=40):
+        """Return the n best-matching records, highest score first."""
+        scored = sorted(zip(self.scores(query), range(len(self.records))), key=lambda x: (-x[0], x[1]))
+        return [dict(self.records[i], score=round(s, 3)) for s, i in scored[:n] if s > 0]
+
+
+@lru_cache(maxsize=1)
+def get_career_ranker():
+    return CareerRanker(load_index())
+
+
+def format_shortlist(records):
+    return "\n".join(f"- {r['title']} ({r['category']}, {r['track']})" for r in records)
+
+
+if __name__ == "__main__":
+    records = build_index()
+    print(f"Indexed {len(records)} careers from {PDF_PATH} into {INDEX_PATH}")
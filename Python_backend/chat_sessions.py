@@ -0,0 +1,188 @@
+"""Server-side chat sessions for /chat.
+
+Each conversation keeps its most recent turns verbatim and folds older ones
+into a running summary, so the prompt sent per turn stays within a fixed
+token budget however long the conversation gets. Folding runs in the
+background after a reply is sent, so it never adds latency to a turn.
+Sessions live in a SQLite file shared by all workers; every change is a
+read-modify-write inside one write transaction, so turns recorded by two
+workers at once are both kept. Sessions idle for longer than ttl are
+deleted.
+"""
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+# The newest user message and reply always stay in the prompt
+LATEST_EXCHANGE = 2
+
+
+def estimate_tokens(text):
+    # Rough rule of thumb for English text: ~4 characters per token
+    return len(text or "") // 4 + 1
+
+
+def format_turns(turns):
+    return "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+
+
+class ChatSessionStore:
+    def __init__(self, db_path, summarize, token_budget=1500, min_recent_turns=4, ttl=86400):
+        self.db_path = db_path
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.min_recent_turns = min_recent_turns
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._folding = set()
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db().execute("CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated)")
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Hold SQLite's write lock for the block, so a session read and the
+        write based on it can't interleave with another worker's."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def purge_expired(self):
+        self._db().execute("DELETE FROM chat_sessions WHERE updated < ?", (time.time() - self.ttl,))
+
+    def load(self, session_id):
+        row = self._db().execute(
+            "SELECT summary, turns, updated FROM chat_sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if not row or time.time() - row[2] > self.ttl:
+            return {"summary": "", "turns": []}
+        return {"summary": row[0], "turns": json.loads(row[1])}
+
+    def _save(self, session_id, session):
+        self._db().execute(
+            "INSERT OR REPLACE INTO chat_sessions (id, summary, turns, updated) VALUES (?, ?, ?, ?)",
+            (session_id, session["summary"], json.dumps(session["turns"]), time.time()),
+        )
+
+    def context(self, session_id, message, seed_history=None):
+        """Return the conversation context to prepend to the new message,
+        trimmed to the token budget. seed_history (the client's chatHistory)
+        is only used to start a session the server doesn't know yet."""
+        session = self.load(session_id)
+        if not session["turns"] and not session["summary"] and seed_history:
+            with self._transaction():
+                session = self.load(session_id)
+                if not session["turns"] and not session["summary"]:
+                    session["turns"] = [
+                        {"role": t.get("role"), "content": t.get("content")} for t in seed_history
+                        if isinstance(t, dict)
+                    ]
+                    self._save(session_id, session)
+            self._fold_in_background(session_id)
+
+        budget = self.token_budget - estimate_tokens(message)
+        summary = session["summary"]
+        turns = list(session["turns"])
+        # If background folding hasn't caught up, drop the oldest turns from
+        # this prompt rather than exceed the budget (but never the latest)
+        while len(turns) > LATEST_EXCHANGE and estimate_tokens(summary) + estimate_tokens(format_turns(turns)) > budget:
+            turns.pop(0)
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation: {summary}")
+        if turns:
+            parts.append(format_turns(turns))
+        return "\n".join(parts)
+
+    def record(self, session_id, message, reply):
+        """Append a user/assistant exchange and fold older turns if needed."""
+        self.purge_expired()
+        with self._transaction():
+            session = self.load(session_id)
+            session["turns"].append({"role": "user", "content": message})
+            session["turns"].append({"role": "assistant", "content": reply})
+            self._save(session_id, session)
+        self._fold_in_background(session_id)
+
+    def _fold_in_background(self, session_id):
+        session = self.load(session_id)
+        size = estimate_tokens(session["summary"]) + estimate_tokens(format_turns(session["turns"]))
+        if size <= self.token_budget or len(session["turns"]) <= self.min_recent_turns:
+            return
+        with self._lock:
+            if session_id in self._folding:
+                return
+            self._folding.add(session_id)
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(self._fold, session_id), daemon=True).start()
+
+    def _fold(self, session_id):
+        try:
+            session = self.load(session_id)
+            turns = session["turns"]
+            # Fold everything but the most recent turns, keeping the summary to
+            # about a third of the budget
+            old = turns[:-self.min_recent_turns]
+            summary_words = max(50, self.token_budget // 4)
+            prompt = f"""You maintain a running summary of a career guidance chat.
+            Current summary: {session['summary'] or '(none yet)'}
+
+            Older messages to fold into the summary:
+            {format_turns(old)}
+
+            Return only the updated summary, at most {summary_words} words. Keep the user's goals,
+            background, preferences and any advice already given."""
+            new_summary = (self.summarize(prompt) or "").strip()
+            if not new_summary:
+                return
+            with self._transaction():
+                latest = self.load(session_id)
+                # Turns are only ever appended, so the folded prefix is unchanged
+                latest["turns"] = latest["turns"][len(old):]
+                latest["summary"] = new_summary
+                self._save(session_id, latest)
+        except Exception as e:
+            log.warning("Chat session fold error: %s", e)
+        finally:
+            with self._lock:
+                self._folding.discard(session_id)
+
+
+def create_session_store(summarize):
+    return ChatSessionStore(
+        os.getenv("CHAT_SESSIONS_DB") or os.path.join(BASE_DIR, "chat_sessions.db"),
+        summarize,
+        token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", 1500)),
+        min_recent_turns=int(os.getenv("CHAT_RECENT_TURNS", 4)),
+        ttl=int(os.getenv("CHAT_SESSION_TTL", 86400)),
+    )
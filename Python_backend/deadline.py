@@ -0,0 +1,56 @@
+"""Per-request latency budgets.
+
+A route opens a budget with `with deadline.budget(seconds):`. The absolute
+deadline is kept in a context variable, so it follows the request into stage
+threads (run_stages copies the context) and coroutines. Code that waits on
+Gemini - the stage runner, the governor's queue, throttle backoff - caps its
+wait at remaining() and gives up with DeadlineExceeded once it is spent.
+Nested budgets can only shorten the deadline, never extend it.
+
+A model call already in flight can't be interrupted (the client library has
+no per-call timeout); the waiter stops waiting and the call finishes in the
+background.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's latency budget runs out."""
+
+
+@contextmanager
+def budget(seconds):
+    """Run the block with at most `seconds` left (None or <= 0: no limit)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left in the current budget, or None when there is none."""
+    at = _deadline.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def cap(timeout):
+    """The smaller of timeout and the time left (either may be None)."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def check(what="Request"):
+    if remaining() == 0:
+        raise DeadlineExceeded(f"{what} ran out of time")
@@ -0,0 +1,180 @@
+"""Concurrent page fetching for the web search endpoints.
+
+All fetches share one connection-pooled requests.Session. A global worker
+pool caps total concurrency, a per-host semaphore (held until the body has
+been read) keeps us from hammering a single site, and fetch_pages() returns
+whatever finished before the caller's deadline instead of waiting on the
+slowest host. Pages are reduced to the fields the endpoints use and kept in
+the page cache (see page_cache.py).
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import tracing
+from html_extract import extract_page_fields
+from page_cache import page_cache
+
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 16))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", 2))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 5))
+FETCH_MAX_HOSTS = int(os.getenv("FETCH_MAX_HOSTS", 256))
+
+log = logging.getLogger(__name__)
+
+session = requests.Session()
+session.headers.update({"User-Agent": "Mozilla/5.0 (compatible; CareerGlimpse/1.0)"})
+_adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+class HostSlots:
+    """Per-host semaphores made by make(). Past max_hosts, the least recently
+    used hosts with no fetch waiting or running are forgotten."""
+
+    def __init__(self, make, max_hosts=FETCH_MAX_HOSTS):
+        self.make = make
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()  # host -> [semaphore, fetches using it]
+        self._guard = threading.Lock()
+
+    def checkout(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._guard:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = self._hosts[host] = [self.make(), 0]
+                excess = len(self._hosts) - self.max_hosts
+                if excess > 0:
+                    idle = [h for h, (_, users) in self._hosts.items() if not users]
+                    for h in idle[:excess]:
+                        del self._hosts[h]
+            self._hosts.move_to_end(host)
+            entry[1] += 1
+            return entry[0]
+
+    def checkin(self, url):
+        with self._guard:
+            entry = self._hosts.get(urlparse(url).netloc.lower())
+            if entry:
+                entry[1] -= 1
+
+    def __len__(self):
+        return len(self._hosts)
+
+
+_host_slots = HostSlots(lambda: threading.BoundedSemaphore(FETCH_PER_HOST))
+
+
+@contextmanager
+def _host_slot(url, deadline_at):
+    """Hold one of the host's FETCH_PER_HOST slots for the block."""
+    sem = _host_slots.checkout(url)
+    try:
+        remaining = deadline_at - time.time()
+        if remaining <= 0 or not sem.acquire(timeout=remaining):
+            raise TimeoutError(f"Deadline reached before fetching {url}")
+        try:
+            yield
+        finally:
+            sem.release()
+    finally:
+        _host_slots.checkin(url)
+
+
+def _fetch(url, deadline_at, timeout, headers=None, stream=False):
+    """GET url within the deadline. The caller holds the host slot."""
+    remaining = deadline_at - time.time()
+    if remaining <= 0:
+        raise TimeoutError(f"Deadline reached before fetching {url}")
+    return session.get(url, timeout=min(timeout, remaining), headers=headers, stream=stream)
+
+
+def _run_all(fn, urls, deadline_at):
+    futures = {_executor.submit(contextvars.copy_context().run, fn, url): url for url in urls}
+    done, not_done = wait(list(futures), timeout=max(0, deadline_at - time.time()))
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        log.info("Fetch deadline reached; skipped %d of %d pages", len(not_done), len(futures))
+
+    results = []
+    for future, url in futures.items():
+        if future not in done:
+            continue
+        try:
+            results.append((url, future.result()))
+        except Exception as e:
+            log.warning("Error fetching %s: %s", url, e)
+    return results
+
+
+def _satisfies(fields, depth):
+    # A body-depth entry has every field a head-depth request needs
+    return fields.get('depth') == depth or fields.get('depth') == 'body'
+
+
+def _fetch_page(url, depth, deadline_at, timeout):
+    t0 = time.time()
+    outcome = "error"
+    with tracing.span("fetch", host=urlparse(url).netloc, depth=depth) as attrs:
+        try:
+            fields, outcome = _fetch_page_fields(url, depth, deadline_at, timeout)
+            return fields
+        finally:
+            attrs["outcome"] = outcome
+            metrics.FETCH_LATENCY.observe(time.time() - t0, outcome=outcome)
+
+
+def _fetch_page_fields(url, depth, deadline_at, timeout):
+    entry = page_cache.get(url)
+    if entry and not _satisfies(entry["fields"], depth):
+        entry = None
+    if entry and entry["fresh"]:
+        page_cache.count("fresh_hits")
+        page_cache.touch(url)
+        return entry["fields"], "fresh"
+
+    # The slot is held until the streamed body has been read
+    with _host_slot(url, deadline_at):
+        response = _fetch(url, deadline_at, timeout, headers=page_cache.validators(entry), stream=True)
+        if response.status_code == 304 and entry:
+            response.close()
+            page_cache.count("revalidated")
+            page_cache.touch(url, refreshed=True)
+            return entry["fields"], "revalidated"
+
+        page_cache.count("misses")
+        fields = extract_page_fields(response, depth)
+    if response.ok:
+        page_cache.put(
+            url, fields,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return fields, "fetched"
+
+
+def fetch_pages(urls, deadline_at, depth="body", timeout=FETCH_TIMEOUT):
+    """Fetch urls concurrently and return [(url, fields), ...] in input order,
+    with the fields from html_extract.extract_page_fields(), served from the
+    page cache when possible. Use depth="head" when only title and
+    description are needed.
+
+    Only pages that arrived before `deadline_at` (a time.time() value) are
+    returned; failed or late fetches are logged and skipped.
+    """
+    return _run_all(lambda url: _fetch_page(url, depth, deadline_at, timeout), urls, deadline_at)
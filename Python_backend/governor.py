@@ -0,0 +1,412 @@
+"""Client-side governor for Gemini API calls.
+
+Every model call that misses the response cache goes through one Governor
+per process:
+
+- token buckets cap requests/minute and tokens/minute (GEMINI_RPM,
+  GEMINI_TPM; 0 disables a bucket),
+- an AIMD limit caps concurrent calls: it grows by about one slot per
+  window of successful calls and halves whenever Gemini answers 429/503,
+- callers queue by priority, so interactive call sites (chat, questions)
+  are admitted ahead of analysis and background work (prefetch, pool
+  builds, summaries),
+- throttled calls are retried with jittered backoff before giving up, and a
+  caller that can't be admitted within the queue timeout gets Overloaded,
+  which the routes turn into a 503 with Retry-After instead of a 500.
+
+Inside a deadline.budget(), callers stop queueing (DeadlineExceeded) and
+stop retrying once the request's budget is spent.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import deadline
+
+INTERACTIVE, NORMAL, BACKGROUND = 0, 1, 2
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+log = logging.getLogger(__name__)
+
+
+def current_priority():
+    """The priority model calls made here run at (see Governor.priority)."""
+    return _priority.get()
+
+
+class Overloaded(Exception):
+    """Raised when a call can't be admitted in time (or stays throttled)."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_throttle_error(exc):
+    code = getattr(exc, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if code in (429, 503) or getattr(code, "value", None) in (429, 503):
+        return True
+    if type(exc).__name__ in ("ResourceExhausted", "ServiceUnavailable", "TooManyRequests"):
+        return True
+    text = str(exc)
+    return "429" in text or "503" in text or "RESOURCE_EXHAUSTED" in text
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        """Seconds until `amount` could be taken (0 if it can be now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        # May go negative when charging for a response after the fact
+        self._refill()
+        self.level -= amount
+
+
+class Governor:
+    def __init__(self, rpm=0, tpm=0, max_concurrency=16, min_concurrency=1,
+                 queue_timeout=30, retries=2, backoff=1.0):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.in_flight = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._async_waiters = set()
+        self.stats = {"admitted": 0, "throttled": 0, "retried": 0, "rejected": 0}
+
+    @contextmanager
+    def priority(self, level):
+        """Run model calls in this block at `level` or lower priority."""
+        token = _priority.set(max(level, _priority.get()))
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def _delay(self, tokens):
+        delays = [0.0]
+        if self.requests:
+            delays.append(self.requests.delay(1))
+        if self.tokens:
+            delays.append(self.tokens.delay(tokens))
+        return max(delays)
+
+    def _try_admit(self, entry, tokens):
+        """With the lock held: admit `entry` if it is first in line and
+        capacity allows. Returns (admitted, seconds to wait if known)."""
+        if self._waiting[0] != entry or self.in_flight >= int(self.limit):
+            return False, None
+        wait = self._delay(tokens)
+        if wait > 0:
+            return False, wait
+        heapq.heappop(self._waiting)
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        self._notify()
+        return True, None
+
+    def _notify(self):
+        self._cond.notify_all()
+        for loop, event in list(self._async_waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    def _reject(self, wait):
+        self.stats["rejected"] += 1
+        return Overloaded("Gemini request queue is full, try again shortly",
+                          retry_after=max(1, round(wait or self.backoff * 2)))
+
+    def _give_up(self, wait, timeout):
+        if timeout < self.queue_timeout:
+            # The request's own budget ran out before the queue timeout
+            return deadline.DeadlineExceeded("Request ran out of time waiting for Gemini capacity")
+        return self._reject(wait)
+
+    def _withdraw(self, entry):
+        if entry in self._waiting:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._notify()
+
+    def acquire(self, tokens=0):
+        """Wait for a slot at the current priority; raises Overloaded."""
+        entry = (_priority.get(), next(self._seq))
+        timeout = deadline.cap(self.queue_timeout)
+        give_up_at = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    admitted, wait = self._try_admit(entry, tokens)
+                    if admitted:
+                        return
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        raise self._give_up(wait, timeout)
+                    self._cond.wait(min(wait, remaining) if wait else remaining)
+            except BaseException:
+                self._withdraw(entry)
+                raise
+
+    async def acquire_async(self, tokens=0):
+        """acquire() for asyncio callers: waits without holding a thread."""
+        loop = asyncio.get_running_loop()
+        entry = (_priority.get(), next(self._seq))
+        timeout = deadline.cap(self.queue_timeout)
+        give_up_at = time.monotonic() + timeout
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                event.clear()
+                with self._cond:
+                    admitted, wait = self._try_admit(entry, tokens)
+                    if admitted:
+                        return
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        raise self._give_up(wait, timeout)
+                try:
+                    await asyncio.wait_for(event.wait(), min(wait, remaining) if wait else remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                self._withdraw(entry)
+            raise
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.stats["throttled"] += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._notify()
+
+    def charge(self, tokens):
+        """Count response tokens against the tokens/minute bucket."""
+        if self.tokens and tokens:
+            with self._cond:
+                self.tokens.take(tokens)
+
+    def _after_failure(self, e, attempt):
+        """Release after a failed attempt; returns the backoff delay before
+        retrying, or raises if the error shouldn't be retried."""
+        throttled = is_throttle_error(e)
+        self.release(throttled=throttled)
+        if not throttled:
+            raise e
+        if attempt == self.retries:
+            raise Overloaded(f"Gemini is throttling requests: {e}",
+                             retry_after=round(self.backoff * 2 ** attempt) + 1) from e
+        delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+        if deadline.cap(delay) < delay:
+            raise deadline.DeadlineExceeded(f"Request ran out of time while Gemini was throttling: {e}") from e
+        with self._cond:
+            self.stats["retried"] += 1
+        return delay
+
+    def call(self, fn, tokens=0, hold=False):
+        """Run fn() under the governor, retrying throttled attempts. With
+        hold=True the slot stays taken on success and the caller must
+        release() it (used for streams)."""
+        for attempt in range(self.retries + 1):
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt))
+                continue
+            if not hold:
+                self.release()
+            return result
+
+    async def call_async(self, fn, tokens=0, hold=False):
+        """call() for a coroutine function."""
+        for attempt in range(self.retries + 1):
+            await self.acquire_async(tokens)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                # Abandoned by a deadline or a winning hedge
+                self.release()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt))
+                continue
+            if not hold:
+                self.release()
+            return result
+
+    def snapshot(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["in_flight"] = self.in_flight
+            stats["queued"] = len(self._waiting)
+            stats["concurrency_limit"] = round(self.limit, 2)
+        return stats
+
+
+class _HeldStream:
+    """Iterates a streamed response and releases its governor slot exactly
+    once: when exhausted, on error, or when closed/garbage collected."""
+
+    def __init__(self, chunks, model):
+        self._chunks = iter(chunks)
+        self._model = model
+        self._chars = 0
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as e:
+            self.close(throttled=is_throttle_error(e))
+            raise
+        self._chars += len(getattr(chunk, "text", "") or "")
+        return chunk
+
+    def close(self, throttled=False):
+        if self._released:
+            return
+        self._released = True
+        governor = self._model.governor
+        governor.release(throttled=throttled)
+        governor.charge(self._chars // 4)
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+
+    def __del__(self):
+        self.close()
+
+
+class _AsyncHeldStream:
+    """Async counterpart of _HeldStream for generate_content_async streams."""
+
+    def __init__(self, chunks, model):
+        self._chunks = chunks.__aiter__()
+        self._model = model
+        self._chars = 0
+        self._released = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.close()
+            raise
+        except Exception as e:
+            self.close(throttled=is_throttle_error(e))
+            raise
+        self._chars += len(getattr(chunk, "text", "") or "")
+        return chunk
+
+    def close(self, throttled=False):
+        if self._released:
+            return
+        self._released = True
+        self._model.governor.release(throttled=throttled)
+        self._model.governor.charge(self._chars // 4)
+
+    def __del__(self):
+        self.close()
+
+
+class GovernedModel:
+    """Wraps a genai.GenerativeModel so every call goes through a Governor.
+    Sits under CachedModel, so cache hits never use quota."""
+
+    def __init__(self, model, governor, estimate_tokens=lambda prompt: len(str(prompt)) // 4 + 1):
+        self.model = model
+        self.governor = governor
+        self.estimate_tokens = estimate_tokens
+
+    def generate_content(self, prompt, **kwargs):
+        tokens = self.estimate_tokens(prompt)
+        if not kwargs.get("stream"):
+            response = self.governor.call(lambda: self.model.generate_content(prompt, **kwargs), tokens)
+            self.governor.charge(self.estimate_tokens(getattr(response, "text", "") or ""))
+            return response
+
+        # Streams hold their slot until read to the end; only opening the
+        # stream is retried, never a partially delivered one
+        chunks = self.governor.call(lambda: self.model.generate_content(prompt, **kwargs), tokens, hold=True)
+        return _HeldStream(chunks, self)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        tokens = self.estimate_tokens(prompt)
+        call = lambda: self.model.generate_content_async(prompt, **kwargs)
+        if not kwargs.get("stream"):
+            response = await self.governor.call_async(call, tokens)
+            self.governor.charge(self.estimate_tokens(getattr(response, "text", "") or ""))
+            return response
+        chunks = await self.governor.call_async(call, tokens, hold=True)
+        return _AsyncHeldStream(chunks, self)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def create_governor():
+    return Governor(
+        rpm=int(os.getenv("GEMINI_RPM", 0)),
+        tpm=int(os.getenv("GEMINI_TPM", 0)),
+        max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 16)),
+        queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT", 30)),
+        retries=int(os.getenv("GEMINI_THROTTLE_RETRIES", 2)),
+    )
@@ -0,0 +1,244 @@
+"""Timeouts and hedged requests for Gemini calls.
+
+Most calls finish close to their median, but a few take many times longer,
+and in a chained pipeline one straggler sets the request's latency. Every
+call that misses the response cache goes through one Hedger per process:
+
+- it is bounded by a per-call timeout (LLM_CALL_TIMEOUT, or less if the
+  request's deadline is nearer) and raises CallTimeout after it,
+- its latency is recorded in a rolling window for its call site
+  (generate() in app.py names the site); streams are timed to their first
+  chunk and kept in a window of their own, so the two never mix,
+- if it is still running after the site's observed p95, a duplicate is sent
+  and whichever answers first wins; the other is cancelled (async) or
+  abandoned and its stream closed (sync).
+
+Duplicates are limited by a hedge budget: each call earns `budget` hedges
+(e.g. 0.05 = at most one extra call per 20), so spend rises by at most that
+fraction. A budget of 0 turns hedging off and leaves only the timeout.
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import deadline
+
+# (site name, whether calls in this block may be hedged)
+_site = contextvars.ContextVar("llm_call_site", default=("unknown", True))
+
+
+def current_site():
+    """The call site named by the innermost Hedger.site() block."""
+    return _site.get()[0]
+
+
+class CallTimeout(TimeoutError):
+    """Raised when a model call does not answer within its timeout."""
+
+
+def quantile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Hedger:
+    def __init__(self, timeout=60, budget=0.0, hedge_quantile=0.95, min_samples=20, min_delay=0.25,
+                 window=200, workers=128):
+        self.timeout = timeout
+        self.budget = budget
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self._samples = {}
+        self._credit = 1.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "skipped_budget": 0, "timeouts": 0}
+
+    @contextmanager
+    def site(self, name, hedge=True):
+        """Record (and hedge, if allowed) model calls in this block under name."""
+        token = _site.set((name, hedge))
+        try:
+            yield
+        finally:
+            _site.reset(token)
+
+    def record(self, key, seconds):
+        """Add a sample for key: (site, "response" or "first_chunk")."""
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def hedge_delay(self, key):
+        """Seconds after which a call for key gets a duplicate, or None."""
+        if self.budget <= 0:
+            return None
+        with self._lock:
+            samples = list(self._samples.get(key) or ())
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, quantile(samples, self.hedge_quantile))
+
+    def _start(self, stream):
+        """Count a call and return (sample key, timeout, hedge delay)."""
+        site, may_hedge = _site.get()
+        key = (site, "first_chunk" if stream else "response")
+        with self._lock:
+            self.stats["calls"] += 1
+            # Each call earns a fraction of a hedge; a small cap stops idle
+            # periods from saving up a burst of duplicates
+            self._credit = min(self._credit + self.budget, max(1.0, self.budget * 20))
+        return key, deadline.cap(self.timeout), self.hedge_delay(key) if may_hedge else None
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._credit >= 1:
+                self._credit -= 1
+                self.stats["hedged"] += 1
+                return True
+            self.stats["skipped_budget"] += 1
+            return False
+
+    def _timed(self, key, fn):
+        t0 = time.monotonic()
+        result = fn()
+        self.record(key, time.monotonic() - t0)
+        return result
+
+    async def _atimed(self, key, fn):
+        t0 = time.monotonic()
+        result = await fn()
+        self.record(key, time.monotonic() - t0)
+        return result
+
+    def _timed_out(self, key, timeout):
+        site = key[0]
+        with self._lock:
+            self.stats["timeouts"] += 1
+        if timeout < self.timeout:
+            return deadline.DeadlineExceeded(f"Request ran out of time waiting for the model ({site})")
+        return CallTimeout(f"Model call ({site}) did not answer within {timeout:g}s")
+
+    def _won(self, attempts, winner):
+        if winner is not attempts[0]:
+            with self._lock:
+                self.stats["hedge_wins"] += 1
+        return winner.result()
+
+    def call(self, fn, stream=False):
+        """Run fn() with the timeout and hedging of the current site. With
+        stream=True, fn opens a stream and returns at its first chunk."""
+        key, timeout, delay = self._start(stream)
+        give_up_at = time.monotonic() + timeout
+        submit = lambda: self._executor.submit(contextvars.copy_context().run, self._timed, key, fn)
+        attempts = [submit()]
+        winner = None
+        try:
+            if delay is not None and delay < timeout:
+                done, _ = wait(attempts, timeout=delay)
+                if not done and self._take_hedge():
+                    attempts.append(submit())
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, give_up_at - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise self._timed_out(key, timeout)
+                for future in done:
+                    if future.exception() is None:
+                        winner = future
+                        return self._won(attempts, winner)
+                    error = future.exception()
+            raise error
+        finally:
+            for future in attempts:
+                if future is not winner:
+                    future.cancel()
+                    future.add_done_callback(_discard)
+
+    async def call_async(self, fn, stream=False):
+        """call() for a coroutine function; losing attempts are cancelled."""
+        key, timeout, delay = self._start(stream)
+        give_up_at = time.monotonic() + timeout
+        attempts = [asyncio.ensure_future(self._atimed(key, fn))]
+        winner = None
+        try:
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self._take_hedge():
+                    attempts.append(asyncio.ensure_future(self._atimed(key, fn)))
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, give_up_at - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise self._timed_out(key, timeout)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        return self._won(attempts, winner)
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(_discard)
+
+    def latency(self):
+        """{site: {"response"|"first_chunk": {p50, p95, p99, samples}}} in
+        seconds over the rolling windows."""
+        with self._lock:
+            windows = {key: list(samples) for key, samples in self._samples.items()}
+        latency = {}
+        for (site, measure), s in windows.items():
+            if s:
+                latency.setdefault(site, {})[measure] = {
+                    "p50": round(quantile(s, 0.5), 3), "p95": round(quantile(s, 0.95), 3),
+                    "p99": round(quantile(s, 0.99), 3), "samples": len(s)}
+        return latency
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
+
+
+def _discard(future):
+    """Close a losing attempt's stream, if it opened one, to free its slot."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), "close", None)
+    if close:
+        close()
+
+
+class HedgedModel:
+    """Wraps a (governed) model so its calls go through a Hedger."""
+
+    def __init__(self, model, hedger):
+        self.model = model
+        self.hedger = hedger
+        self.model_name = getattr(model, "model_name", str(model))
+
+    def generate_content(self, prompt, **kwargs):
+        # For streams this bounds and hedges opening the stream, which
+        # waits for the first chunk; the rest is read by the caller
+        return self.hedger.call(lambda: self.model.generate_content(prompt, **kwargs), stream=kwargs.get("stream"))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        return await self.hedger.call_async(lambda: self.model.generate_content_async(prompt, **kwargs),
+                                            stream=kwargs.get("stream"))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
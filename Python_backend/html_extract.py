@@ -0,0 +1,178 @@
+"""Bounded, streaming extraction of the few fields the search endpoints use.
+
+Instead of downloading a whole page and building a BeautifulSoup DOM, the
+response body is read in chunks into an incremental html.parser, and reading
+stops as soon as the wanted fields have been seen or a byte cap is reached:
+
+- depth="head": <title> and <meta name="description">; stops at </head>.
+- depth="body": additionally the first <h1>, the first <p> and the first
+  skills list; stops once that list closes.
+"""
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+
+HEAD_MAX_BYTES = int(os.getenv("HEAD_MAX_BYTES", 128 * 1024))
+BODY_MAX_BYTES = int(os.getenv("BODY_MAX_BYTES", 512 * 1024))
+CHUNK_SIZE = 16 * 1024
+MAX_SKILLS = 5
+
+_SKILL_RE = re.compile('skill', re.I)
+_SECTION_HEADINGS = {'h2', 'h3', 'h4', 'h5', 'h6'}
+# Block-level start tags that end a paragraph or heading left unclosed
+# (<p> needs no end tag), so its capture can't run on into the page
+_BLOCK_TAGS = {'p', 'h1', 'ul', 'ol', 'div'} | _SECTION_HEADINGS
+_BLOCK_CAPTURES = {'paragraph', 'heading', 'section'}
+
+
+class PageFieldParser(HTMLParser):
+    """Incremental parser; feed() chunks until `done` is set."""
+
+    def __init__(self, depth="body"):
+        super().__init__(convert_charrefs=True)
+        self.depth = depth
+        self.done = False
+        self.fields = {
+            'title': None,
+            'heading': None,
+            'description': None,
+            'paragraph': None,
+            'skills': [],
+        }
+        self._capture = None
+        self._buf = []
+        self._section = ''
+        self._list_level = 0
+        self._list_is_skills = False
+        self._items = []
+
+    def _start_capture(self, name):
+        if self._capture is None:
+            self._capture = name
+            self._buf = []
+
+    def _end_capture(self, name):
+        if self._capture != name:
+            return None
+        self._capture = None
+        return re.sub(r'\s+', ' ', ''.join(self._buf)).strip()
+
+    def _close(self, name):
+        text = self._end_capture(name)
+        if text is None:
+            return
+        if name in ('title', 'heading', 'paragraph'):
+            self.fields[name] = text
+        elif name == 'section':
+            self._section = text
+        elif name == 'item' and text:
+            self._items.append(text)
+            if _SKILL_RE.search(text):
+                self._list_is_skills = True
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag in _BLOCK_TAGS and self._capture in _BLOCK_CAPTURES:
+            self._close(self._capture)
+        elif tag == 'li' and self._capture == 'item':
+            self._close('item')
+        if tag == 'meta' and self.fields['description'] is None:
+            attrs = dict(attrs)
+            if (attrs.get('name') or '').lower() == 'description':
+                self.fields['description'] = attrs.get('content')
+        elif tag == 'title' and self.fields['title'] is None:
+            self._start_capture('title')
+        elif tag == 'body' and self.depth == 'head':
+            self.done = True
+        elif self.depth != 'body':
+            return
+        elif tag == 'h1' and self.fields['heading'] is None:
+            self._start_capture('heading')
+        elif tag == 'p' and self.fields['paragraph'] is None:
+            self._start_capture('paragraph')
+        elif tag in _SECTION_HEADINGS:
+            self._start_capture('section')
+        elif tag in ('ul', 'ol') and not self.fields['skills']:
+            self._list_level += 1
+            if self._list_level == 1:
+                self._list_is_skills = bool(_SKILL_RE.search(self._section))
+                self._items = []
+        elif tag == 'li' and self._list_level == 1:
+            self._start_capture('item')
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == 'title':
+            self._close('title')
+        elif tag == 'head' and self.depth == 'head':
+            self.done = True
+        elif tag == 'h1':
+            self._close('heading')
+        elif tag == 'p':
+            self._close('paragraph')
+        elif tag in _SECTION_HEADINGS:
+            self._close('section')
+        elif tag == 'li' and self._list_level == 1:
+            self._close('item')
+        elif tag in ('ul', 'ol') and self._list_level:
+            if self._list_level == 1:
+                self._close('item')
+            self._list_level -= 1
+            if self._list_level == 0 and self._list_is_skills and self._items:
+                self.fields['skills'] = self._items[:MAX_SKILLS]
+                self.done = True
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._buf.append(data)
+
+
+class StreamReader:
+    """Feeds byte chunks to a PageFieldParser, decoding incrementally, until
+    it is done or max_bytes have been read."""
+
+    def __init__(self, depth="body", max_bytes=None, encoding='utf-8'):
+        if max_bytes is None:
+            max_bytes = HEAD_MAX_BYTES if depth == "head" else BODY_MAX_BYTES
+        self.max_bytes = max_bytes
+        self.parser = PageFieldParser(depth)
+        try:
+            self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.read = 0
+
+    def feed(self, chunk):
+        """Returns True once no more input is wanted."""
+        if chunk:
+            chunk = chunk[:self.max_bytes - self.read]
+            self.read += len(chunk)
+            self.parser.feed(self.decoder.decode(chunk))
+        return self.parser.done or self.read >= self.max_bytes
+
+
+def parse_stream(chunks, depth="body", max_bytes=None, encoding='utf-8'):
+    """Feed byte chunks to a PageFieldParser until it is done or max_bytes
+    have been read. Returns (fields, bytes_read)."""
+    reader = StreamReader(depth, max_bytes, encoding)
+    for chunk in chunks:
+        if reader.feed(chunk):
+            break
+    return reader.parser.fields, reader.read
+
+
+def extract_page_fields(response, depth="body"):
+    """Extract page fields from a streamed requests response (stream=True),
+    reading no more of the body than needed. Only these fields (not the HTML)
+    are kept in the page cache."""
+    try:
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        fields, _ = parse_stream(chunks, depth, encoding=response.encoding or 'utf-8')
+    finally:
+        response.close()
+    fields['url'] = response.url
+    fields['depth'] = depth
+    return fields
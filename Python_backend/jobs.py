@@ -0,0 +1,201 @@
+"""Background job queue for the long-running analysis endpoints.
+
+Submitting a job returns its id immediately; a bounded in-process worker pool
+runs it, and the result is stored in a SQLite file so any gunicorn worker can
+answer polls for it. Identical payloads submitted while a job is queued,
+running or still retained are deduplicated onto the existing job.
+
+A job still queued or running stale_after seconds after it started (or was
+queued) is taken to be lost with its worker process: it is marked as failed,
+so polls end and the next identical payload starts a new job.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+
+def payload_hash(kind, payload):
+    canonical = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, handlers, db_path, workers=4, result_ttl=3600, stale_after=600):
+        self.handlers = handlers
+        self.db_path = db_path
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = {}
+        self._waits = deque(maxlen=200)
+        self.stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0, "abandoned": 0,
+                      "queued": 0, "running": 0}
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload_hash TEXT NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self._db().execute("CREATE INDEX IF NOT EXISTS jobs_hash ON jobs (payload_hash)")
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run the block under SQLite's write lock, so a check and the write
+        that depends on it can't interleave with another worker's."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _bump(self, stat, delta=1):
+        with self._lock:
+            self.stats[stat] += delta
+
+    def purge_expired(self):
+        """Delete finished jobs past result_ttl and fail jobs whose worker
+        has gone quiet for stale_after seconds."""
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'error') AND finished < ?",
+            (now - self.result_ttl,),
+        )
+        abandoned = db.execute(
+            "UPDATE jobs SET status = 'error', error = 'Job was abandoned by its worker', finished = ? "
+            "WHERE status IN ('queued', 'running') AND COALESCE(started, created) < ?",
+            (now, now - self.stale_after),
+        ).rowcount
+        if abandoned > 0:
+            log.warning("Marked %s stale job(s) as failed", abandoned)
+            self._bump("abandoned", abandoned)
+
+    def submit(self, kind, payload):
+        """Queue a job and return its id, reusing an identical live job."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.purge_expired()
+        digest = payload_hash(kind, payload)
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE payload_hash = ? AND (status = 'done' OR "
+                "(status IN ('queued', 'running') AND COALESCE(started, created) >= ?)) "
+                "ORDER BY created DESC LIMIT 1",
+                (digest, now - self.stale_after),
+            ).fetchone()
+            if row:
+                self._bump("deduplicated")
+                return row[0]
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, kind, payload_hash, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, digest, now),
+            )
+        with self._lock:
+            self._finished[job_id] = threading.Event()
+            self.stats["submitted"] += 1
+            self.stats["queued"] += 1
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id, kind, payload)
+        return job_id
+
+    def _run(self, job_id, kind, payload):
+        started = time.time()
+        self._bump("queued", -1)
+        self._bump("running")
+        db = self._db()
+        created = db.execute("SELECT created FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        with self._lock:
+            self._waits.append(started - created)
+        db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (started, job_id))
+        try:
+            result = self.handlers[kind](payload)
+            db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+            self._bump("completed")
+        except Exception as e:
+            log.error("Job %s (%s) failed: %s", job_id, kind, e)
+            db.execute(
+                "UPDATE jobs SET status = 'error', error = ?, finished = ? WHERE id = ?",
+                (str(e), time.time(), job_id),
+            )
+            self._bump("failed")
+        finally:
+            self._bump("running", -1)
+            with self._lock:
+                event = self._finished.pop(job_id, None)
+            if event:
+                event.set()
+
+    def get(self, job_id):
+        row = self._db().execute(
+            "SELECT id, kind, status, result, error, created, started, finished FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            return None
+        job = {
+            "jobId": row[0], "kind": row[1], "status": row[2],
+            "created": row[5], "started": row[6], "finished": row[7],
+        }
+        if row[3] is not None:
+            job["result"] = json.loads(row[3])
+        if row[4] is not None:
+            job["error"] = row[4]
+        return job
+
+    def wait(self, job_id, timeout):
+        """Block up to timeout seconds for a job to change state. Jobs running
+        in this process are signalled directly; others are polled."""
+        with self._lock:
+            event = self._finished.get(job_id)
+        if event:
+            event.wait(timeout)
+        else:
+            time.sleep(min(timeout, 0.5))
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            waits = sorted(self._waits)
+        stats["wait_seconds_avg"] = round(sum(waits) / len(waits), 3) if waits else 0.0
+        stats["wait_seconds_max"] = round(waits[-1], 3) if waits else 0.0
+        stats["queue_depth"] = stats.pop("queued")
+        return stats
+
+
+def create_job_queue(handlers):
+    return JobQueue(
+        handlers,
+        os.getenv("JOBS_DB") or os.path.join(BASE_DIR, "jobs.db"),
+        workers=int(os.getenv("JOB_WORKERS", 4)),
+        result_ttl=int(os.getenv("JOB_RESULT_TTL", 3600)),
+        stale_after=int(os.getenv("JOB_STALE_AFTER", 600)),
+    )
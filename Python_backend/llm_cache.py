@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+log = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation differences in f-string prompts
+    don't produce different cache keys."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True, default=str)
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_key(model_name, prompt, generation_config=None):
+    payload = json.dumps({
+        "model": model_name,
+        "prompt": normalize_prompt(prompt),
+        "config": generation_config or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Minimal stand-in for a Gemini response served from cache; it has the
+    text only (no usage_metadata, since no tokens were spent)."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class ResponseCache:
+    """Two-tier cache: in-memory LRU with TTL, plus an optional SQLite file.
+
+    The SQLite tier survives restarts and, since every gunicorn worker opens
+    the same file, is shared between worker processes. aget()/aset() are
+    the coroutine versions; they read and write that file in a thread.
+    """
+
+    def __init__(self, maxsize=512, ttl=3600, db_path=None):
+        self.ttl = ttl
+        self.db_path = db_path
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if db_path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _from_memory(self, key):
+        with self._lock:
+            text = self._memory.get(key)
+        if text is not None:
+            self._count("memory_hits")
+        return text
+
+    def _from_disk(self, key):
+        try:
+            row = self._db().execute(
+                "SELECT text, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("Response cache read error: %s", e)
+            row = None
+        if row and time.time() - row[1] < self.ttl:
+            with self._lock:
+                self._memory[key] = row[0]
+            self._count("disk_hits")
+            return row[0]
+        self._count("misses")
+        return None
+
+    def _to_disk(self, key, text):
+        try:
+            self._db().execute(
+                "INSERT OR REPLACE INTO responses (key, text, created) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+        except sqlite3.Error as e:
+            log.warning("Response cache write error: %s", e)
+
+    def get(self, key):
+        text = self._from_memory(key)
+        if text is not None:
+            return text
+        if self.db_path:
+            return self._from_disk(key)
+        self._count("misses")
+        return None
+
+    async def aget(self, key):
+        text = self._from_memory(key)
+        if text is not None:
+            return text
+        if self.db_path:
+            return await asyncio.to_thread(self._from_disk, key)
+        self._count("misses")
+        return None
+
+    def set(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+        if self.db_path:
+            self._to_disk(key, text)
+
+    async def aset(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+        if self.db_path:
+            await asyncio.to_thread(self._to_disk, key, text)
+
+    def delete(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.db_path:
+            try:
+                self._db().execute("DELETE FROM responses WHERE key = ?", (key,))
+            except sqlite3.Error as e:
+                log.warning("Response cache write error: %s", e)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+class CachedModel:
+    """Wraps a genai.GenerativeModel so identical prompts are served from cache.
+
+    Streaming calls are served as a single chunk on a hit; on a miss the
+    stream is passed through and stored once it has been read to the end.
+    A non-streaming miss returns the model's own response, so its
+    usage_metadata reaches the token metrics; only the text is cached.
+    Callers that find a response unusable (e.g. JSON that fails its schema)
+    evict() it so the next identical call asks the model again.
+    """
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+        self.model_name = getattr(model, "model_name", str(model))
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        key = make_key(self.model_name, prompt, generation_config)
+        text = self.cache.get(key)
+        if kwargs.get("stream"):
+            if text is not None:
+                return iter([CachedResponse(text)])
+            return self._stream_and_store(
+                key, self.model.generate_content(prompt, generation_config=generation_config, **kwargs))
+        if text is not None:
+            return CachedResponse(text)
+        response = self.model.generate_content(prompt, generation_config=generation_config, **kwargs)
+        text = _text(response)
+        if text:
+            self.cache.set(key, text)
+        return response
+
+    def evict(self, prompt, generation_config=None):
+        self.cache.delete(make_key(self.model_name, prompt, generation_config))
+
+    def _stream_and_store(self, key, chunks):
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk.text)
+            yield chunk
+        text = "".join(parts)
+        if text:
+            self.cache.set(key, text)
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        key = make_key(self.model_name, prompt, generation_config)
+        text = await self.cache.aget(key)
+        if kwargs.get("stream"):
+            if text is not None:
+                return _single_chunk(CachedResponse(text))
+            chunks = await self.model.generate_content_async(prompt, generation_config=generation_config, **kwargs)
+            return self._astream_and_store(key, chunks)
+        if text is not None:
+            return CachedResponse(text)
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config, **kwargs)
+        text = _text(response)
+        if text:
+            await self.cache.aset(key, text)
+        return response
+
+    async def _astream_and_store(self, key, chunks):
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk.text)
+            yield chunk
+        text = "".join(parts)
+        if text:
+            await self.cache.aset(key, text)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _text(response):
+    # A blocked or empty reply has no text; the caller finds out when it reads it
+    try:
+        return response.text
+    except ValueError:
+        return None
+
+
+async def _single_chunk(response):
+    yield response
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", 512)),
+    ttl=int(os.getenv("LLM_CACHE_TTL", 3600)),
+    db_path=os.getenv("LLM_CACHE_DB") or None,
+)
@@ -0,0 +1,156 @@
+"""Career recommendations from Career-List.pdf without a model.
+
+Used by /analyze-answers in degraded mode, when Gemini is down or the
+request's deadline runs out. The submitted answers (or the analysis text, if
+that stage finished) are ranked against the catalog with the local BM25
+ranker from career_index.py. Assessment answers talk about interests
+("solving puzzles", "helping people") rather than catalog titles, so common
+interest words are first expanded into the catalog's vocabulary. The result
+is deterministic: the same answers always give the same careers.
+"""
+import re
+
+from career_index import get_career_ranker
+from scoring import stem, tokenize
+
+# Stemmed answer term -> catalog terms it points at. Keys of five or more
+# letters match as prefixes, shorter ones only exactly.
+INTEREST_TERMS = {
+    "puzzl": "mathematics engineering science",
+    "math": "mathematics science engineering finance accounting",
+    "logic": "mathematics engineering information technology",
+    "number": "finance accounting banking mathematics",
+    "experiment": "science research laboratory",
+    "scien": "science research",
+    "research": "science research",
+    "robot": "engineering electronics hardware",
+    "comput": "information technology software computer",
+    "cod": "information technology software computer",
+    "programm": "information technology software computer",
+    "technology": "information technology engineering",
+    "data": "data science mathematics information technology",
+    "build": "construction engineering",
+    "hand": "construction electronics vocational",
+    "fix": "electronics hardware mechanic technician",
+    "draw": "design animation graphics architecture",
+    "art": "design animation performing arts",
+    "arts": "design animation performing arts",
+    "creativ": "design animation media",
+    "design": "design architecture graphics",
+    "writ": "journalism mass communication content",
+    "stori": "journalism media mass communication",
+    "story": "journalism media mass communication",
+    "read": "journalism education literature",
+    "debat": "legal law journalism",
+    "law": "legal law",
+    "justice": "legal law",
+    "music": "performing arts music media entertainment",
+    "danc": "performing arts dance",
+    "dance": "performing arts dance",
+    "act": "performing arts media entertainment",
+    "sport": "fitness sports",
+    "athlet": "fitness sports",
+    "fitnes": "fitness well being",
+    "help": "healthcare social nursing",
+    "care": "healthcare nursing medical",
+    "health": "healthcare medical fitness",
+    "medic": "medical healthcare",
+    "volunte": "social sciences",
+    "social": "social sciences",
+    "people": "social sciences management hospitality",
+    "teach": "education teaching",
+    "learn": "education teaching",
+    "lead": "management business entrepreneurship",
+    "manag": "management business",
+    "team": "management business",
+    "business": "business management entrepreneurship",
+    "money": "finance banking accounting",
+    "salary": "finance banking management",
+    "sell": "sales marketing",
+    "market": "sales marketing",
+    "travel": "hospitality tourism",
+    "cook": "hospitality food",
+    "food": "agriculture food",
+    "farm": "agriculture food",
+    "natur": "agriculture environment science",
+    "animal": "agriculture veterinary",
+    "fashion": "apparel textile design beauty",
+    "beauty": "beauty wellness",
+    "defenc": "defence government security",
+    "army": "defence government security",
+    "government": "government public administration",
+    "film": "media entertainment animation",
+    "video": "media entertainment animation",
+    "photograph": "media design",
+}
+
+# Keep the list from collapsing into a single catalog category
+PER_CATEGORY = 2
+
+
+def answers_text(answers):
+    """Flatten /analyze-answers final_answers into one query string."""
+    parts = []
+    for item in answers or []:
+        if isinstance(item, dict):
+            answer = item.get("answer")
+            parts.extend(answer if isinstance(answer, list) else [answer])
+        else:
+            parts.append(item)
+    return " ".join(str(p) for p in parts if p)
+
+
+def expand(text):
+    terms = tokenize(text)
+    expanded = list(terms)
+    for term in terms:
+        for key, related in INTEREST_TERMS.items():
+            if term == key or (len(key) >= 5 and term.startswith(key)):
+                expanded.extend(tokenize(related))
+    return " ".join(expanded)
+
+
+def recommend(text, n=5):
+    """The n best catalog careers for text as [{title, match, description,
+    category, track}], match scaled to 75-95 against the best score."""
+    ranker = get_career_ranker()
+    query = expand(text)
+    scores = ranker.scores(query)
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+    query_terms = set(tokenize(query))
+
+    picked, per_category, titles = [], {}, set()
+
+    def pick(candidates, limit):
+        for i in candidates:
+            if len(picked) == n:
+                return
+            category = ranker.records[i]["category"]
+            title = ranker.records[i]["title"].lower()
+            # The catalog lists some careers under both tracks
+            if title not in titles and per_category.get(category, 0) < limit:
+                per_category[category] = per_category.get(category, 0) + 1
+                titles.add(title)
+                picked.append(i)
+
+    pick([i for i in order if scores[i] > 0], PER_CATEGORY)
+    # Weak or empty query: pad with one career from each remaining category
+    pick(range(len(scores)), 1)
+
+    best = max((scores[i] for i in picked), default=0) or 1.0
+    careers = []
+    for i in picked:
+        record = ranker.records[i]
+        # Report the catalog's own words, not their stems
+        words = re.findall(r'[a-z]+', f"{record['title']} {record['category']}".lower())
+        matched = list(dict.fromkeys(w for w in words if stem(w) in query_terms))
+        reason = (f"Matches your interest in {', '.join(matched[:3])}" if matched
+                  else "A broadly suitable option from the career catalog")
+        careers.append({
+            "title": record["title"],
+            "match": round(75 + 20 * scores[i] / best),
+            "description": f"{reason} ({record['category']}, {record['track']}).",
+            "category": record["category"],
+            "track": record["track"],
+        })
+    return careers
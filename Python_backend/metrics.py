@@ -0,0 +1,143 @@
+"""Minimal in-process metrics served in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts keyed by label values behind a lock,
+so recording costs a few microseconds. Collectors registered with
+register_collector() add gauges (cache and job stats) at scrape time.
+"""
+import bisect
+import logging
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+log = logging.getLogger(__name__)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                labels = _labels(self.label_names + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+_metrics = []
+_collectors = []
+
+
+def counter(name, help_text, labels=()):
+    m = Counter(name, help_text, labels)
+    _metrics.append(m)
+    return m
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    m = Histogram(name, help_text, labels, buckets)
+    _metrics.append(m)
+    return m
+
+
+def register_collector(name, help_text, collect):
+    """Register a gauge computed at scrape time. collect() returns a list of
+    (labels_dict, value) pairs."""
+    _collectors.append((name, help_text, collect))
+
+
+def render():
+    lines = []
+    for m in _metrics:
+        lines.extend(m.render())
+    for name, help_text, collect in _collectors:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        try:
+            for labels, value in collect():
+                names = tuple(sorted(labels))
+                lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {value}")
+        except Exception as e:
+            log.warning("Metrics collector %s failed: %s", name, e)
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_LATENCY = histogram(
+    "http_request_duration_seconds", "Flask request latency by route", ("route", "method", "status"))
+LLM_LATENCY = histogram(
+    "llm_call_duration_seconds", "Model call latency by call site", ("site",))
+LLM_CALLS = counter(
+    "llm_calls_total", "Model calls by call site and outcome", ("site", "outcome"))
+LLM_PROMPT_TOKENS = counter(
+    "llm_prompt_tokens_total", "Prompt tokens sent by call site", ("site",))
+LLM_RESPONSE_TOKENS = counter(
+    "llm_response_tokens_total", "Response tokens received by call site", ("site",))
+JSON_PARSE_RETRIES = counter(
+    "llm_json_parse_retries_total", "Extra model calls made because JSON output did not parse", ("site",))
+JSON_PARSE_FAILURES = counter(
+    "llm_json_parse_failures_total", "Model outputs that never parsed as JSON", ("site",))
+JSON_REPAIRS = counter(
+    "llm_json_repairs_total", "Model outputs that parsed only after repair", ("site",))
+JSON_STREAM_ABORTS = counter(
+    "llm_json_stream_aborts_total", "Streamed outputs abandoned early because they could not parse", ("site",))
+LLM_ROUTE_DECISIONS = counter(
+    "llm_route_decisions_total", "Model chosen for each call attempt by call site and reason", ("site", "model", "reason"))
+DEGRADED_RESPONSES = counter(
+    "degraded_responses_total", "Responses completed by a local fallback instead of the model", ("route", "reason"))
+FETCH_LATENCY = histogram(
+    "scraper_fetch_duration_seconds", "Page fetch + extraction time by outcome", ("outcome",))
@@ -0,0 +1,117 @@
+"""URL-keyed cache of fields extracted from scraped pages.
+
+Entries hold the extracted title/description/skills (never raw HTML) together
+with the ETag and Last-Modified validators, so stale entries can be
+revalidated with a cheap conditional GET. The store is a SQLite file, which
+makes it shared across gunicorn worker processes, and is kept under a fixed
+number of entries by evicting the least recently used.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+
+class PageCache:
+    def __init__(self, db_path, max_entries=2000, fresh_for=86400):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.fresh_for = fresh_for
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0}
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, fields TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db().execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, url):
+        """Return the cached entry for url as a dict, or None."""
+        try:
+            row = self._db().execute(
+                "SELECT fields, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("Page cache read error: %s", e)
+            return None
+        if not row:
+            return None
+        return {
+            "fields": json.loads(row[0]),
+            "etag": row[1],
+            "last_modified": row[2],
+            "fresh": time.time() - row[3] < self.fresh_for,
+        }
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, url, refreshed=False):
+        now = time.time()
+        try:
+            if refreshed:
+                self._db().execute(
+                    "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+                )
+            else:
+                self._db().execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, url))
+        except sqlite3.Error as e:
+            log.warning("Page cache write error: %s", e)
+
+    def put(self, url, fields, etag=None, last_modified=None):
+        now = time.time()
+        try:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO pages (url, fields, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(fields), etag, last_modified, now, now),
+            )
+            db.execute(
+                "DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        except sqlite3.Error as e:
+            log.warning("Page cache write error: %s", e)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        try:
+            stats["entries"] = self._db().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        except sqlite3.Error:
+            stats["entries"] = None
+        return stats
+
+
+page_cache = PageCache(
+    os.getenv("PAGE_CACHE_DB") or os.path.join(BASE_DIR, "page_cache.db"),
+    max_entries=int(os.getenv("PAGE_CACHE_MAX_ENTRIES", 2000)),
+    fresh_for=int(os.getenv("PAGE_CACHE_FRESH", 86400)),
+)
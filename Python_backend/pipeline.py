@@ -0,0 +1,199 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import tracing
+from deadline import DeadlineExceeded, remaining
+
+# Request threads the server runs per process (gunicorn --threads); each
+# request's first stage runs on its own thread, so the pool only takes the
+# stages that run alongside it
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", 32))
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS") or SERVER_THREADS)
+
+
+class StagePool:
+    """Thread pool for stages with `workers` slots.
+
+    A running thread can't be cancelled, so a stage abandoned on deadline or
+    error keeps its thread until its function returns (its model calls are
+    bounded by the same deadline). It gives its slot back at once, though,
+    so the stages of live requests aren't held up behind it; `spare` extra
+    threads run those stragglers. snapshot() counts them.
+    """
+
+    def __init__(self, workers, spare=None, name="stage"):
+        self.workers = workers
+        self._slots = threading.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers + (workers if spare is None else spare), thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._claims = {}
+        self.stats = {"submitted": 0, "abandoned": 0, "abandoned_running": 0}
+
+    def submit(self, fn, *args):
+        """Start fn(*args) once a slot is free, waiting no longer than the
+        request's deadline."""
+        if not self._slots.acquire(timeout=remaining()):
+            raise DeadlineExceeded("No stage worker became free in time")
+        claim = {"released": False, "abandoned": False}
+        try:
+            future = self._executor.submit(self._run, claim, fn, *args)
+        except BaseException:
+            self._release(claim)
+            raise
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._claims[future] = claim
+        future.add_done_callback(self._forget)
+        return future
+
+    def _run(self, claim, fn, *args):
+        try:
+            return fn(*args)
+        finally:
+            self._release(claim)
+
+    def _release(self, claim, abandoned=False):
+        with self._lock:
+            if claim["released"]:
+                if claim["abandoned"] and not abandoned:
+                    # An abandoned stage has finished after all
+                    self.stats["abandoned_running"] -= 1
+                return
+            claim["released"] = True
+            if abandoned:
+                claim["abandoned"] = True
+                self.stats["abandoned"] += 1
+                self.stats["abandoned_running"] += 1
+        self._slots.release()
+
+    def _forget(self, future):
+        with self._lock:
+            self._claims.pop(future, None)
+
+    def abandon(self, future):
+        """Stop waiting for future: cancel it if it hasn't started, otherwise
+        let it finish in the background without holding a slot."""
+        with self._lock:
+            claim = self._claims.get(future)
+        if claim is None:
+            return
+        if future.cancel():
+            self._release(claim)
+        elif not future.done():
+            self._release(claim, abandoned=True)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, workers=self.workers)
+
+
+# Shared, bounded pool so concurrent requests can't spawn unlimited threads
+stage_pool = StagePool(STAGE_WORKERS)
+
+
+class Stage:
+    """One unit of work in a stage graph.
+
+    `fn` is called with the results of its dependencies as keyword
+    arguments, e.g. Stage("careers", make_careers, deps=["analysis"])
+    calls make_careers(analysis=<result of the "analysis" stage>).
+    """
+
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+def _timed(stage, kwargs):
+    t0 = time.time()
+    with tracing.span("stage", stage=stage.name):
+        result = stage.fn(**kwargs)
+    return result, round(time.time() - t0, 2)
+
+
+def run_stages(stages, executor=None, on_complete=None):
+    """Run a list of Stage objects, starting each as soon as its deps finish.
+
+    The first stage runs on the calling thread; independent stages run in
+    parallel on a StagePool (the shared one unless given). Returns a tuple
+    (results, timings) where both are dicts keyed by stage name and timings
+    are in seconds. The first stage exception is re-raised after the other
+    stages are abandoned (see StagePool.abandon). If given,
+    on_complete(name, result, seconds) is called as each stage finishes.
+
+    Inside a deadline.budget(), stages still running when it runs out are
+    abandoned and DeadlineExceeded is raised.
+    """
+    executor = executor or stage_pool
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        for dep in s.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{s.name}' depends on unknown stage '{dep}'")
+
+    results = {}
+    timings = {}
+    pending = [s.name for s in stages]
+    running = {}
+
+    def ready():
+        names = [name for name in pending if all(dep in results for dep in by_name[name].deps)]
+        for name in names:
+            pending.remove(name)
+        return names
+
+    def kwargs_for(name):
+        return {dep: results[dep] for dep in by_name[name].deps}
+
+    def submit(names):
+        for name in names:
+            running[executor.submit(contextvars.copy_context().run, _timed, by_name[name], kwargs_for(name))] = name
+
+    def finished(name, result, seconds):
+        results[name], timings[name] = result, seconds
+        if on_complete:
+            on_complete(name, result, seconds)
+
+    def abandon_running():
+        for other in running:
+            executor.abandon(other)
+
+    first, *others = ready() or [None]
+    if first is None:
+        if pending:
+            raise ValueError(f"Stage graph has a cycle: {sorted(pending)}")
+        return results, timings
+    try:
+        submit(others)
+        finished(first, *_timed(by_name[first], kwargs_for(first)))
+    except Exception:
+        abandon_running()
+        raise
+    submit(ready())
+
+    while running:
+        done, _ = wait(list(running), timeout=remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            abandon_running()
+            raise DeadlineExceeded(f"Stages {sorted(running.values())} did not finish in time")
+        for future in done:
+            name = running.pop(future)
+            try:
+                finished(name, *future.result())
+            except Exception:
+                abandon_running()
+                raise
+        try:
+            submit(ready())
+        except Exception:
+            abandon_running()
+            raise
+
+    if pending:
+        raise ValueError(f"Stage graph has a cycle: {sorted(pending)}")
+    return results, timings
@@ -0,0 +1,325 @@
+"""Store of generated 90-day course plans for /course-plan.
+
+Course plan requests cluster heavily: a few hundred popular (career, course)
+pairs, with gap lists that differ in wording more than in substance. Plans
+are stored under the normalized career, the course identity (its URL, or
+provider and title) and a bucket of the gaps: the stemmed terms of the
+missing and to-strengthen skills, as an unordered set. A request is answered
+from the store when its bucket matches exactly or, failing that, when
+another bucket of the same pair is similar enough (Jaccard similarity of the
+term sets), so no model call is made. The user's own skills are not part of
+the key; plans are shared by everyone aiming at the same course with
+similar gaps.
+
+Entries younger than fresh_for are served as is. Older ones are still
+served up to max_age, but trigger a background regeneration on a small
+pool of refresh_workers threads (skipped while refresh_backlog are already
+pending); past max_age they are not used. The store is a SQLite file shared by all workers and is
+kept under max_entries by evicting the least recently used plans.
+
+Every lookup is also counted in a demand log, which `python plan_store.py`
+reads to pre-generate plans for the most requested pairs and gap buckets.
+Demand older than demand_window is pruned as new lookups are logged.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from scoring import tokenize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+
+def _norm(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def course_identity(course):
+    """The course's URL without scheme, query or trailing slash when it has
+    one, otherwise "provider|title"."""
+    course = course or {}
+    link = course.get('link') or course.get('url')
+    if link:
+        parts = urlsplit(str(link).strip().lower())
+        if parts.netloc:
+            host = parts.netloc[4:] if parts.netloc.startswith('www.') else parts.netloc
+            return host + parts.path.rstrip('/')
+    title = course.get('title') or course.get('name')
+    provider = course.get('provider') or course.get('platform')
+    return f"{_norm(provider)}|{_norm(title)}"
+
+
+def pair_key(data):
+    career = data.get('careerTitle') or data.get('career')
+    return json.dumps([_norm(career), course_identity(data.get('course'))])
+
+
+def gap_terms(gaps, limit=8):
+    """Distinct stemmed terms of the missing, then to-strengthen skills, up
+    to limit. Gaps may also be a plain list or string."""
+    if isinstance(gaps, dict):
+        skills = list(gaps.get('missing') or []) + list(gaps.get('toStrengthen') or [])
+    elif isinstance(gaps, list):
+        skills = gaps
+    else:
+        skills = [gaps] if gaps else []
+    terms = []
+    for skill in skills:
+        for term in tokenize(skill if isinstance(skill, str) else json.dumps(skill)):
+            if term not in terms:
+                terms.append(term)
+    return terms[:limit]
+
+
+def bucket_key(terms):
+    return hashlib.sha256(" ".join(sorted(terms)).encode("utf-8")).hexdigest()[:16]
+
+
+def similarity(a, b):
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class PlanStore:
+    def __init__(self, db_path, max_entries=5000, fresh_for=14 * 86400, max_age=60 * 86400,
+                 near_match=0.5, gap_terms=8, demand_window=30 * 86400, refresh_workers=2,
+                 refresh_backlog=32):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.fresh_for = fresh_for
+        self.max_age = max_age
+        self.near_match = near_match
+        self.gap_terms = gap_terms
+        self.demand_window = demand_window
+        self.refresh_backlog = refresh_backlog
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="plan-refresh")
+        self.stats = {"exact_hits": 0, "near_hits": 0, "stale_hits": 0, "misses": 0,
+                      "stored": 0, "evicted": 0, "refreshed": 0, "refresh_skipped": 0,
+                      "precomputed": 0, "demand_pruned": 0}
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "pair TEXT NOT NULL, bucket TEXT NOT NULL, terms TEXT NOT NULL, plan TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (pair, bucket))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS plans_accessed ON plans (accessed_at)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS plan_requests ("
+            "pair TEXT NOT NULL, bucket TEXT NOT NULL, payload TEXT NOT NULL, "
+            "count INTEGER NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (pair, bucket))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS plan_requests_seen ON plan_requests (last_seen)")
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self, stat, n=1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def key(self, data):
+        terms = gap_terms(data.get('gaps'), self.gap_terms)
+        return pair_key(data), bucket_key(terms), terms
+
+    def _record_demand(self, pair, bucket, data, now):
+        # Only what the prompt uses, so the batch job can replay the request
+        payload = {k: data.get(k) for k in ('careerTitle', 'career', 'course', 'userSkills', 'gaps') if data.get(k)}
+        db = self._db()
+        db.execute(
+            "INSERT INTO plan_requests (pair, bucket, payload, count, last_seen) VALUES (?, ?, ?, 1, ?) "
+            "ON CONFLICT (pair, bucket) DO UPDATE SET count = count + 1, last_seen = excluded.last_seen",
+            (pair, bucket, json.dumps(payload), now),
+        )
+        pruned = db.execute("DELETE FROM plan_requests WHERE last_seen < ?", (now - self.demand_window,)).rowcount
+        if pruned > 0:
+            self.count("demand_pruned", pruned)
+
+    def lookup(self, data):
+        """Return {"plan", "match": "exact"|"near", "similarity", "stale"} for
+        the closest usable stored plan, or None. Counts the request as demand."""
+        pair, bucket, terms = self.key(data)
+        now = time.time()
+        try:
+            self._record_demand(pair, bucket, data, now)
+            rows = self._db().execute(
+                "SELECT bucket, terms, plan, created_at FROM plans WHERE pair = ? AND created_at > ?",
+                (pair, now - self.max_age),
+            ).fetchall()
+        except sqlite3.Error as e:
+            log.warning("Plan store read error: %s", e)
+            return None
+
+        best, best_score = None, -1.0
+        for row in rows:
+            score = 1.0 if row[0] == bucket else similarity(terms, json.loads(row[1]))
+            if score > best_score:
+                best, best_score = row, score
+        if best is None or best_score < self.near_match:
+            self.count("misses")
+            return None
+
+        stale = now - best[3] >= self.fresh_for
+        self.count("stale_hits" if stale else "exact_hits" if best[0] == bucket else "near_hits")
+        try:
+            self._db().execute(
+                "UPDATE plans SET accessed_at = ?, hits = hits + 1 WHERE pair = ? AND bucket = ?",
+                (now, pair, best[0]),
+            )
+        except sqlite3.Error as e:
+            log.warning("Plan store write error: %s", e)
+        return {
+            "plan": json.loads(best[2]),
+            "match": "exact" if best[0] == bucket else "near",
+            "similarity": round(best_score, 3),
+            "stale": stale,
+        }
+
+    def put(self, data, plan):
+        pair, bucket, terms = self.key(data)
+        now = time.time()
+        try:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO plans (pair, bucket, terms, plan, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, COALESCE((SELECT hits FROM plans WHERE pair = ? AND bucket = ?), 0))",
+                (pair, bucket, json.dumps(terms), json.dumps(plan), now, now, pair, bucket),
+            )
+            evicted = db.execute(
+                "DELETE FROM plans WHERE rowid IN "
+                "(SELECT rowid FROM plans ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        except sqlite3.Error as e:
+            log.warning("Plan store write error: %s", e)
+            return
+        self.count("stored")
+        if evicted > 0:
+            self.count("evicted", evicted)
+
+    def refresh_later(self, data, generate):
+        """Regenerate the plan for data's bucket on the refresh pool, unless
+        a refresh of it is already pending in this worker or the pool's
+        backlog is full (the stale plan is served meanwhile and the next
+        lookup asks again)."""
+        key = self.key(data)[:2]
+        with self._lock:
+            if key in self._refreshing:
+                return
+            if len(self._refreshing) >= self.refresh_backlog:
+                self.stats["refresh_skipped"] += 1
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(data, generate(data))
+                self.count("refreshed")
+            except Exception as e:
+                log.warning("Course plan refresh failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(refresh)
+
+    def popular(self, top=300, per_pair=3):
+        """The most requested payloads within demand_window: the top pairs by
+        request count, and up to per_pair of each pair's gap buckets."""
+        since = time.time() - self.demand_window
+        db = self._db()
+        db.execute("DELETE FROM plan_requests WHERE last_seen < ?", (since,))
+        pairs = db.execute(
+            "SELECT pair FROM plan_requests GROUP BY pair ORDER BY SUM(count) DESC LIMIT ?", (top,)
+        ).fetchall()
+        payloads = []
+        for (pair,) in pairs:
+            rows = db.execute(
+                "SELECT payload FROM plan_requests WHERE pair = ? ORDER BY count DESC LIMIT ?", (pair, per_pair)
+            ).fetchall()
+            payloads.extend(json.loads(row[0]) for row in rows)
+        return payloads
+
+    def precompute(self, generate, top=300, per_pair=3, workers=4):
+        """Generate plans for the popular payloads that have no fresh exact
+        entry. Returns (generated, failed)."""
+        cutoff = time.time() - self.fresh_for
+        todo = []
+        for data in self.popular(top, per_pair):
+            pair, bucket, _ = self.key(data)
+            row = self._db().execute(
+                "SELECT created_at FROM plans WHERE pair = ? AND bucket = ?", (pair, bucket)
+            ).fetchone()
+            if not row or row[0] < cutoff:
+                todo.append(data)
+
+        def build(data):
+            try:
+                self.put(data, generate(data))
+                return True
+            except Exception as e:
+                log.warning("Course plan precompute failed for %s: %s", pair_key(data), e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build, todo))
+        generated = sum(results)
+        self.count("precomputed", generated)
+        return generated, len(results) - generated
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["exact_hits"] + stats["near_hits"] + stats["stale_hits"]
+        stats["hit_rate"] = round(hits / (hits + stats["misses"]), 3) if hits + stats["misses"] else None
+        try:
+            stats["entries"] = self._db().execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        except sqlite3.Error:
+            stats["entries"] = None
+        return stats
+
+
+plan_store = PlanStore(
+    os.getenv("PLAN_STORE_DB") or os.path.join(BASE_DIR, "plan_store.db"),
+    max_entries=int(os.getenv("PLAN_STORE_MAX_ENTRIES", 5000)),
+    fresh_for=int(os.getenv("PLAN_STORE_FRESH", 14 * 86400)),
+    max_age=int(os.getenv("PLAN_STORE_MAX_AGE", 60 * 86400)),
+    near_match=float(os.getenv("PLAN_STORE_NEAR_MATCH", 0.5)),
+    gap_terms=int(os.getenv("PLAN_STORE_GAP_TERMS", 8)),
+    demand_window=int(os.getenv("PLAN_STORE_DEMAND_WINDOW", 30 * 86400)),
+    refresh_workers=int(os.getenv("PLAN_STORE_REFRESH_WORKERS", 2)),
+)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-generate course plans for the most requested courses")
+    parser.add_argument("--top", type=int, default=300, help="most requested (career, course) pairs")
+    parser.add_argument("--per-pair", type=int, default=3, help="gap buckets per pair")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    from app import precompute_course_plan
+
+    generated, failed = plan_store.precompute(precompute_course_plan, args.top, args.per_pair, args.workers)
+    print(f"Generated {generated} course plans ({failed} failed) into {plan_store.db_path}")
@@ -0,0 +1,173 @@
+"""Warm pool of opening questions for /generate-question.
+
+Every assessment starts from an empty or one-item history, which is the
+same prompt for every user. The pool holds several generated opening
+questions plus the follow-up for each of their options, keyed like the
+prefetch store by the hash of the history. It is served without a model
+call and rotated for variety.
+
+The pool is stored as JSON next to the app so all workers share it. When it
+is missing or older than refresh_after, one worker (chosen with a lock file)
+rebuilds it in the background while the others keep serving the old copy.
+Until the first build finishes, empty histories are answered from the
+predefined bank in src/questions.json. A failed build is retried after
+retry_after seconds, doubling on each further failure up to refresh_after.
+Run `python question_pool.py` to build it offline.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from question_prefetch import history_key
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POOL_PATH = os.path.join(BASE_DIR, "question_pool.json")
+QUESTIONS_PATH = os.path.join(BASE_DIR, "..", "src", "questions.json")
+LOCK_STALE_AFTER = 600
+
+log = logging.getLogger(__name__)
+
+
+def load_predefined(path=QUESTIONS_PATH):
+    """The predefined question bank, flattened across groups."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            groups = json.load(f).get("predefinedQuestions", {})
+    except (OSError, ValueError) as e:
+        log.warning("Could not read predefined questions from %s: %s", path, e)
+        return []
+    return [
+        {"question": q["question"], "options": q["options"]}
+        for questions in groups.values() for q in questions
+        if q.get("question") and len(q.get("options") or []) == 4
+    ]
+
+
+class OpeningPool:
+    def __init__(self, build, path=POOL_PATH, depth=1, refresh_after=86400, fallback=None, retry_after=60):
+        """build(depth) returns {history_key: [question, ...]}."""
+        self.build = build
+        self.path = path
+        self.depth = depth
+        self.refresh_after = refresh_after
+        self.retry_after = retry_after
+        self.fallback = fallback or []
+        self._entries = {}
+        self._built = 0
+        self._mtime = None
+        self._rotation = {}
+        self._refreshing = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "fallback_hits": 0, "misses": 0, "refreshes": 0, "failed_refreshes": 0}
+        self._reload()
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        entries = {key: variants for key, variants in (data.get("entries") or {}).items() if variants}
+        with self._lock:
+            self._entries = entries
+            # A file with nothing usable in it doesn't count as a fresh pool
+            self._built = data.get("built", 0) if entries else 0
+            self._mtime = mtime
+            self._rotation = {}
+
+    def take(self, previous_qa):
+        """A pooled question for this history, or None if it isn't pooled."""
+        if len(previous_qa or []) > self.depth:
+            return None
+        self.refresh_in_background()
+        key = history_key(previous_qa)
+        with self._lock:
+            variants = self._entries.get(key)
+            stat = "hits"
+            if not variants and not previous_qa and self.fallback:
+                variants, stat = self.fallback, "fallback_hits"
+            if not variants:
+                self.stats["misses"] += 1
+                return None
+            counter = self._rotation.setdefault(key, itertools.count())
+            self.stats[stat] += 1
+            return variants[next(counter) % len(variants)]
+
+    def is_stale(self):
+        return time.time() - self._built > self.refresh_after
+
+    def refresh_in_background(self):
+        self._reload()
+        with self._lock:
+            if self._refreshing or not self.is_stale() or time.time() < self._retry_at:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        lock_path = self.path + ".lock"
+        try:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_AFTER:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # Another worker is rebuilding; pick up its file on a later take()
+                return
+            try:
+                self.rebuild()
+            finally:
+                os.close(fd)
+                os.remove(lock_path)
+            with self._lock:
+                self._failures = 0
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self.stats["failed_refreshes"] += 1
+                backoff = min(self.refresh_after, self.retry_after * 2 ** (self._failures - 1))
+                self._retry_at = time.time() + backoff
+            log.warning("Opening question pool refresh failed (retrying in %ss): %s", backoff, e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def rebuild(self):
+        """Build the pool now and write it to disk."""
+        # Histories whose questions all failed to generate are left out
+        entries = {key: variants for key, variants in (self.build(self.depth) or {}).items() if variants}
+        if history_key([]) not in entries:
+            raise ValueError("Question pool build returned no opening questions")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"built": time.time(), "depth": self.depth, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self.stats["refreshes"] += 1
+        self._reload()
+        return entries
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["histories"] = len(self._entries)
+            stats["age"] = round(time.time() - self._built) if self._built else None
+        return stats
+
+
+if __name__ == "__main__":
+    from app import opening_pool
+
+    entries = opening_pool.rebuild()
+    print(f"Pooled questions for {len(entries)} histories into {opening_pool.path}")
@@ -0,0 +1,171 @@
+"""Speculative prefetch of the next adaptive question.
+
+Each /generate-question response has exactly four options, and the next
+request's history is the current one plus whichever option the user picks.
+After answering a request, speculate() generates the follow-up question for
+all four branches in the background and keeps them keyed by the hash of the
+resulting history, so the next request is usually served from memory.
+
+Speculative spend is capped: at most max_inflight branch generations run at
+once and at most per_minute are started in any rolling minute. Once the user
+picks a branch, its queued siblings are cancelled and the results of any
+already running are discarded.
+
+The same store doubles as the buffer for batched generation: stash() files
+follow-up questions that came back alongside the current one, so they are
+served by take() without another model call.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+log = logging.getLogger(__name__)
+
+
+def history_key(previous_qa):
+    canonical = json.dumps(
+        [[qa.get("question"), qa.get("answer")] for qa in previous_qa or []],
+        separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class QuestionPrefetcher:
+    def __init__(self, generate, workers=4, max_inflight=8, per_minute=60, ttl=900, maxsize=2000):
+        self.generate = generate
+        self.max_inflight = max_inflight
+        self.per_minute = per_minute
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._ready = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending = {}
+        self._siblings = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._discard = set()
+        self._started = deque()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0, "inflight_hits": 0, "misses": 0,
+            "buffered": 0, "speculated": 0, "skipped_budget": 0, "cancelled": 0, "discarded": 0, "failed": 0,
+        }
+
+    def _bump(self, stat, delta=1):
+        with self._lock:
+            self.stats[stat] += delta
+
+    def take(self, previous_qa, wait=None):
+        """Return the prefetched question for this history, or None.
+
+        A branch that is still generating is waited on for up to `wait`
+        seconds, since that is never slower than starting a fresh call.
+        """
+        key = history_key(previous_qa)
+        if previous_qa:
+            self._cancel_siblings(history_key(previous_qa[:-1]), keep=key)
+        with self._lock:
+            question = self._ready.pop(key, None)
+            future = self._pending.get(key)
+        if question is not None:
+            self._bump("hits")
+            return question
+        if future is not None:
+            try:
+                question = future.result(timeout=wait)
+            except Exception:
+                question = None
+            if question is not None:
+                with self._lock:
+                    self._ready.pop(key, None)
+                self._bump("inflight_hits")
+                return question
+        self._bump("misses")
+        return None
+
+    def speculate(self, previous_qa, question):
+        """Start generating the follow-up for each option of `question`."""
+        parent = history_key(previous_qa)
+        branches = []
+        for option in question.get("options") or []:
+            history = list(previous_qa or []) + [{"question": question.get("question"), "answer": option}]
+            branches.append((history_key(history), history))
+
+        with self._lock:
+            now = time.time()
+            while self._started and now - self._started[0] > 60:
+                self._started.popleft()
+            started = {}
+            for key, history in branches:
+                if key in self._ready or key in self._pending:
+                    continue
+                if len(self._pending) >= self.max_inflight or len(self._started) >= self.per_minute:
+                    self.stats["skipped_budget"] += 1
+                    continue
+                self._started.append(now)
+                self.stats["speculated"] += 1
+                ctx = contextvars.copy_context()
+                future = self._executor.submit(ctx.run, self._run, key, history)
+                self._pending[key] = future
+                started[key] = future
+            if started:
+                self._siblings[parent] = started
+
+    def stash(self, previous_qa, question, follow_ups):
+        """Buffer follow_ups[i] as the next question after answering
+        question with its i-th option."""
+        buffered = {}
+        with self._lock:
+            for option, follow_up in zip(question.get("options") or [], follow_ups):
+                if follow_up is None:
+                    continue
+                history = list(previous_qa or []) + [{"question": question.get("question"), "answer": option}]
+                key = history_key(history)
+                self._ready[key] = follow_up
+                buffered[key] = None
+                self.stats["buffered"] += 1
+            if buffered:
+                self._siblings[history_key(previous_qa)] = buffered
+
+    def _run(self, key, history):
+        try:
+            question = self.generate(history)
+        except Exception as e:
+            self._bump("failed")
+            log.warning("Speculative question generation failed: %s", e)
+            question = None
+        with self._lock:
+            self._pending.pop(key, None)
+            if key in self._discard:
+                self._discard.discard(key)
+            elif question is not None:
+                self._ready[key] = question
+        return question
+
+    def _cancel_siblings(self, parent, keep):
+        with self._lock:
+            siblings = self._siblings.pop(parent, None) or {}
+            for key, future in siblings.items():
+                if key == keep:
+                    continue
+                if future is not None and future.cancel():
+                    self._pending.pop(key, None)
+                    self.stats["cancelled"] += 1
+                elif key in self._pending:
+                    # Already running: let it finish but don't keep the result
+                    self._discard.add(key)
+                    self.stats["discarded"] += 1
+                elif self._ready.pop(key, None) is not None:
+                    self.stats["discarded"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["ready"] = len(self._ready)
+            stats["pending"] = len(self._pending)
+        lookups = stats["hits"] + stats["inflight_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["inflight_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,232 @@
+"""Per-call-site model routing for Gemini calls.
+
+Each call site (question, summary, career, ...) has an ordered list of
+candidate models, configured as
+
+    LLM_ROUTES="question=gemini-1.5-flash-8b:4000,gemini-1.5-flash;summary=gemini-1.5-flash,gemini-1.5-pro"
+
+A candidate may carry a prompt size limit in tokens (":4000"); larger
+prompts skip it, so short prompts can go to a lighter model. Sites not
+listed use the default model alone.
+
+For every call the router picks, among the candidates that fit the prompt
+and are not cut off, the one with the lowest expected latency: the moving
+average of its recent latency at that site (full responses and streams,
+timed to their first chunk, are averaged separately), inflated by its
+recent error rate. Candidates never measured at a site are tried first, in listed order,
+unless they have only been failing; a small share of calls (explore_rate)
+goes to another candidate so stale estimates get refreshed.
+
+After `failures` consecutive availability errors (429s, 5xx, timeouts) a
+model is cut off for `cooldown` seconds at every site; errors about the
+request itself (InvalidArgument, a safety block) don't count against it.
+A failed call fails over to the next candidate straight away. When every candidate is cut off, the one that was cut off
+first is probed. Decisions are counted by site, model and reason.
+"""
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+
+import deadline
+import metrics
+from governor import Overloaded, is_throttle_error
+from hedging import current_site
+
+log = logging.getLogger(__name__)
+
+Candidate = namedtuple("Candidate", "name max_tokens")
+
+# How much a model's recent error rate inflates its expected latency
+ERROR_PENALTY = 4
+
+# Upstream errors that say the model is struggling rather than that the
+# request was bad (InvalidArgument, a safety block, ...)
+UNAVAILABLE_ERRORS = ("InternalServerError", "BadGateway", "ServiceUnavailable", "GatewayTimeout",
+                      "DeadlineExceeded", "Unknown", "RetryError")
+
+
+def parse_routes(spec):
+    """{site: [Candidate, ...]} from "site=model[:max_tokens],...;site=..."."""
+    routes = {}
+    for entry in (spec or "").split(";"):
+        site, _, models = entry.partition("=")
+        candidates = []
+        for model in models.split(","):
+            name, _, limit = model.strip().partition(":")
+            if name:
+                candidates.append(Candidate(name, int(limit) if limit else None))
+        if site.strip() and candidates:
+            routes[site.strip()] = candidates
+    return routes
+
+
+def _measure(stream):
+    # Streams return at their first chunk, so they're timed to it
+    return "first_chunk" if stream else "response"
+
+
+def is_unavailable_error(exc):
+    """Whether exc says the model is unavailable (429, 5xx, a timeout or a
+    dropped connection), as opposed to a rejection of this request."""
+    if isinstance(exc, Overloaded):
+        return exc.__cause__ is not None
+    if is_throttle_error(exc) or isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    code = getattr(code, "value", code)
+    if isinstance(code, int) and code >= 500:
+        return True
+    return type(exc).__name__ in UNAVAILABLE_ERRORS
+
+
+class ModelRouter:
+    def __init__(self, factory, routes, default_model, alpha=0.2, failures=3, cooldown=30,
+                 explore_rate=0.02, estimate_tokens=lambda prompt: len(str(prompt)) // 4 + 1):
+        """factory(name) builds the (governed) model for a model name."""
+        self.factory = factory
+        self.routes = routes
+        self.default_model = default_model
+        self.model_name = default_model
+        self.alpha = alpha
+        self.failures = failures
+        self.cooldown = cooldown
+        self.explore_rate = explore_rate
+        self.estimate_tokens = estimate_tokens
+        self._models = {}
+        self._latency = {}
+        self._health = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def model(self, name):
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = self.factory(name)
+            return model
+
+    def candidates(self, site):
+        return self.routes.get(site) or [Candidate(self.default_model, None)]
+
+    def _state(self, name):
+        state = self._health.get(name)
+        if state is None:
+            state = self._health[name] = {"error_rate": 0.0, "streak": 0, "cut_off_until": 0.0}
+        return state
+
+    def _score(self, key, name):
+        latency = self._latency.get(key + (name,))
+        error_rate = self._state(name)["error_rate"]
+        if latency is None:
+            # Untried models go first, unless they have only ever failed
+            return float("inf") if error_rate else 0.0
+        return latency * (1 + ERROR_PENALTY * error_rate)
+
+    def plan(self, site, prompt, stream=False):
+        """[(model, reason), ...]: the model to call first, then the
+        failover order."""
+        candidates = self.candidates(site)
+        if len(candidates) == 1:
+            return [(candidates[0].name, "only")]
+        tokens = self.estimate_tokens(prompt)
+        fits = [c.name for c in candidates if not c.max_tokens or tokens <= c.max_tokens]
+        fits = fits or [candidates[-1].name]
+        now = time.monotonic()
+        with self._lock:
+            healthy = [name for name in fits if self._state(name)["cut_off_until"] <= now]
+            if not healthy:
+                return [(min(fits, key=lambda name: self._state(name)["cut_off_until"]), "probe")]
+            key = (site, _measure(stream))
+            ranked = sorted(healthy, key=lambda name: (self._score(key, name), fits.index(name)))
+            measured = key + (ranked[0],) in self._latency
+        reason = "fastest" if measured else "untried"
+        if len(ranked) > 1 and measured and self._random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(self._random.randrange(1, len(ranked))))
+            reason = "explore"
+        return [(ranked[0], reason)] + [(name, "failover") for name in ranked[1:]]
+
+    def _succeeded(self, site, name, stream, seconds):
+        with self._lock:
+            key = (site, _measure(stream), name)
+            previous = self._latency.get(key)
+            self._latency[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+            state = self._state(name)
+            state["error_rate"] *= 1 - self.alpha
+            state["streak"] = 0
+
+    def _failed(self, name, error):
+        with self._lock:
+            state = self._state(name)
+            state["error_rate"] += self.alpha * (1 - state["error_rate"])
+            state["streak"] += 1
+            if state["streak"] >= self.failures:
+                state["cut_off_until"] = time.monotonic() + self.cooldown
+                log.warning("Model %s cut off for %ss after %s errors: %s", name, self.cooldown, state["streak"], error)
+
+    def _should_fail_over(self, error):
+        # A spent request budget or a full local queue would fail on any model
+        if isinstance(error, deadline.DeadlineExceeded) or deadline.remaining() == 0:
+            return False
+        return not (isinstance(error, Overloaded) and error.__cause__ is None)
+
+    def _attempts(self, prompt, stream):
+        site = current_site()
+        for name, reason in self.plan(site, prompt, stream):
+            metrics.LLM_ROUTE_DECISIONS.inc(site=site, model=name, reason=reason)
+            yield site, name
+
+    def generate_content(self, prompt, **kwargs):
+        error = None
+        for site, name in self._attempts(prompt, kwargs.get("stream")):
+            t0 = time.monotonic()
+            try:
+                response = self.model(name).generate_content(prompt, **kwargs)
+            except Exception as e:
+                if not self._should_fail_over(e):
+                    raise
+                if is_unavailable_error(e):
+                    self._failed(name, e)
+                error = e
+                continue
+            self._succeeded(site, name, kwargs.get("stream"), time.monotonic() - t0)
+            return response
+        raise error
+
+    async def generate_content_async(self, prompt, **kwargs):
+        error = None
+        for site, name in self._attempts(prompt, kwargs.get("stream")):
+            t0 = time.monotonic()
+            try:
+                response = await self.model(name).generate_content_async(prompt, **kwargs)
+            except Exception as e:
+                if not self._should_fail_over(e):
+                    raise
+                if is_unavailable_error(e):
+                    self._failed(name, e)
+                error = e
+                continue
+            self._succeeded(site, name, kwargs.get("stream"), time.monotonic() - t0)
+            return response
+        raise error
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "models": {
+                    name: {"error_rate": round(state["error_rate"], 3),
+                           "cut_off": state["cut_off_until"] > now}
+                    for name, state in self._health.items()
+                },
+                "latency": [
+                    {"site": site, "measure": measure, "model": name, "seconds": round(seconds, 3)}
+                    for (site, measure, name), seconds in self._latency.items()
+                ],
+            }
@@ -0,0 +1,75 @@
+"""TF-IDF cosine scoring of candidate pages against a query.
+
+Texts are tokenized once into sparse term vectors (term -> weight dicts), IDF
+is computed over the whole batch, and every document is scored against the
+query in a single pass. The web search endpoints score all of their results
+with one call instead of one substring scan per analysis term per page.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'or', 'the', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
+    'is', 'are', 'be', 'as', 'by', 'this', 'that', 'their', 'they', 'it', 'its',
+    'from', 'has', 'have', 'will', 'can', 'may', 'more', 'such', 'also', 'very',
+}
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    # Cheap suffix stripping so "designing"/"designer"/"design" share a term
+    for suffix in ("ations", "ation", "ings", "ing", "ists", "ist", "ers", "er", "ics", "ic", "al", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    return [stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOP_WORDS]
+
+
+def _tfidf(counts, idf):
+    vec = {t: (1 + math.log(c)) * idf[t] for t, c in counts.items()}
+    norm = math.sqrt(sum(w * w for w in vec.values()))
+    if norm:
+        for t in vec:
+            vec[t] /= norm
+    return vec
+
+
+def cosine_scores(query, documents):
+    """Return the TF-IDF cosine similarity (0..1) of each document to query."""
+    counts = [Counter(tokenize(d)) for d in documents]
+    query_counts = Counter(tokenize(query))
+    n = len(counts) + 1
+    df = Counter(query_counts.keys())
+    for c in counts:
+        df.update(c.keys())
+    idf = {t: math.log((1 + n) / (1 + d)) + 1 for t, d in df.items()}
+
+    q = _tfidf(query_counts, idf)
+    scores = []
+    for c in counts:
+        doc = _tfidf(c, idf)
+        # Iterate over the smaller vector; analyses are much longer than pages
+        small, large = (doc, q) if len(doc) < len(q) else (q, doc)
+        scores.append(sum(w * large.get(t, 0.0) for t, w in small.items()))
+    return scores
+
+
+def _scale(similarity, low, high, saturate):
+    return int(round(low + (high - low) * min(1.0, similarity / saturate)))
+
+
+def relevance_scores(texts, career_titles):
+    """Relevance of each text to the career titles, scaled to 70-98."""
+    return [_scale(s, 70, 98, 0.5) for s in cosine_scores(" ".join(career_titles), texts)]
+
+
+def match_scores(texts, analysis):
+    """Match of each text against a free-text analysis, scaled to 60-95."""
+    return [_scale(s, 60, 95, 0.3) for s in cosine_scores(analysis, texts)]
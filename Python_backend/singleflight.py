@@ -0,0 +1,278 @@
+"""Coalesce identical concurrent requests onto a single computation.
+
+When a class submits together, or a client retries after a timeout, the same
+payload can arrive several times while the first is still being computed.
+Group.do() runs the first caller's function and makes the others wait for
+and share its result (or exception) instead of starting their own model
+calls.
+
+Within a process this uses threading Events. With a db_path, flights are
+also registered in a SQLite file so duplicates landing on other gunicorn
+workers wait for the leader's result too, and a finished result stays
+there for `grace` seconds so a retry arriving just after it still shares
+it. A leader that disappears mid-flight is taken over after `timeout`
+seconds. do_async() is the same for coroutines, for the ASGI app; its
+SQLite reads and writes run in a thread (asyncio.to_thread) so they never
+block the event loop.
+
+Followers wait no longer than their own request's deadline (deadline.py)
+and then raise DeadlineExceeded, even if the leader has more time left.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import deadline
+
+log = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.futures = []
+
+    def settle(self, futures):
+        self.done.set()
+        for loop, future in futures:
+            loop.call_soon_threadsafe(self._resolve, future)
+
+    def _resolve(self, future):
+        if future.done():
+            return
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            future.set_result(self.result)
+
+
+class Group:
+    def __init__(self, db_path=None, timeout=300, poll_interval=0.2, grace=5):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.grace = grace
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"leaders": 0, "coalesced": 0, "coalesced_remote": 0}
+        if db_path:
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, started REAL NOT NULL, "
+                "finished REAL, result TEXT, error TEXT)"
+            )
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already in flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._bump("coalesced")
+            if not flight.done.wait(deadline.cap(None)):
+                raise deadline.DeadlineExceeded("Request ran out of time waiting for an identical request")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._lead(key, fn)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def do_async(self, key, fn):
+        """do() for the ASGI app: fn() returns an awaitable, and followers
+        wait on a future instead of blocking a thread. Flights are shared
+        with do() callers in the same process."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                waiter = (asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+                flight.futures.append(waiter)
+        if not leader:
+            self._bump("coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(waiter[1]), deadline.cap(None))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if waiter in flight.futures:
+                        flight.futures.remove(waiter)
+                waiter[1].cancel()
+                raise deadline.DeadlineExceeded("Request ran out of time waiting for an identical request") from None
+
+        try:
+            flight.result = await self._alead(key, fn)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+            futures, flight.futures = flight.futures, []
+        flight.settle(futures)
+
+    def _lead(self, key, fn):
+        if not self.db_path:
+            self._bump("leaders")
+            return fn()
+        owner, claimed = self._try_claim(key)
+        if not claimed:
+            found, result = self._wait_remote(key)
+            if found:
+                self._bump("coalesced_remote")
+                return result
+            # The remote leader failed or vanished; compute it ourselves
+        self._bump("leaders")
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, owner, error=str(e) or type(e).__name__)
+            raise
+        self._finish(key, owner, result=result)
+        return result
+
+    async def _alead(self, key, fn):
+        if not self.db_path:
+            self._bump("leaders")
+            return await fn()
+        owner, claimed = await asyncio.to_thread(self._try_claim, key)
+        if not claimed:
+            found, result = await self._await_remote(key)
+            if found:
+                self._bump("coalesced_remote")
+                return result
+        self._bump("leaders")
+        try:
+            result = await fn()
+        except Exception as e:
+            await asyncio.to_thread(self._finish, key, owner, error=str(e) or type(e).__name__)
+            raise
+        await asyncio.to_thread(self._finish, key, owner, result=result)
+        return result
+
+    def _try_claim(self, key):
+        owner = uuid.uuid4().hex
+        try:
+            return owner, self._claim(key, owner)
+        except sqlite3.Error as e:
+            log.warning("Single-flight store error, running locally: %s", e)
+            return owner, True
+
+    def _claim(self, key, owner):
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "DELETE FROM flights WHERE (finished IS NOT NULL AND finished < ?) OR (finished IS NULL AND started < ?)",
+            (now - self.grace, now - self.timeout),
+        )
+        cur = db.execute(
+            "INSERT OR IGNORE INTO flights (key, owner, started) VALUES (?, ?, ?)", (key, owner, now)
+        )
+        if cur.rowcount:
+            return True
+        row = db.execute("SELECT finished, error FROM flights WHERE key = ?", (key,)).fetchone()
+        if row and row[0] is not None and row[1] is not None:
+            # A recent failed flight shouldn't make this caller fail too
+            db.execute("UPDATE flights SET owner = ?, started = ?, finished = NULL, result = NULL, error = NULL "
+                       "WHERE key = ?", (owner, now, key))
+            return True
+        return False
+
+    def _poll_remote(self, key):
+        """(finished, found, result) for a flight led by another worker."""
+        try:
+            row = self._db().execute(
+                "SELECT finished, result, error FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("Single-flight store error: %s", e)
+            return True, False, None
+        if row is None or (row[0] is not None and row[2] is not None):
+            return True, False, None
+        if row[0] is not None:
+            return True, True, json.loads(row[1])
+        return False, False, None
+
+    def _remote_timed_out(self, timeout):
+        """After waiting timeout seconds for a remote leader: take over the
+        flight (False, None), unless it was the request deadline that ran out."""
+        if timeout < self.timeout:
+            raise deadline.DeadlineExceeded("Request ran out of time waiting for an identical request")
+        return False, None
+
+    def _wait_remote(self, key):
+        timeout = deadline.cap(self.timeout)
+        give_up_at = time.time() + timeout
+        while time.time() < give_up_at:
+            finished, found, result = self._poll_remote(key)
+            if finished:
+                return found, result
+            time.sleep(max(0.0, min(self.poll_interval, give_up_at - time.time())))
+        return self._remote_timed_out(timeout)
+
+    async def _await_remote(self, key):
+        timeout = deadline.cap(self.timeout)
+        give_up_at = time.time() + timeout
+        while time.time() < give_up_at:
+            finished, found, result = await asyncio.to_thread(self._poll_remote, key)
+            if finished:
+                return found, result
+            await asyncio.sleep(max(0.0, min(self.poll_interval, give_up_at - time.time())))
+        return self._remote_timed_out(timeout)
+
+    def _finish(self, key, owner, result=None, error=None):
+        try:
+            self._db().execute(
+                "UPDATE flights SET finished = ?, result = ?, error = ? WHERE key = ? AND owner = ?",
+                (time.time(), None if error else json.dumps(result), error, key, owner),
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            log.warning("Single-flight store write error: %s", e)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._flights)
+        calls = stats["leaders"] + stats["coalesced"] + stats["coalesced_remote"]
+        stats["coalescing_ratio"] = round((calls - stats["leaders"]) / calls, 3) if calls else 0.0
+        return stats
+
+
+def create_group():
+    return Group(
+        db_path=os.getenv("SINGLEFLIGHT_DB") or None,
+        timeout=int(os.getenv("SINGLEFLIGHT_TIMEOUT", 300)),
+    )
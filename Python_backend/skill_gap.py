@@ -0,0 +1,146 @@
+"""Per-career fan-out for /skill-gap.
+
+The skill gap report used to be one prompt covering every target career, so
+it was slow and one malformed career failed the whole request. It is now
+built in two steps: one call extracts the user's skills, then each target
+career is analyzed by its own call, in parallel, and the results are merged.
+
+A career's analysis only depends on the career, the user's skills and their
+location preferences, so it is cached under (title, skills fingerprint,
+location) and reused across users with the same profile. The fingerprint
+ignores case, order and which category a skill was filed under.
+
+Careers that finish before the deadline are returned even if others fail or
+time out; those are listed under "failedCareers" with "partial": true.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import deadline
+from llm_cache import ResponseCache
+
+SKILL_GAP_CAREER_TIMEOUT = float(os.getenv("SKILL_GAP_CAREER_TIMEOUT", 60))
+
+log = logging.getLogger(__name__)
+
+career_gap_cache = ResponseCache(
+    maxsize=int(os.getenv("SKILL_GAP_CACHE_SIZE", 1000)),
+    ttl=int(os.getenv("SKILL_GAP_CACHE_TTL", 7 * 86400)),
+    db_path=os.getenv("SKILL_GAP_CACHE_DB") or None,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SKILL_GAP_WORKERS", 16)), thread_name_prefix="skill-gap"
+)
+
+
+def _norm(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def target_titles(data):
+    """Distinct career titles requested, in order. Entries may be strings or
+    objects with a title/name."""
+    careers = data.get('target_careers') or data.get('careers') or []
+    titles, seen = [], set()
+    for career in careers if isinstance(careers, list) else []:
+        title = career if isinstance(career, str) else (career or {}).get('title') or (career or {}).get('name')
+        if title and _norm(title) not in seen:
+            seen.add(_norm(title))
+            titles.append(str(title).strip())
+    return titles
+
+
+def skills_fingerprint(user_skills):
+    skills = set()
+    for values in (user_skills or {}).values():
+        if isinstance(values, list):
+            skills.update(_norm(v) for v in values if _norm(v))
+    return hashlib.sha256("\n".join(sorted(skills)).encode("utf-8")).hexdigest()[:16]
+
+
+def location_key(preferences):
+    preferences = preferences or {}
+    return [
+        [_norm((preferences.get(kind) or {}).get(part)) for part in ('country', 'state', 'district')]
+        for kind in ('jobLocation', 'studyLocation')
+    ]
+
+
+def career_key(title, user_skills, preferences):
+    payload = json.dumps([_norm(title), skills_fingerprint(user_skills), location_key(preferences)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_career(title, user_skills, preferences):
+    text = career_gap_cache.get(career_key(title, user_skills, preferences))
+    return json.loads(text) if text else None
+
+
+def store_career(title, user_skills, preferences, career):
+    career_gap_cache.set(career_key(title, user_skills, preferences), json.dumps(career))
+
+
+def fan_out(titles, analyze, timeout=SKILL_GAP_CAREER_TIMEOUT):
+    """Run analyze(title) for every title in parallel. Returns {title: result
+    or exception}; titles not done within timeout (or the request's
+    deadline, if sooner) map to TimeoutError."""
+    timeout = deadline.cap(timeout)
+    futures = {
+        _executor.submit(contextvars.copy_context().run, analyze, title): title for title in titles
+    }
+    done, not_done = wait(list(futures), timeout=timeout)
+    outcomes = {}
+    for future, title in futures.items():
+        if future in not_done:
+            # Left running: a late result still lands in the cache
+            outcomes[title] = TimeoutError(f"No analysis for '{title}' within {timeout:g}s")
+        elif future.exception() is not None:
+            outcomes[title] = future.exception()
+        else:
+            outcomes[title] = future.result()
+    return outcomes
+
+
+async def afan_out(titles, analyze, timeout=SKILL_GAP_CAREER_TIMEOUT):
+    """fan_out() for a coroutine function, for the ASGI app."""
+    timeout = deadline.cap(timeout)
+    tasks = {asyncio.ensure_future(analyze(title)): title for title in titles}
+    if not tasks:
+        return {}
+    done, not_done = await asyncio.wait(list(tasks), timeout=timeout)
+    outcomes = {}
+    for task, title in tasks.items():
+        if task in not_done:
+            outcomes[title] = TimeoutError(f"No analysis for '{title}' within {timeout:g}s")
+        elif task.exception() is not None:
+            outcomes[title] = task.exception()
+        else:
+            outcomes[title] = task.result()
+    return outcomes
+
+
+def merge(user_skills, titles, outcomes):
+    """Build the /skill-gap response from per-career outcomes, in title
+    order. Raises the first error if no career succeeded."""
+    careers, failed = [], []
+    for title in titles:
+        outcome = outcomes.get(title)
+        if isinstance(outcome, Exception):
+            log.warning("Skill gap analysis for '%s' failed: %s", title, outcome)
+            failed.append({"title": title, "error": str(outcome) or type(outcome).__name__})
+        elif outcome is not None:
+            careers.append(outcome)
+    if titles and not careers:
+        raise next(o for o in outcomes.values() if isinstance(o, Exception))
+    result = {"userSkills": user_skills, "careers": careers}
+    if failed:
+        result.update(partial=True, failedCareers=failed)
+    return result
+
@@ -0,0 +1,258 @@
+"""Structured (JSON) model output: incremental parsing, repair and schemas.
+
+JsonScanner is fed the response text chunk by chunk as it streams. It
+matches braces and brackets outside of strings, so it knows the moment the
+top-level value is complete and can flag a mismatched closer as soon as it
+arrives, letting the caller stop reading a response that can't parse.
+repair() fixes the usual near-misses (code fences, trailing commas, output
+cut off mid-value) so fewer responses need a second generation.
+
+SCHEMAS holds a small JSON-Schema subset per call site; validate() checks a
+parsed value against it. json_mode_config() asks the model for JSON output
+directly when the installed google-generativeai supports it.
+"""
+import json
+import re
+
+_CLOSERS = {"{": "}", "[": "]"}
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+class JsonScanner:
+    """Find the first top-level JSON object or array in streamed text."""
+
+    def __init__(self, kind="object"):
+        self.opener = "{" if kind == "object" else "["
+        self.text = ""
+        self.start = None
+        self.end = None
+        self.error = None
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._pos = 0
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.complete or self.error:
+            return
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self.start is None:
+                if c == self.opener:
+                    self.start = i
+                    self._stack.append(_CLOSERS[c])
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in _CLOSERS:
+                self._stack.append(_CLOSERS[c])
+            elif c in "}]":
+                if c != self._stack.pop():
+                    self.error = f"unexpected '{c}' at offset {i}"
+                    return
+                if not self._stack:
+                    self.end = i + 1
+                    return
+        self._pos = len(text)
+
+    def value_text(self):
+        """The complete top-level value, or the partial one so far."""
+        if self.start is None:
+            return None
+        return self.text[self.start:self.end]
+
+    def closing_suffix(self):
+        """Characters that would close the value as scanned so far."""
+        return ('"' if self._in_string else "") + "".join(reversed(self._stack))
+
+
+def strip_fences(text):
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    if cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return cleaned.strip()
+
+
+def _last_quote(text, end):
+    """Index of the last unescaped '"' before end, or -1."""
+    i = text.rfind('"', 0, end)
+    while i > 0:
+        backslashes = len(text[:i]) - len(text[:i].rstrip("\\"))
+        if backslashes % 2 == 0:
+            break
+        i = text.rfind('"', 0, i)
+    return i
+
+
+def _drop_dangling(text, in_object):
+    """Drop a trailing separator, or in an object a key with no value."""
+    text = text.rstrip()
+    if text.endswith(","):
+        return text[:-1].rstrip()
+    if not in_object:
+        return text
+    if text.endswith(":"):
+        text = text[:-1].rstrip()
+    if text.endswith('"'):
+        before = text[:_last_quote(text, len(text) - 1)].rstrip()
+        if before.endswith(","):
+            return before[:-1].rstrip()
+        if before.endswith("{"):
+            return before
+    return text
+
+
+def repair(partial, closing=""):
+    """Best-effort fix-up of almost-valid JSON: drop trailing commas, a
+    string cut off before its closing quote and a dangling key or
+    separator, then close whatever is still open (closing, as given by
+    JsonScanner.closing_suffix())."""
+    text = partial
+    if closing.startswith('"'):
+        # A string that never ended is incomplete data, not a value
+        text = text[:_last_quote(text, len(text))]
+        closing = closing[1:]
+    text = _drop_dangling(text, closing.startswith("}"))
+    return _TRAILING_COMMA_RE.sub(r"\1", text + closing)
+
+
+def parse(text, kind="object"):
+    """Parse the first JSON object/array in text, repairing it if needed.
+    Returns (value, repaired) or (None, False)."""
+    if not text:
+        return None, False
+    scanner = JsonScanner(kind)
+    scanner.feed(strip_fences(text))
+    return parse_scanned(scanner)
+
+
+def parse_scanned(scanner):
+    raw = scanner.value_text()
+    if raw is None:
+        return None, False
+    if scanner.complete:
+        try:
+            return json.loads(raw), False
+        except ValueError:
+            pass
+    if scanner.error:
+        return None, False
+    try:
+        return json.loads(repair(raw, "" if scanner.complete else scanner.closing_suffix())), True
+    except ValueError:
+        return None, False
+
+
+_TYPES = {
+    "object": dict, "array": list, "string": str,
+    "number": (int, float), "integer": int, "boolean": bool,
+}
+
+
+def validate(value, schema, path="$"):
+    """Return None if value matches schema, else a short error message."""
+    expected = schema.get("type")
+    if expected and not isinstance(value, _TYPES[expected]):
+        return f"{path} should be {expected}"
+    if expected == "object":
+        for key in schema.get("required", ()):
+            if key not in value:
+                return f"{path} is missing '{key}'"
+        for key, sub in schema.get("properties", {}).items():
+            if key in value:
+                error = validate(value[key], sub, f"{path}.{key}")
+                if error:
+                    return error
+    if expected == "array":
+        if len(value) < schema.get("minItems", 0):
+            return f"{path} needs at least {schema['minItems']} items"
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            return f"{path} allows at most {schema['maxItems']} items"
+        if "items" in schema:
+            for i, item in enumerate(value):
+                error = validate(item, schema["items"], f"{path}[{i}]")
+                if error:
+                    return error
+    return None
+
+
+_QUESTION = {
+    "type": "object",
+    "required": ["question", "options"],
+    "properties": {
+        "question": {"type": "string"},
+        "options": {"type": "array", "minItems": 4, "maxItems": 4, "items": {"type": "string"}},
+    },
+}
+_CAREER_LIST = {
+    "type": "array",
+    "minItems": 1,
+    "items": {"type": "object", "required": ["title"], "properties": {"title": {"type": "string"}}},
+}
+_PLAN = {"type": "array", "items": {"type": "string"}}
+
+SCHEMAS = {
+    "question": _QUESTION,
+    "question_batch": _QUESTION,
+    "question_prefetch": _QUESTION,
+    # Malformed openers are filtered out individually
+    "question_pool": {"type": "array", "minItems": 1},
+    "career": _CAREER_LIST,
+    "pdf": _CAREER_LIST,
+    "skill_gap_profile": {
+        "type": "object",
+        "required": ["userSkills"],
+        "properties": {"userSkills": {"type": "object"}, "careers": {"type": "array"}},
+    },
+    "skill_gap_career": {
+        "type": "object",
+        "required": ["title", "requiredSkills", "gaps"],
+        "properties": {
+            "title": {"type": "string"},
+            "requiredSkills": {"type": "object"},
+            "gaps": {"type": "object"},
+            "next90DaysPlan": {"type": "object"},
+        },
+    },
+    # Alternative key spellings are normalized by the route, so none are required
+    "course_plan": {
+        "type": "object",
+        "properties": {"day0_30": _PLAN, "day31_60": _PLAN, "day61_90": _PLAN},
+    },
+}
+
+
+def _sdk_supports_json_mode():
+    try:
+        from google.generativeai.types import GenerationConfig
+    except ImportError:
+        return False
+    return "response_mime_type" in getattr(GenerationConfig, "__dataclass_fields__", {})
+
+
+JSON_MODE_SUPPORTED = _sdk_supports_json_mode()
+
+
+def json_mode_config():
+    """generation_config requesting JSON output, or None if the installed SDK
+    predates JSON mode (the prompt alone then asks for JSON)."""
+    if not JSON_MODE_SUPPORTED:
+        return None
+    return {"response_mime_type": "application/json"}
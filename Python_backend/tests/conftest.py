@@ -0,0 +1,66 @@
+"""Shared fixtures: the local Gemini stand-in from benchmarks/fake_gemini.py
+and the Flask app pointed at it. Every SQLite store and the question pool
+live in a temporary directory, set before any backend module is imported.
+
+Run from Python_backend/: python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")]
+
+STORE_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update({
+    "GEMINI_API_KEY": "AIzaTestKey",
+    "LOG_LEVEL": "WARNING",
+    "OPENING_POOL": "false",
+    "JOBS_DB": os.path.join(STORE_DIR, "jobs.db"),
+    "CHAT_SESSIONS_DB": os.path.join(STORE_DIR, "chat_sessions.db"),
+    "PAGE_CACHE_DB": os.path.join(STORE_DIR, "page_cache.db"),
+    "PLAN_STORE_DB": os.path.join(STORE_DIR, "plan_store.db"),
+    "OPENING_POOL_PATH": os.path.join(STORE_DIR, "question_pool.json"),
+})
+for name in ("LLM_CACHE_DB", "SKILL_GAP_CACHE_DB", "SINGLEFLIGHT_DB"):
+    os.environ.pop(name, None)
+
+import pytest
+
+from fake_gemini import FakeGemini
+
+
+@pytest.fixture(scope="session")
+def fake_gemini_server():
+    fake = FakeGemini(latency=0.0)
+    server, url = fake.serve()
+    yield fake, url
+    server.shutdown()
+
+
+@pytest.fixture
+def fake_gemini(fake_gemini_server):
+    """The fake, reset to answer every call at once after the test."""
+    fake, _ = fake_gemini_server
+    yield fake
+    fake.latency, fake.throttle_rate, fake.throttle_status = 0.0, 0.0, 429
+
+
+@pytest.fixture(scope="session")
+def gemini(fake_gemini_server):
+    """The google.generativeai module configured against the fake."""
+    import google.generativeai as genai
+
+    _, url = fake_gemini_server
+    genai.configure(api_key="AIzaTestKey", transport="rest", client_options={"api_endpoint": url})
+    return genai
+
+
+@pytest.fixture(scope="session")
+def backend(fake_gemini_server):
+    """The app module, with its Gemini calls sent to the fake."""
+    _, url = fake_gemini_server
+    os.environ["GEMINI_API_ENDPOINT"] = url
+    import app
+
+    return app
@@ -0,0 +1,85 @@
+"""Parsing the career catalog and ranking it locally."""
+import json
+import os
+
+import career_index
+from career_index import CareerRanker, format_shortlist, parse_careers
+
+CATALOG = """List of Professional Careers
+1. Computers and IT
+i. Software Engineer
+ii. Data Analyst
+Page: 1
+2. Health Care
+i. Nurse
+iv. Veterinary Doctor
+List of Vocational Careers
+1. Trades
+i. Electrician
+"""
+
+
+def test_catalog_text_is_parsed_into_records():
+    assert parse_careers(CATALOG) == [
+        {"title": "Software Engineer", "category": "Computers and IT", "track": "Professional"},
+        {"title": "Data Analyst", "category": "Computers and IT", "track": "Professional"},
+        {"title": "Nurse", "category": "Health Care", "track": "Professional"},
+        {"title": "Veterinary Doctor", "category": "Health Care", "track": "Professional"},
+        {"title": "Electrician", "category": "Trades", "track": "Vocational"},
+    ]
+
+
+def test_ranker_puts_title_matches_first_and_drops_non_matches():
+    ranker = CareerRanker(parse_careers(CATALOG))
+    top = ranker.top("I enjoy software and engineering, computers too")
+    assert [r["title"] for r in top] == ["Software Engineer", "Data Analyst"]
+    assert top[0]["score"] > top[1]["score"] > 0
+    assert ranker.top("nothing relevant here") == []
+    assert len(ranker.top("care health nurse veterinary", n=1)) == 1
+
+
+def test_ranker_handles_an_empty_catalog():
+    ranker = CareerRanker([])
+    assert ranker.scores("software") == [] and ranker.top("software") == []
+
+
+def test_shortlist_lists_title_category_and_track():
+    records = parse_careers(CATALOG)[:2]
+    assert format_shortlist(records) == (
+        "- Software Engineer (Computers and IT, Professional)\n"
+        "- Data Analyst (Computers and IT, Professional)"
+    )
+
+
+def test_index_is_reused_until_the_pdf_changes(tmp_path, monkeypatch):
+    pdf = tmp_path / "careers.pdf"
+    pdf.write_bytes(b"%PDF stand-in")
+    index = tmp_path / "index.json"
+    builds = []
+
+    def build(pdf_path, index_path):
+        builds.append(pdf_path)
+        stat = os.stat(pdf_path)
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": {"mtime": stat.st_mtime, "size": stat.st_size},
+                "categories": [["Trades", "Vocational"]],
+                "careers": [["Electrician", 0]],
+            }, f)
+        return [{"title": "Electrician", "category": "Trades", "track": "Vocational"}]
+
+    monkeypatch.setattr(career_index, "build_index", build)
+    first = career_index.load_index(str(pdf), str(index))
+    assert career_index.load_index(str(pdf), str(index)) == first
+    assert len(builds) == 1
+
+    pdf.write_bytes(b"%PDF stand-in, now longer")
+    career_index.load_index(str(pdf), str(index))
+    assert len(builds) == 2
+
+
+def test_shipped_index_covers_the_full_catalog():
+    ranker = career_index.get_career_ranker()
+    assert len(ranker.records) > 400
+    titles = [r["title"] for r in ranker.top("software programming", n=5)]
+    assert any("Software" in t for t in titles)
@@ -0,0 +1,47 @@
+"""Chat sessions expire, survive concurrent writers and keep the latest turn."""
+import threading
+import time
+
+from chat_sessions import ChatSessionStore
+
+
+def store(tmp_path, **kwargs):
+    return ChatSessionStore(str(tmp_path / "chat.db"), summarize=lambda prompt: "", **kwargs)
+
+
+def test_expired_sessions_are_deleted(tmp_path):
+    sessions = store(tmp_path, ttl=60)
+    sessions.record("old", "hi", "hello")
+    sessions._db().execute("UPDATE chat_sessions SET updated = ? WHERE id = 'old'", (time.time() - 120,))
+    sessions.record("new", "hi", "hello")
+    ids = [row[0] for row in sessions._db().execute("SELECT id FROM chat_sessions")]
+    assert ids == ["new"]
+
+
+def test_concurrent_records_are_all_kept(tmp_path):
+    # Each store has its own connections, like separate worker processes
+    workers = [store(tmp_path) for _ in range(4)]
+
+    def chat(sessions, n):
+        for i in range(10):
+            sessions.record("shared", f"question {n}.{i}", "answer")
+
+    threads = [threading.Thread(target=chat, args=(s, n)) for n, s in enumerate(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(workers[0].load("shared")["turns"]) == 4 * 10 * 2
+
+
+def test_latest_turn_is_kept_when_the_summary_fills_the_budget(tmp_path):
+    sessions = store(tmp_path, token_budget=50)
+    sessions._save("s", {"summary": "x" * 400, "turns": [
+        {"role": "user", "content": "first question"},
+        {"role": "assistant", "content": "first answer"},
+        {"role": "user", "content": "latest question"},
+        {"role": "assistant", "content": "latest answer"},
+    ]})
+    context = sessions.context("s", "next question")
+    assert "latest question" in context and "latest answer" in context
+    assert "first question" not in context
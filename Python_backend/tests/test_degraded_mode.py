@@ -0,0 +1,95 @@
+"""Degraded /analyze-answers: local recommendations when model stages fail or run out of time."""
+import time
+
+import deadline
+from local_recommender import answers_text, expand, recommend
+from pipeline import Stage
+
+ANSWERS = [
+    {"question": "What do you enjoy?", "answer": "Writing code and building robots"},
+    {"question": "Which subjects?", "answer": ["Computer science", "Maths"]},
+]
+
+
+def test_answers_are_flattened_into_one_query():
+    assert answers_text(ANSWERS + ["free text", None]) == (
+        "Writing code and building robots Computer science Maths free text")
+
+
+def test_interest_words_are_expanded_into_catalog_terms():
+    terms = expand("I love solving puzzles").split()
+    assert "mathemat" in terms and "engineer" in terms
+    # Short keys only match whole terms
+    assert "legal" not in expand("lawn mowing").split()
+
+
+def test_recommendations_are_deterministic_and_varied():
+    careers = recommend(answers_text(ANSWERS))
+    assert careers == recommend(answers_text(ANSWERS))
+    assert len(careers) == 5
+    assert careers[0]["match"] == 95 and all(75 <= c["match"] <= 95 for c in careers)
+    assert len({c["title"].lower() for c in careers}) == 5
+    categories = [c["category"] for c in careers]
+    assert all(categories.count(c) <= 2 for c in categories)
+    assert careers[0]["description"].startswith("Matches your interest in")
+
+
+def test_an_empty_query_still_gets_a_full_list():
+    careers = recommend("", n=3)
+    assert len(careers) == 3 and len({c["category"] for c in careers}) == 3
+    assert all(c["description"].startswith("A broadly suitable option") for c in careers)
+
+
+def test_missing_stages_are_filled_locally(backend):
+    data = {"final_answers": ANSWERS}
+    body = backend.finish_analysis(data, {"analysis": "Loves software", "careers": [{"title": "Nurse"}]},
+                                   {"analysis": 1.0}, RuntimeError("model down"), time.time())
+    assert body["ai_generated_careers"] == [{"title": "Nurse"}]
+    assert body["pdf_based_careers"] == recommend("Loves software")
+    assert body["degraded"] is True
+    assert body["meta"]["degraded"] == {"reason": "error", "stages": ["pdf_careers"]}
+
+    body = backend.finish_analysis(data, {}, {}, deadline.DeadlineExceeded("late"), time.time())
+    assert body["ai_generated_careers"] == body["pdf_based_careers"] == recommend(answers_text(ANSWERS))
+    assert body["meta"]["degraded"] == {"reason": "deadline", "stages": ["careers", "pdf_careers"]}
+
+    complete = {"careers": [{"title": "Nurse"}], "pdf_careers": [{"title": "Vet"}]}
+    assert "degraded" not in backend.finish_analysis(data, complete, {}, None, time.time())
+
+
+def test_endpoint_degrades_when_the_model_fails(backend, monkeypatch):
+    def model_down():
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(backend, "build_analysis_stages", lambda data: [Stage("analysis", model_down)])
+    response = backend.app.test_client().post("/analyze-answers", json={"final_answers": ANSWERS})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["degraded"] is True and body["meta"]["degraded"]["reason"] == "error"
+    assert [c["title"] for c in body["ai_generated_careers"]] == [c["title"] for c in recommend(answers_text(ANSWERS))]
+
+
+def test_endpoint_degrades_when_the_deadline_runs_out(backend, monkeypatch):
+    monkeypatch.setitem(backend.ENDPOINT_DEADLINES, "analyze-answers", 0.1)
+    monkeypatch.setattr(backend, "build_analysis_stages", lambda data: [
+        Stage("analysis", lambda: "Loves software"),
+        Stage("careers", lambda analysis: time.sleep(1), deps=["analysis"]),
+        Stage("pdf_careers", lambda analysis: time.sleep(1), deps=["analysis"]),
+    ])
+    t0 = time.monotonic()
+    body = backend.app.test_client().post("/analyze-answers", json={"final_answers": ANSWERS}).get_json()
+    assert time.monotonic() - t0 < 1
+    assert body["meta"]["degraded"] == {"reason": "deadline", "stages": ["careers", "pdf_careers"]}
+    assert body["pdf_based_careers"] == recommend("Loves software")
+
+
+def test_nested_budgets_only_shorten_the_deadline():
+    assert deadline.remaining() is None and deadline.cap(5) == 5
+    with deadline.budget(0.5):
+        with deadline.budget(60):
+            assert deadline.remaining() <= 0.5
+        with deadline.budget(0.01):
+            time.sleep(0.02)
+            assert deadline.cap(5) == 0
+        assert 0 < deadline.cap(5) <= 0.5
+    assert deadline.remaining() is None
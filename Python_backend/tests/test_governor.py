@@ -0,0 +1,159 @@
+"""Governor and GovernedModel against the fake Gemini's throttling."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from governor import BACKGROUND, INTERACTIVE, Governor, GovernedModel, Overloaded
+
+
+@pytest.fixture
+def model(gemini, monkeypatch):
+    # The SDK retries 503 UNAVAILABLE itself for up to a minute before the
+    # governor sees it; turn that off so the tests see each answer at once
+    from google.api_core import gapic_v1
+    from google.generativeai import client
+
+    transport = client.get_default_generative_client()._transport
+    monkeypatch.setitem(transport._wrapped_methods, transport.generate_content, gapic_v1.method.wrap_method(
+        transport.generate_content, default_retry=None, default_timeout=60))
+    return gemini.GenerativeModel("gemini-1.5-flash")
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttling_halves_the_concurrency_limit(fake_gemini, model, status):
+    governor = Governor(max_concurrency=8, retries=0)
+    governed = GovernedModel(model, governor)
+    fake_gemini.throttle_rate, fake_gemini.throttle_status = 1.0, status
+
+    with pytest.raises(Overloaded):
+        governed.generate_content("hello")
+    assert governor.limit == 4
+    with pytest.raises(Overloaded):
+        governed.generate_content("hello")
+    assert governor.limit == 2
+    assert governor.snapshot()["throttled"] == 2
+    assert governor.in_flight == 0
+
+
+def test_limit_recovers_additively(fake_gemini, model):
+    governor = Governor(max_concurrency=8, retries=0)
+    governed = GovernedModel(model, governor)
+    fake_gemini.throttle_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(Overloaded):
+            governed.generate_content("hello")
+    fake_gemini.throttle_rate = 0.0
+
+    # About one slot per window of successful calls: 2 -> 3 takes 3 calls
+    limits = []
+    for _ in range(3):
+        assert governed.generate_content("hello").text
+        limits.append(governor.limit)
+    assert limits == pytest.approx([2.5, 2.9, 3.245], abs=1e-3)
+
+    for _ in range(30):
+        governed.generate_content("hello")
+    assert governor.limit == 8
+
+
+def test_throttled_call_is_retried(fake_gemini, model):
+    governor = Governor(max_concurrency=4, retries=2, backoff=0.01)
+    governed = GovernedModel(model, governor)
+    fake_gemini.throttle_rate = 1.0
+    timer = threading.Timer(0.02, lambda: setattr(fake_gemini, "throttle_rate", 0.0))
+    timer.start()
+
+    assert governed.generate_content("hello").text
+    timer.join()
+    stats = governor.snapshot()
+    assert stats["retried"] >= 1
+    assert stats["in_flight"] == 0
+
+
+def test_interactive_calls_are_admitted_before_background(fake_gemini, model):
+    governor = Governor(max_concurrency=1)
+    governed = GovernedModel(model, governor)
+    fake_gemini.latency = 0.05
+    finished = []
+
+    def call(priority, name):
+        with governor.priority(priority):
+            governed.generate_content(name)
+        finished.append(name)
+
+    governor.acquire()  # hold the only slot while both callers queue
+    threads = [threading.Thread(target=call, args=(BACKGROUND, "background"))]
+    threads[0].start()
+    while governor.snapshot()["queued"] < 1:
+        time.sleep(0.005)
+    threads.append(threading.Thread(target=call, args=(INTERACTIVE, "interactive")))
+    threads[1].start()
+    while governor.snapshot()["queued"] < 2:
+        time.sleep(0.005)
+    governor.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert finished == ["interactive", "background"]
+
+
+def test_full_queue_raises_overloaded(model):
+    governor = Governor(max_concurrency=1, queue_timeout=0.05)
+    governor.acquire()
+    try:
+        with pytest.raises(Overloaded) as info:
+            GovernedModel(model, governor).generate_content("hello")
+    finally:
+        governor.release()
+    assert info.value.retry_after >= 1
+    assert governor.snapshot()["rejected"] == 1
+
+
+def test_overloaded_becomes_503_with_retry_after(backend):
+    with backend.app.test_request_context():
+        response = backend.error_response(Overloaded("busy", retry_after=7))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_route_answers_503_when_gemini_capacity_is_exhausted(backend, fake_gemini):
+    governor = backend.llm_governor
+    queue_timeout, governor.queue_timeout = governor.queue_timeout, 0.05
+    held = int(governor.limit)
+    for _ in range(held):
+        governor.acquire()
+    try:
+        response = backend.app.test_client().post(
+            "/chat", json={"message": "Which course suits a future nurse?", "chatHistory": []})
+    finally:
+        for _ in range(held):
+            governor.release()
+        governor.queue_timeout = queue_timeout
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.get_json()["status"] == "error"
+
+
+def test_async_route_answers_503_when_gemini_capacity_is_exhausted(backend, fake_gemini):
+    import asgi
+
+    async def post():
+        client = asgi.create_app().test_client()
+        return await client.post("/chat", json={"message": "Which course suits a future nurse?", "chatHistory": []})
+
+    governor = backend.llm_governor
+    queue_timeout, governor.queue_timeout = governor.queue_timeout, 0.05
+    held = int(governor.limit)
+    for _ in range(held):
+        governor.acquire()
+    try:
+        response = asyncio.run(post())
+    finally:
+        for _ in range(held):
+            governor.release()
+        governor.queue_timeout = queue_timeout
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert asyncio.run(response.get_json())["status"] == "error"
@@ -0,0 +1,49 @@
+"""Latency samples of streams and full responses are kept apart."""
+import time
+
+from hedging import HedgedModel, Hedger
+from router import ModelRouter, parse_routes
+
+
+class SlowModel:
+    """Full responses take `response` seconds; streams open after `first_chunk`."""
+
+    def __init__(self, response, first_chunk):
+        self.response = response
+        self.first_chunk = first_chunk
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        time.sleep(self.first_chunk if stream else self.response)
+        return iter(["chunk"]) if stream else "response"
+
+
+def test_hedger_keeps_stream_and_response_windows_apart():
+    hedger = Hedger(budget=1.0, min_samples=3, min_delay=0.0)
+    model = HedgedModel(SlowModel(response=0.05, first_chunk=0.0), hedger)
+    with hedger.site("summary"):
+        for _ in range(3):
+            model.generate_content("prompt")
+            list(model.generate_content("prompt", stream=True))
+
+    latency = hedger.latency()["summary"]
+    assert latency["response"]["samples"] == latency["first_chunk"]["samples"] == 3
+    assert latency["response"]["p50"] >= 0.05
+    assert latency["first_chunk"]["p95"] < 0.05
+    assert hedger.hedge_delay(("summary", "first_chunk")) < hedger.hedge_delay(("summary", "response"))
+
+
+def test_router_averages_streams_and_responses_separately():
+    models = {"fast-stream": SlowModel(response=0.05, first_chunk=0.0),
+              "fast-response": SlowModel(response=0.0, first_chunk=0.05)}
+    router = ModelRouter(models.get, parse_routes("summary=fast-stream,fast-response"), "fast-stream",
+                         explore_rate=0)
+    hedger = Hedger()
+    with hedger.site("summary"):
+        for _ in range(3):
+            router.generate_content("prompt")
+            router.generate_content("prompt", stream=True)
+
+    assert router.plan("summary", "prompt")[0][0] == "fast-response"
+    assert router.plan("summary", "prompt", stream=True)[0][0] == "fast-stream"
+    measures = {(e["measure"], e["model"]) for e in router.snapshot()["latency"]}
+    assert measures == {(m, name) for m in ("response", "first_chunk") for name in models}
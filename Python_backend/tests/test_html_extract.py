@@ -0,0 +1,27 @@
+"""Unclosed tags don't let a field's capture run on into the page."""
+from html_extract import PageFieldParser
+
+
+def parse(html):
+    parser = PageFieldParser("body")
+    parser.feed(html)
+    return parser.fields
+
+
+def test_unclosed_paragraph_ends_at_the_next_block():
+    fields = parse("<h1>Data Analyst</h1><p>Turns data into decisions.<div>Sidebar</div>"
+                   "<h2>Key skills</h2><ul><li>SQL</li><li>Python</li></ul>")
+    assert fields["paragraph"] == "Turns data into decisions."
+    assert fields["skills"] == ["SQL", "Python"]
+
+
+def test_unclosed_heading_and_list_items():
+    fields = parse("<h1>Nurse<p>Cares for patients.</p><h3>Skills<ul><li>Triage<li>Wound care</ul>")
+    assert fields["heading"] == "Nurse"
+    assert fields["paragraph"] == "Cares for patients."
+    assert fields["skills"] == ["Triage", "Wound care"]
+
+
+def test_paragraphs_inside_list_items_stay_in_the_item():
+    fields = parse("<h2>Skills</h2><ul><li><p>Budgeting</p></li><li><p>Forecasting</p></li></ul>")
+    assert fields["skills"] == ["Budgeting", "Forecasting"]
@@ -0,0 +1,93 @@
+"""Background jobs: dedup of identical payloads, failures and stale jobs."""
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, payload_hash
+
+
+def finish(queue, job_id):
+    for _ in range(100):
+        job = queue.get(job_id)
+        if job["status"] in ("done", "error"):
+            return job
+        queue.wait(job_id, 0.05)
+    raise AssertionError(f"job {job_id} never finished")
+
+
+def test_identical_payloads_share_a_job(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        release.wait(5)
+        return {"echo": payload["n"]}
+
+    queue = JobQueue({"echo": handler}, str(tmp_path / "jobs.db"), workers=2)
+    first = queue.submit("echo", {"n": 1})
+    assert queue.submit("echo", {"n": 1}) == first
+    other = queue.submit("echo", {"n": 2})
+    assert other != first
+
+    release.set()
+    assert finish(queue, first)["result"] == {"echo": 1}
+    assert finish(queue, other)["result"] == {"echo": 2}
+    # A retained result still answers an identical payload
+    assert queue.submit("echo", {"n": 1}) == first
+    assert len(calls) == 2
+
+    stats = queue.snapshot()
+    assert stats["submitted"] == 2 and stats["deduplicated"] == 2 and stats["completed"] == 2
+    assert stats["queue_depth"] == 0 and stats["running"] == 0
+
+
+def test_failed_job_reports_its_error(tmp_path):
+    def handler(payload):
+        raise RuntimeError("model unavailable")
+
+    queue = JobQueue({"fail": handler}, str(tmp_path / "jobs.db"))
+    job = finish(queue, queue.submit("fail", {}))
+    assert job["status"] == "error" and job["error"] == "model unavailable"
+    assert "result" not in job and queue.snapshot()["failed"] == 1
+
+
+def test_unknown_kind_is_rejected(tmp_path):
+    queue = JobQueue({}, str(tmp_path / "jobs.db"))
+    with pytest.raises(ValueError):
+        queue.submit("nope", {})
+
+
+def test_stale_jobs_are_failed_and_rerun(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue({"echo": lambda payload: payload}, path, stale_after=60)
+    # A job left running by a worker process that went away
+    queue._db().execute(
+        "INSERT INTO jobs (id, kind, payload_hash, status, created, started) "
+        "SELECT 'lost', 'echo', ?, 'running', ?, ?",
+        (payload_hash("echo", {"n": 1}), time.time() - 120, time.time() - 120),
+    )
+
+    job_id = queue.submit("echo", {"n": 1})
+    assert job_id != "lost"
+    lost = queue.get("lost")
+    assert lost["status"] == "error" and lost["error"] == "Job was abandoned by its worker"
+    assert queue.snapshot()["abandoned"] == 1
+    assert finish(queue, job_id)["result"] == {"n": 1}
+
+
+def test_expired_results_are_purged(tmp_path):
+    queue = JobQueue({"echo": lambda payload: payload}, str(tmp_path / "jobs.db"), result_ttl=0)
+    job_id = queue.submit("echo", {"n": 1})
+    finish(queue, job_id)
+    time.sleep(0.01)
+    queue.purge_expired()
+    assert queue.get(job_id) is None
+
+
+def test_jobs_endpoints(backend):
+    client = backend.app.test_client()
+    assert client.post("/jobs/unknown", json={}).status_code == 404
+    assert client.get("/jobs/missing").status_code == 404
+    assert "queue_depth" in client.get("/jobs/metrics").get_json()
@@ -0,0 +1,76 @@
+"""The response cache and the models it wraps."""
+import asyncio
+import threading
+
+import metrics
+from llm_cache import CachedModel, CachedResponse, ResponseCache
+
+
+def test_async_cache_uses_the_sqlite_tier_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache(db_path=str(tmp_path / "llm.db"))
+    threads = []
+    for name in ("_from_disk", "_to_disk"):
+        original = getattr(cache, name)
+
+        def record(*args, _original=original):
+            threads.append(threading.get_ident())
+            return _original(*args)
+
+        monkeypatch.setattr(cache, name, record)
+
+    async def roundtrip():
+        await cache.aset("key", "text")
+        cache._memory.clear()
+        return await cache.aget("key"), threading.get_ident()
+
+    text, loop_thread = asyncio.run(roundtrip())
+    assert text == "text"
+    assert len(threads) == 2 and loop_thread not in threads
+    assert cache.snapshot()["disk_hits"] == 1
+
+
+class Usage:
+    prompt_token_count = 123
+    candidates_token_count = 45
+
+
+class Reply:
+    text = "a model reply"
+    usage_metadata = Usage()
+
+
+class ReplyModel:
+    model_name = "gemini-test"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return Reply()
+
+    async def generate_content_async(self, prompt, **kwargs):
+        return self.generate_content(prompt, **kwargs)
+
+
+def test_a_miss_returns_the_live_reply_and_a_hit_the_cached_text():
+    model = CachedModel(ReplyModel(), ResponseCache())
+    miss = model.generate_content("prompt")
+    hit = model.generate_content("prompt")
+    assert isinstance(miss, Reply) and miss.usage_metadata.prompt_token_count == 123
+    assert isinstance(hit, CachedResponse) and hit.text == "a model reply"
+    assert model.model.calls == 1
+
+    async_model = CachedModel(ReplyModel(), ResponseCache())
+    assert isinstance(asyncio.run(async_model.generate_content_async("prompt")), Reply)
+    assert isinstance(asyncio.run(async_model.generate_content_async("prompt")), CachedResponse)
+
+
+def test_real_token_counts_reach_the_metrics(backend):
+    def tokens(counter):
+        return counter._values.get(("cache_test",), 0)
+
+    model = CachedModel(ReplyModel(), ResponseCache())
+    backend.generate(model, "a prompt long enough that its estimate would differ", "cache_test")
+    assert tokens(metrics.LLM_PROMPT_TOKENS) == 123
+    assert tokens(metrics.LLM_RESPONSE_TOKENS) == 45
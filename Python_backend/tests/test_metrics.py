@@ -0,0 +1,66 @@
+"""Prometheus text output for counters, histograms and collectors."""
+import pytest
+
+import metrics
+from metrics import Counter, Histogram
+
+
+def test_counter_renders_one_sample_per_label_set():
+    calls = Counter("calls_total", "Calls by site", ("site", "outcome"))
+    calls.inc(site="question", outcome="ok")
+    calls.inc(2, site="question", outcome="ok")
+    calls.inc(site="chat", outcome='say "no"')
+    assert calls.render() == [
+        "# HELP calls_total Calls by site",
+        "# TYPE calls_total counter",
+        "calls_total{site=\"chat\",outcome=\"say 'no'\"} 1",
+        'calls_total{site="question",outcome="ok"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("latency_seconds", "Latency", ("site",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value, site="chat")
+    assert latency.render()[2:] == [
+        'latency_seconds_bucket{site="chat",le="0.1"} 1',
+        'latency_seconds_bucket{site="chat",le="1"} 3',
+        'latency_seconds_bucket{site="chat",le="+Inf"} 4',
+        'latency_seconds_sum{site="chat"} 4.05',
+        'latency_seconds_count{site="chat"} 4',
+    ]
+
+
+def test_metrics_endpoint_serves_requests_and_collectors(backend):
+    client = backend.app.test_client()
+    client.get("/cache-stats")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/cache-stats",method="GET",status="200"}' in body
+    assert "# TYPE llm_call_duration_seconds histogram" in body
+    assert "# TYPE job_queue gauge" in body
+    assert 'job_queue{stat="queue_depth"}' in body
+
+
+class EchoModel:
+    model_name = "gemini-test"
+
+    def generate_content(self, prompt, **kwargs):
+        if prompt == "fail":
+            raise RuntimeError("model said no")
+        return type("Reply", (), {"text": "hello"})()
+
+
+def test_model_calls_are_counted_by_site_and_outcome(backend):
+    def calls(outcome):
+        return metrics.LLM_CALLS._values.get(("metrics_test", outcome), 0)
+
+    backend.generate(EchoModel(), "Say hello", "metrics_test")
+    with pytest.raises(RuntimeError):
+        backend.generate(EchoModel(), "fail", "metrics_test")
+    assert calls("ok") == 1 and calls("error") == 1
+    assert metrics.LLM_LATENCY._values[("metrics_test",)][2] == 2
+    assert metrics.LLM_RESPONSE_TOKENS._values[("metrics_test",)] >= 1
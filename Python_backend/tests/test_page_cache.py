@@ -0,0 +1,183 @@
+"""Page cache and fetchers against a local HTTP server."""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import async_fetcher
+import fetcher
+from fetcher import HostSlots
+from page_cache import PageCache
+
+PAGE = (
+    "<html><head><title>Data Scientist {n}</title>"
+    "<meta name='description' content='Career page {n}'></head>"
+    "<body><h1>Data Scientist</h1><p>Turns data into decisions.</p>"
+    "<h2>Key skills</h2><ul><li>Python</li><li>Statistics</li></ul></body></html>"
+)
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class PageServer:
+    """Serves /N pages with validators; counts full and 304 responses and
+    the most bodies being sent at once."""
+
+    def __init__(self, validators=("etag", "last_modified"), body_delay=0.0):
+        self.validators = validators
+        self.body_delay = body_delay
+        self.full = self.not_modified = self.sending = self.max_sending = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _handler(self):
+        pages = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if (self.headers.get("If-None-Match") == ETAG
+                        or self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+                    with pages._lock:
+                        pages.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = PAGE.format(n=self.path.strip("/")).encode("utf-8")
+                with pages._lock:
+                    pages.full += 1
+                    pages.sending += 1
+                    pages.max_sending = max(pages.max_sending, pages.sending)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    if "etag" in pages.validators:
+                        self.send_header("ETag", ETAG)
+                    if "last_modified" in pages.validators:
+                        self.send_header("Last-Modified", LAST_MODIFIED)
+                    self.end_headers()
+                    self.wfile.flush()
+                    time.sleep(pages.body_delay)
+                    self.wfile.write(body)
+                finally:
+                    with pages._lock:
+                        pages.sending -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A page cache whose entries are always stale, so every hit revalidates."""
+    cache = PageCache(str(tmp_path / "pages.db"), max_entries=10, fresh_for=0)
+    monkeypatch.setattr(fetcher, "page_cache", cache)
+    return cache
+
+
+@pytest.mark.parametrize("validators", [("etag",), ("last_modified",)])
+def test_not_modified_reuses_stored_fields(cache, validators):
+    server = PageServer(validators)
+    try:
+        url = f"{server.url}/1"
+        [(_, first)] = fetcher.fetch_pages([url], time.time() + 5)
+        [(_, second)] = fetcher.fetch_pages([url], time.time() + 5)
+    finally:
+        server.close()
+
+    assert first["title"] == "Data Scientist 1"
+    assert first["skills"] == ["Python", "Statistics"]
+    assert second == first
+    assert (server.full, server.not_modified) == (1, 1)
+    assert cache.snapshot()["revalidated"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.db"), max_entries=3)
+    for url in ("a", "b", "c"):
+        cache.put(url, {"title": url})
+        time.sleep(0.01)
+    cache.touch("a")
+    time.sleep(0.01)
+    cache.put("d", {"title": "d"})
+
+    assert cache.get("b") is None
+    assert [cache.get(url)["fields"]["title"] for url in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.snapshot()["entries"] == 3
+
+
+def test_processes_share_one_store(tmp_path):
+    path = str(tmp_path / "pages.db")
+    PageCache(path).put("http://example.test/parent", {"title": "from parent"})
+    child = (
+        "from page_cache import PageCache\n"
+        f"cache = PageCache({path!r})\n"
+        "print(cache.get('http://example.test/parent')['fields']['title'])\n"
+        "cache.put('http://example.test/child', {'title': 'from child'}, etag='\"c\"')\n"
+    )
+    out = subprocess.run([sys.executable, "-c", child], cwd=os.path.dirname(fetcher.__file__),
+                         capture_output=True, text=True, timeout=30, check=True).stdout
+
+    assert out.strip() == "from parent"
+    entry = PageCache(path).get("http://example.test/child")
+    assert entry["fields"] == {"title": "from child"}
+    assert entry["etag"] == '"c"'
+
+
+def test_host_slot_is_held_while_the_body_is_read(cache, monkeypatch):
+    monkeypatch.setattr(fetcher, "_host_slots", HostSlots(lambda: threading.BoundedSemaphore(2)))
+    server = PageServer(body_delay=0.2)
+    try:
+        results = fetcher.fetch_pages([f"{server.url}/{n}" for n in range(6)], time.time() + 10)
+    finally:
+        server.close()
+
+    assert len(results) == 6
+    assert server.max_sending <= 2
+
+
+def test_async_fetch_holds_the_host_slot_and_revalidates(cache, monkeypatch):
+    monkeypatch.setattr(async_fetcher, "page_cache", cache)
+    monkeypatch.setattr(async_fetcher, "_host_slots", HostSlots(lambda: asyncio.Semaphore(2)))
+    server = PageServer(body_delay=0.2)
+
+    async def fetch(urls):
+        try:
+            return await async_fetcher.afetch_pages(urls, time.time() + 10)
+        finally:
+            await async_fetcher.aclose()
+
+    try:
+        results = asyncio.run(fetch([f"{server.url}/{n}" for n in range(6)]))
+        asyncio.run(fetch([f"{server.url}/0"]))
+    finally:
+        server.close()
+
+    assert len(results) == 6
+    assert server.max_sending <= 2
+    assert (server.full, server.not_modified) == (6, 1)
+
+
+def test_host_slots_forget_idle_hosts_past_the_limit():
+    slots = HostSlots(threading.Lock, max_hosts=2)
+    busy = slots.checkout("http://busy.test/")
+    for n in range(5):
+        url = f"http://idle{n}.test/"
+        slots.checkout(url)
+        slots.checkin(url)
+
+    assert len(slots) == 2
+    assert slots.checkout("http://busy.test/") is busy
@@ -0,0 +1,73 @@
+"""Stage graphs: the first stage runs inline, abandoned stages free their slot."""
+import threading
+import time
+
+import pytest
+
+import deadline
+from pipeline import Stage, StagePool, run_stages
+
+
+def test_first_stage_runs_on_the_calling_thread():
+    pool = StagePool(2)
+    threads = {}
+
+    def record(name):
+        def fn(**deps):
+            threads[name] = threading.current_thread().name
+            return name + "".join(deps.values())
+        return fn
+
+    results, timings = run_stages([
+        Stage("a", record("a")),
+        Stage("b", record("b")),
+        Stage("c", record("c"), deps=["a", "b"]),
+    ], executor=pool)
+
+    assert results == {"a": "a", "b": "b", "c": "cab"}
+    assert set(timings) == {"a", "b", "c"}
+    assert threads["a"] == threading.current_thread().name
+    assert threads["b"].startswith("stage") and threads["c"].startswith("stage")
+    assert pool.snapshot()["submitted"] == 2
+
+
+def test_abandoned_stage_gives_its_slot_back():
+    pool = StagePool(1)
+    release = threading.Event()
+
+    with deadline.budget(0.1), pytest.raises(deadline.DeadlineExceeded):
+        run_stages([Stage("quick", lambda: None), Stage("stuck", lambda: release.wait(5))], executor=pool)
+    assert pool.snapshot()["abandoned_running"] == 1
+
+    # The stuck stage still holds a thread but not the only slot
+    t0 = time.monotonic()
+    results, _ = run_stages([Stage("first", lambda: 1), Stage("next", lambda: 2)], executor=pool)
+    assert results == {"first": 1, "next": 2}
+    assert time.monotonic() - t0 < 1
+
+    release.set()
+    for _ in range(50):
+        if pool.snapshot()["abandoned_running"] == 0:
+            break
+        time.sleep(0.02)
+    assert pool.snapshot() == {"submitted": 2, "abandoned": 1, "abandoned_running": 0, "workers": 1}
+
+
+def test_failing_stage_abandons_the_others():
+    pool = StagePool(1, spare=0)
+    release = threading.Event()
+
+    def fail():
+        time.sleep(0.05)
+        raise RuntimeError("model said no")
+
+    with pytest.raises(RuntimeError):
+        run_stages([Stage("fails", fail), Stage("slow", lambda: release.wait(5)),
+                    Stage("queued", lambda: None, deps=["slow"])], executor=pool)
+    assert pool.snapshot()["abandoned"] == 1
+    release.set()
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        run_stages([Stage("a", lambda b: b, deps=["b"]), Stage("b", lambda a: a, deps=["a"])])
@@ -0,0 +1,44 @@
+"""Background refreshes run on a bounded pool and old demand is pruned."""
+import threading
+import time
+
+from plan_store import PlanStore
+
+
+def request(n):
+    return {"careerTitle": "Data Analyst", "course": {"title": f"Course {n}", "provider": "Coursera"},
+            "gaps": {"missing": ["SQL"]}}
+
+
+def test_refreshes_are_bounded(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"), refresh_workers=2, refresh_backlog=5)
+    release = threading.Event()
+    running, peak = set(), []
+
+    def generate(data):
+        running.add(threading.current_thread().name)
+        peak.append(len(running))
+        release.wait(5)
+        return {"weeks": []}
+
+    before = threading.active_count()
+    for n in range(20):
+        store.refresh_later(request(n), generate)
+    time.sleep(0.1)
+    assert threading.active_count() - before <= 2
+    assert store.snapshot()["refresh_skipped"] == 15
+
+    release.set()
+    store._refresh_pool.shutdown(wait=True)
+    assert store.snapshot()["refreshed"] == 5
+    assert max(peak) <= 2
+
+
+def test_old_demand_is_pruned_on_lookup(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"), demand_window=60)
+    store.lookup(request(1))
+    store._db().execute("UPDATE plan_requests SET last_seen = ?", (time.time() - 120,))
+    store.lookup(request(2))
+    payloads = store._db().execute("SELECT payload FROM plan_requests").fetchall()
+    assert len(payloads) == 1 and "Course 2" in payloads[0][0]
+    assert store.snapshot()["demand_pruned"] == 1
@@ -0,0 +1,69 @@
+"""Batched questions: follow-ups are buffered by history and served without a call."""
+from question_prefetch import QuestionPrefetcher
+
+
+def question(text):
+    return {"question": text, "options": ["a", "b", "c", "d"]}
+
+
+def answered(history, q, option):
+    return history + [{"question": q["question"], "answer": option}]
+
+
+def test_stashed_follow_ups_are_served_once_per_branch():
+    prefetcher = QuestionPrefetcher(lambda history: None)
+    first = question("Pick one")
+    prefetcher.stash([], first, [question("After a"), None, question("After c"), question("After d")])
+
+    assert prefetcher.take(answered([], first, "a")) == question("After a")
+    # The user took branch a: the other buffered branches are dropped
+    assert prefetcher.take(answered([], first, "c")) is None
+    assert prefetcher.take(answered([], first, "a")) is None
+
+    stats = prefetcher.snapshot()
+    assert stats["buffered"] == 3 and stats["hits"] == 1 and stats["discarded"] == 2
+    assert stats["ready"] == 0
+
+
+def test_an_unpredicted_answer_is_a_miss():
+    prefetcher = QuestionPrefetcher(lambda history: None)
+    first = question("Pick one")
+    prefetcher.stash([], first, [question("After a")] * 4)
+    assert prefetcher.take(answered([], first, "something else")) is None
+    assert prefetcher.snapshot()["misses"] == 1
+
+
+def test_split_keeps_well_formed_follow_ups_in_option_order(backend):
+    batch = dict(question("Pick one"), followUps=[
+        dict(question("After a"), reasoning="dropped"),
+        {"question": "After b", "options": ["only", "two"]},
+        "not a question",
+        question("After d"),
+        question("Extra"),
+    ])
+    current, follow_ups = backend.split_question_batch(batch)
+    assert current == question("Pick one")
+    assert follow_ups == [question("After a"), None, None, question("After d")]
+
+    assert backend.split_question_batch(dict(question("Pick one"), followUps="oops"))[1] == []
+
+
+def test_endpoint_serves_the_next_question_from_the_batch(backend, monkeypatch):
+    first = question("Pick one")
+    batches = []
+
+    def generate_question_batch(previous_qa):
+        batches.append(previous_qa)
+        return first, [question(f"After {option}") for option in first["options"]]
+
+    monkeypatch.setattr(backend, "QUESTION_BATCH", True)
+    monkeypatch.setattr(backend, "OPENING_POOL", False)
+    monkeypatch.setattr(backend, "question_prefetcher", QuestionPrefetcher(lambda history: None))
+    monkeypatch.setattr(backend, "generate_question_batch", generate_question_batch)
+    client = backend.app.test_client()
+
+    history = [{"question": "Warm-up", "answer": "yes"}]
+    assert client.post("/generate-question", json={"previousQA": history}).get_json() == {"question": first}
+    reply = client.post("/generate-question", json={"previousQA": answered(history, first, "b")})
+    assert reply.get_json() == {"question": question("After b")}
+    assert batches == [history]
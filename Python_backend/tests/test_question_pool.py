@@ -0,0 +1,24 @@
+"""The opening pool is built off the request stage pool."""
+import threading
+
+from question_prefetch import history_key
+
+
+def test_pool_follow_ups_run_on_their_own_threads(backend, monkeypatch):
+    opener = {"question": "What do you enjoy most?", "options": ["Building", "Helping", "Analysing", "Creating"]}
+    threads = []
+
+    def follow_up(history):
+        threads.append(threading.current_thread().name)
+        return {"question": f"Why {history[-1]['answer']}?", "options": ["A", "B", "C", "D"]}
+
+    monkeypatch.setattr(backend, "generate_json_array_with_retry", lambda *args, **kwargs: [opener])
+    monkeypatch.setattr(backend, "speculate_next_question", follow_up)
+    entries = backend.build_opening_pool(depth=1)
+
+    assert entries[history_key([])] == [opener]
+    assert len(entries) == 1 + len(opener["options"])
+    # The first follow-up runs on the building thread, the rest on the pool's own
+    here = threading.current_thread().name
+    assert len(threads) == 4 and threads.count(here) == 1
+    assert all(name.startswith("opening-pool") for name in threads if name != here)
@@ -0,0 +1,27 @@
+"""Speculative question calls are background work under their own site."""
+import hedging
+from governor import BACKGROUND, NORMAL
+
+
+def hedged(backend, site):
+    priority, hedge_site = backend._call_site(site)
+    with priority, hedge_site:
+        return hedging._site.get()[1]
+
+
+def test_background_priority_disables_hedging(backend):
+    assert hedged(backend, "question")
+    with backend.llm_governor.priority(NORMAL):
+        assert hedged(backend, "question")
+    with backend.llm_governor.priority(BACKGROUND):
+        assert not hedged(backend, "question")
+
+
+def test_speculative_questions_are_recorded_apart(backend, fake_gemini):
+    before = backend.llm_hedger.latency().get("question", {})
+    question = backend.speculate_next_question([{"question": "Pick one", "answer": "Maths"}])
+
+    assert question["question"] and len(question["options"]) == 4
+    latency = backend.llm_hedger.latency()
+    assert sum(m["samples"] for m in latency["question_prefetch"].values()) >= 1
+    assert latency.get("question", {}) == before
@@ -0,0 +1,47 @@
+"""Only availability errors count against a model's health."""
+import pytest
+from google.api_core import exceptions
+
+from hedging import CallTimeout
+from router import ModelRouter, is_unavailable_error
+
+
+class FailingModel:
+    def __init__(self, error):
+        self.error = error
+
+    def generate_content(self, prompt, **kwargs):
+        raise self.error
+
+
+def router_for(error):
+    return ModelRouter(lambda name: FailingModel(error), {}, "gemini", failures=3, explore_rate=0)
+
+
+@pytest.mark.parametrize("error", [
+    exceptions.InvalidArgument("Request contains an invalid argument"),
+    exceptions.FailedPrecondition("User location is not supported"),
+    ValueError("Response was blocked for safety"),
+])
+def test_request_errors_do_not_cut_a_model_off(error):
+    router = router_for(error)
+    for _ in range(5):
+        with pytest.raises(type(error)):
+            router.generate_content("prompt")
+    health = router.snapshot()["models"].get("gemini", {})
+    assert not health.get("error_rate") and not health.get("cut_off")
+
+
+@pytest.mark.parametrize("error", [
+    exceptions.TooManyRequests("Quota exceeded"),
+    exceptions.ServiceUnavailable("The model is overloaded"),
+    exceptions.InternalServerError("Internal error"),
+    CallTimeout("Model call did not answer"),
+])
+def test_availability_errors_cut_a_model_off(error):
+    assert is_unavailable_error(error)
+    router = router_for(error)
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            router.generate_content("prompt")
+    assert router.snapshot()["models"]["gemini"]["cut_off"]
@@ -0,0 +1,95 @@
+"""Coalesced followers give up at their own request deadline."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import deadline
+from singleflight import Group
+
+
+def lead_slowly(group, key, started, release):
+    def slow():
+        started.set()
+        release.wait(5)
+        return "leader's result"
+
+    thread = threading.Thread(target=group.do, args=(key, slow))
+    thread.start()
+    started.wait(5)
+    return thread
+
+
+@pytest.mark.parametrize("remote", [False, True])
+def test_follower_stops_waiting_at_its_deadline(tmp_path, remote):
+    leader_group = Group(db_path=str(tmp_path / "flights.db") if remote else None)
+    # A second Group on the same file stands in for another worker process
+    follower_group = Group(db_path=str(tmp_path / "flights.db"), poll_interval=0.02) if remote else leader_group
+    started, release = threading.Event(), threading.Event()
+    leader = lead_slowly(leader_group, "key", started, release)
+    try:
+        t0 = time.monotonic()
+        with deadline.budget(0.2), pytest.raises(deadline.DeadlineExceeded):
+            follower_group.do("key", lambda: "computed by the follower")
+        assert time.monotonic() - t0 < 1
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_async_follower_stops_waiting_at_its_deadline():
+    group = Group()
+    started, release = threading.Event(), threading.Event()
+    leader = lead_slowly(group, "key", started, release)
+
+    async def follow():
+        async def compute():
+            return "computed by the follower"
+
+        with deadline.budget(0.2):
+            return await group.do_async("key", compute)
+
+    try:
+        with pytest.raises(deadline.DeadlineExceeded):
+            asyncio.run(follow())
+    finally:
+        release.set()
+        leader.join(5)
+    assert group.snapshot()["in_flight"] == 0
+
+
+def test_follower_within_its_deadline_shares_the_result():
+    group = Group()
+    started, release = threading.Event(), threading.Event()
+    leader = lead_slowly(group, "key", started, release)
+    threading.Timer(0.05, release.set).start()
+    with deadline.budget(5):
+        assert group.do("key", lambda: "computed by the follower") == "leader's result"
+    leader.join(5)
+
+
+def test_coalesced_analysis_degrades_at_the_deadline(backend, monkeypatch):
+    payload = {"final_answers": [{"question": "What do you enjoy?", "answer": "Solving puzzles with data"}]}
+    started, release = threading.Event(), threading.Event()
+
+    def slow_analysis(data):
+        started.set()
+        release.wait(5)
+        return {"ai_generated_careers": [], "pdf_based_careers": [], "meta": {}}
+
+    leader = threading.Thread(target=backend.coalesced, args=("analyze-answers", payload, slow_analysis))
+    leader.start()
+    started.wait(5)
+    monkeypatch.setitem(backend.ENDPOINT_DEADLINES, "analyze-answers", 0.3)
+    try:
+        response = backend.app.test_client().post("/analyze-answers", json=payload)
+    finally:
+        release.set()
+        leader.join(5)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["degraded"] is True
+    assert body["meta"]["degraded"]["reason"] == "deadline"
+    assert body["ai_generated_careers"]
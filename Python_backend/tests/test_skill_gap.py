@@ -0,0 +1,83 @@
+"""Per-career skill gap fan-out: partial results and the per-career cache."""
+import asyncio
+import threading
+
+import pytest
+
+import deadline
+from skill_gap import (afan_out, cached_career, career_key, fan_out, merge, store_career,
+                       target_titles)
+
+SKILLS = {"technical": ["Python", "SQL"], "soft": ["Teamwork"]}
+PREFERENCES = {"jobLocation": {"country": "India", "state": "Kerala"}}
+
+
+def test_target_titles_are_distinct_and_in_order():
+    data = {"target_careers": ["Data Analyst", {"title": "Nurse"}, {"name": "data  analyst"}, {}, None, "Vet"]}
+    assert target_titles(data) == ["Data Analyst", "Nurse", "Vet"]
+    assert target_titles({"careers": "not a list"}) == []
+
+
+def test_cache_key_ignores_skill_order_case_and_category():
+    same = {"core": ["sql", "teamwork"], "tools": [" python "]}
+    assert career_key("Data Analyst", SKILLS, PREFERENCES) == career_key("data analyst", same, PREFERENCES)
+    assert career_key("Data Analyst", SKILLS, PREFERENCES) != career_key("Data Analyst", SKILLS, {})
+    assert career_key("Data Analyst", SKILLS, PREFERENCES) != career_key("Data Analyst", {"core": ["Java"]}, PREFERENCES)
+
+
+def test_stored_careers_are_reused_for_the_same_profile():
+    career = {"title": "Cache Test Career", "match": 80}
+    assert cached_career("Cache Test Career", SKILLS, PREFERENCES) is None
+    store_career("Cache Test Career", SKILLS, PREFERENCES, career)
+    assert cached_career("cache test career", {"core": ["teamwork", "sql", "python"]}, PREFERENCES) == career
+    assert cached_career("Cache Test Career", SKILLS, {}) is None
+
+
+def test_fan_out_keeps_the_careers_that_finished():
+    release = threading.Event()
+
+    def analyze(title):
+        if title == "Broken":
+            raise ValueError("model returned junk")
+        if title == "Slow":
+            release.wait(5)
+        return {"title": title}
+
+    titles = ["Nurse", "Broken", "Slow", "Vet"]
+    outcomes = fan_out(titles, analyze, timeout=0.2)
+    release.set()
+    assert isinstance(outcomes["Broken"], ValueError)
+    assert isinstance(outcomes["Slow"], TimeoutError)
+
+    result = merge(SKILLS, titles, outcomes)
+    assert result["careers"] == [{"title": "Nurse"}, {"title": "Vet"}]
+    assert result["partial"] is True
+    assert result["failedCareers"] == [
+        {"title": "Broken", "error": "model returned junk"},
+        {"title": "Slow", "error": "No analysis for 'Slow' within 0.2s"},
+    ]
+
+
+def test_fan_out_is_capped_by_the_request_deadline():
+    release = threading.Event()
+    with deadline.budget(0.1):
+        outcomes = fan_out(["Slow"], lambda title: release.wait(5), timeout=60)
+    release.set()
+    assert isinstance(outcomes["Slow"], TimeoutError)
+
+
+def test_merge_raises_when_no_career_succeeded():
+    with pytest.raises(ValueError):
+        merge(SKILLS, ["Broken"], {"Broken": ValueError("model returned junk")})
+    assert merge(SKILLS, [], {}) == {"userSkills": SKILLS, "careers": []}
+
+
+def test_async_fan_out_matches_the_threaded_one():
+    async def analyze(title):
+        if title == "Slow":
+            await asyncio.sleep(5)
+        return {"title": title}
+
+    outcomes = asyncio.run(afan_out(["Nurse", "Slow"], analyze, timeout=0.1))
+    assert outcomes["Nurse"] == {"title": "Nurse"}
+    assert isinstance(outcomes["Slow"], TimeoutError)
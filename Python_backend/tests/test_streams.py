@@ -0,0 +1,41 @@
+"""Server-sent event endpoints: errors arrive as events, analysis streams are bounded."""
+import json
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_chat_stream_reports_a_malformed_body_as_an_event(backend):
+    response = backend.app.test_client().post(
+        "/chat/stream", data="{not json", content_type="application/json")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    [(event, payload)] = events(response)
+    assert event == "error" and payload["status"] == "error"
+
+
+def test_analysis_stream_runs_to_done(backend, fake_gemini):
+    response = backend.app.test_client().post("/analyze-answers/stream", json={
+        "answers": [{"question": "What do you enjoy?", "answer": "Solving puzzles with data"}],
+    })
+    names = [event for event, _ in events(response)]
+    assert names[-1] == "done"
+
+
+def test_analysis_streams_beyond_the_limit_get_503(backend):
+    held = 0
+    while backend.analysis_stream_slots.acquire(blocking=False):
+        held += 1
+    try:
+        response = backend.app.test_client().post("/analyze-answers/stream", json={"answers": []})
+    finally:
+        for _ in range(held):
+            backend.analysis_stream_slots.release()
+    assert held == backend.ANALYZE_STREAM_WORKERS
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,75 @@
+"""Streaming JSON scanning, repair of cut-off output and schema validation."""
+import pytest
+
+from structured_output import SCHEMAS, JsonScanner, parse, repair, validate
+
+
+def scan(text, kind="object", chunk=3):
+    """Feed text in chunks, stopping like generate_structured() does."""
+    scanner = JsonScanner(kind)
+    for i in range(0, len(text), chunk):
+        scanner.feed(text[i:i + chunk])
+        if scanner.error:
+            break
+    return scanner
+
+
+def test_scanner_finds_the_value_amid_prose_and_fences():
+    scanner = scan('Sure! ```json\n{"question": "Why {x}?", "options": ["a]", "b"]}\n``` Hope it helps')
+    assert scanner.complete and not scanner.error
+    assert scanner.value_text() == '{"question": "Why {x}?", "options": ["a]", "b"]}'
+
+
+def test_scanner_flags_a_mismatched_closer_as_it_arrives():
+    scanner = scan('{"options": ["a", "b"} and more', chunk=1)
+    assert scanner.error == "unexpected '}' at offset 21"
+    assert len(scanner.text) == 22
+
+
+def test_scanner_ignores_escaped_quotes_and_brackets_in_strings():
+    scanner = scan(r'["say \"]\" twice", "back\\"]', kind="array")
+    assert scanner.complete
+    assert parse(scanner.value_text(), "array") == (['say "]" twice', "back\\"], False)
+
+
+@pytest.mark.parametrize("text, kind, expected", [
+    # Truncated arrays keep every complete element
+    ('["a", "b"', "array", ["a", "b"]),
+    ('["a", "b",', "array", ["a", "b"]),
+    ('[{"title": "Nurse"}, {"title": "Vet"', "array", [{"title": "Nurse"}, {"title": "Vet"}]),
+    # Truncated objects drop only a key that never got its value
+    ('{"x": ["a", "b"', "object", {"x": ["a", "b"]}),
+    ('{"a": 1, "b"', "object", {"a": 1}),
+    ('{"a": 1, "b": ', "object", {"a": 1}),
+    ('{"a": "x"', "object", {"a": "x"}),
+    # Unterminated strings are dropped with their key or separator
+    ('["a", "b', "array", ["a"]),
+    ('{"a": 1, "b": "hal', "object", {"a": 1}),
+    ('[{"title": "Nurse", "summary": "Cares for pat', "array", [{"title": "Nurse"}]),
+    # Escaped quotes and backslashes don't end a string early
+    (r'{"a": "say \"hi\"", "b": "c\\', "object", {"a": 'say "hi"'}),
+    (r'{"a": "c\\", "b"', "object", {"a": "c\\"}),
+])
+def test_cut_off_output_is_repaired(text, kind, expected):
+    assert parse(text, kind) == (expected, True)
+
+
+def test_trailing_commas_in_a_complete_value_are_removed():
+    assert parse('```json\n{"a": [1, 2,], "b": {"c": 3,},}\n```') == ({"a": [1, 2], "b": {"c": 3}}, True)
+    assert repair('{"a": [1,]}') == '{"a": [1]}'
+
+
+def test_unparseable_output_gives_none():
+    assert parse("no json here") == (None, False)
+    assert parse('{"a": [1}') == (None, False)
+
+
+def test_validate_against_call_site_schemas():
+    question = {"question": "Pick one", "options": ["a", "b", "c", "d"]}
+    assert validate(question, SCHEMAS["question"]) is None
+    assert validate({"options": []}, SCHEMAS["question"]) == "$ is missing 'question'"
+    assert validate(dict(question, options=["a", "b"]), SCHEMAS["question"]) == "$.options needs at least 4 items"
+    assert validate(dict(question, options=["a"] * 5), SCHEMAS["question"]) == "$.options allows at most 4 items"
+    assert validate(dict(question, options=["a", "b", "c", 4]), SCHEMAS["question"]) == "$.options[3] should be string"
+    assert validate([{"title": "Nurse"}, {"name": "Vet"}], SCHEMAS["career"]) == "$[1] is missing 'title'"
+    assert validate({}, SCHEMAS["career"]) == "$ should be array"
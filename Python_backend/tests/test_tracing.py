@@ -0,0 +1,83 @@
+"""Spans: nesting, sampling, and when unsampled spans are still logged."""
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def spans(caplog, monkeypatch):
+    monkeypatch.setattr(tracing, "LOG_PAYLOADS", False)
+    caplog.set_level(logging.INFO, logger="tracing")
+
+    def logged():
+        return [r.span for r in caplog.records if r.name == "tracing"]
+
+    return logged
+
+
+def test_child_spans_share_the_trace(spans, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    with tracing.span("request", route="/chat") as attrs:
+        trace_id = tracing.current_trace_id()
+        with tracing.span("llm", site="chat"):
+            tracing.annotate(tokens=12)
+        # Work handed to a pool with the context copied stays in the trace
+        with ThreadPoolExecutor(1) as pool:
+            assert pool.submit(contextvars.copy_context().run, tracing.current_trace_id).result() == trace_id
+        attrs["status_code"] = 200
+
+    child, parent = spans()
+    assert child["span"] == "llm" and child["tokens"] == 12
+    assert child["trace_id"] == parent["trace_id"] == trace_id
+    assert child["parent_id"] == parent["span_id"] and parent["parent_id"] is None
+    assert parent["route"] == "/chat" and parent["status_code"] == 200
+    assert tracing.current_trace_id() is None
+
+
+def test_unsampled_spans_are_logged_only_when_failing_or_slow(spans, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    with tracing.span("quiet"):
+        pass
+    with pytest.raises(RuntimeError), tracing.span("fails"):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0)
+    with tracing.span("slow"):
+        pass
+
+    logged = spans()
+    assert [s["span"] for s in logged] == ["fails", "slow"]
+    assert logged[0]["status"] == "error" and logged[0]["error"] == "boom"
+
+
+def test_payloads_are_attached_only_when_enabled(spans, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    with tracing.span("hidden", payload={"answers": ["secret"]}):
+        pass
+    monkeypatch.setattr(tracing, "LOG_PAYLOADS", True)
+    with tracing.span("shown", payload={"answers": ["shared"]}):
+        pass
+    hidden, shown = spans()
+    assert "payload" not in hidden and shown["payload"] == {"answers": ["shared"]}
+
+
+def test_start_span_ends_with_the_request_error(spans, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    end = tracing.start_span("request", route="/skill-gap")
+    end(ValueError("bad body"))
+    [logged] = spans()
+    assert logged["status"] == "error" and logged["route"] == "/skill-gap"
+    assert tracing.current_trace_id() is None
+
+
+def test_json_records_carry_the_trace_ids():
+    formatter = tracing.JsonFormatter()
+    record = logging.LogRecord("app", logging.WARNING, __file__, 1, "slow %s", ("fetch",), None)
+    with tracing.span("request"):
+        entry = json.loads(formatter.format(record))
+        assert entry["trace_id"] == tracing.current_trace_id()
+    assert entry["msg"] == "slow fetch" and entry["level"] == "WARNING" and entry["span_id"]
@@ -0,0 +1,157 @@
+"""Structured, sampled request tracing and non-blocking logging.
+
+configure_logging() routes the root logger through a QueueHandler, so request
+threads only enqueue records while a background QueueListener does the
+actual stdout I/O. Records are written as one JSON object per line.
+
+span() opens a timed span in the current trace (kept in a contextvar, so it
+follows the request and any thread-pool work submitted with
+contextvars.copy_context()). Finished spans are logged for a sampled
+fraction of traces (TRACE_SAMPLE_RATE), and always when they fail or are
+slower than TRACE_SLOW_MS. Payload bodies are only attached to spans when
+LOG_PAYLOADS is enabled.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 5000))
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "").lower() in ("1", "true", "yes")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_listener = None
+
+log = logging.getLogger("tracing")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        span = _current.get()
+        if span is not None:
+            entry["trace_id"] = span["trace_id"]
+            entry["span_id"] = span["span_id"]
+        if getattr(record, "span", None):
+            entry.update(record.span)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Install the queue-backed JSON handler on the root logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    records = queue.Queue(maxsize=10000)
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+    _listener.start()
+
+    class _DroppingQueueHandler(logging.handlers.QueueHandler):
+        # Never block a request thread on logging; drop if the queue is full
+        def enqueue(self, record):
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                pass
+
+        def prepare(self, record):
+            # Format on the request thread while the span contextvar is set
+            record.msg = self.format(record)
+            record.args = None
+            record.exc_info = None
+            record.exc_text = None
+            return record
+
+    handler = _DroppingQueueHandler(records)
+    handler.setFormatter(JsonFormatter())
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+
+def current_trace_id():
+    span = _current.get()
+    return span["trace_id"] if span else None
+
+
+@contextmanager
+def span(name, payload=None, **attrs):
+    """Time a unit of work as a child of the current span (or a new trace).
+
+    attrs are small metadata (route, site, sizes); payload is only recorded
+    when LOG_PAYLOADS is enabled. Yields a dict that callers may add attrs to.
+    """
+    parent = _current.get()
+    current = {
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex[:16],
+        "span_id": uuid.uuid4().hex[:8],
+        "parent_id": parent["span_id"] if parent else None,
+        "sampled": parent["sampled"] if parent else random.random() < TRACE_SAMPLE_RATE,
+        "attrs": dict(attrs),
+    }
+    if payload is not None and LOG_PAYLOADS:
+        current["attrs"]["payload"] = payload
+    token = _current.set(current)
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield current["attrs"]
+    except Exception as e:
+        status = "error"
+        current["attrs"]["error"] = str(e)[:300]
+        raise
+    finally:
+        duration_ms = round((time.perf_counter() - t0) * 1000, 2)
+        _current.reset(token)
+        if current["sampled"] or status == "error" or duration_ms >= TRACE_SLOW_MS:
+            log.info("span", extra={"span": {
+                "span": name,
+                "trace_id": current["trace_id"],
+                "span_id": current["span_id"],
+                "parent_id": current["parent_id"],
+                "duration_ms": duration_ms,
+                "status": status,
+                **current["attrs"],
+            }})
+
+
+def annotate(**attrs):
+    """Add attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current["attrs"].update(attrs)
+
+
+def start_span(name, **attrs):
+    """Enter a span without a with-block (for Flask before/teardown hooks).
+    Returns a callable that ends it."""
+    cm = span(name, **attrs)
+    cm.__enter__()
+
+    def end(exc=None):
+        if exc is not None:
+            try:
+                cm.__exit__(type(exc), exc, exc.__traceback__)
+            except Exception:
+                pass
+        else:
+            cm.__exit__(None, None, None)
+
+    return end